@@ -1,12 +1,40 @@
+import argparse
+import asyncio
+import functools
+import itertools
+import os
 import sys
-import yaml
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Callable, Any, Literal, Optional
-
-import questionary
-
-from book_generator.models import BookPlan, ChapterSpecs, BookSectionPlan
-from book_generator.utils import llm, calculate_gemini_3_cost
+from typing import List, Callable, Any, Dict, Literal, Optional, Tuple
+
+from google.genai import types
+from pydantic import ValidationError
+
+from book_generator.llm_cache import LLMCache
+from book_generator.models import (
+    BookPlan,
+    ChapterSpecs,
+    BookSectionPlan,
+    ChapterDraft,
+    BookDraft,
+)
+from book_generator.utils import (
+    llm,
+    llm_async,
+    get_client,
+    wait_for_batch,
+    calculate_gemini_3_cost,
+    load_plan_model,
+)
+
+
+PART_LABELS = {
+    "en": "Part",
+    "ru": "Часть",
+    "de": "Teil",
+}
 
 
 def get_part_label(language: Literal["ru", "en", "de"]) -> str:
@@ -18,12 +46,7 @@ def get_part_label(language: Literal["ru", "en", "de"]) -> str:
     Returns:
         The localized word for 'Part' in the specified language
     """
-    labels = {
-        "en": "Part",
-        "ru": "Часть",
-        "de": "Teil",
-    }
-    return labels.get(language, "Part")
+    return PART_LABELS.get(language, "Part")
 
 
 writer_instructions = """
@@ -65,6 +88,83 @@ Current book progress:
 {book_progress}
 """.strip()
 
+chapter_sections_instructions = """
+Your task is based on the plan write several sections of a book chapter at once.
+You're given the chapter outline and the current progress of the book.
+
+Each section should contain 800-1200 words. Don't use lists, use proper sentences,
+The style is a a popular science book.
+
+Write every requested section, in the given order, and return them as JSON.
+For each section return its name and its markdown content. Use only level-3
+headings inside the markdown and don't repeat the section name as a heading.
+
+The output language should match the input language.
+""".strip()
+
+chapter_sections_prompt_template = """
+The chapter name: {chapter_name}
+
+Chapter outline:
+
+{chapter_outline}
+
+Sections to write:
+
+{sections_to_write}
+
+Current book progress:
+
+{book_progress}
+""".strip()
+
+chapters_sections_instructions = """
+Your task is based on the plan write the sections of several book chapters at once.
+You're given the outlines of the chapters and the current progress of the book.
+
+Each section should contain 800-1200 words. Don't use lists, use proper sentences,
+The style is a a popular science book.
+
+Write every requested chapter and section, in the given order, and return them
+as JSON: one entry per chapter, and for each section its name and its markdown
+content. Use only level-3 headings inside the markdown and don't repeat the
+section name as a heading.
+
+The output language should match the input language.
+""".strip()
+
+chapter_block_template = """
+Chapter {chapter_number}: {chapter_name}
+
+Chapter outline:
+
+{chapter_outline}
+
+Sections to write:
+
+{sections_to_write}
+""".strip()
+
+chapters_sections_prompt_template = """
+Chapters to write:
+
+{chapters}
+
+Current book progress:
+
+{book_progress}
+""".strip()
+
+CHAPTER_DRAFT_SCHEMA = ChapterDraft.model_json_schema()
+BOOK_DRAFT_SCHEMA = BookDraft.model_json_schema()
+
+BATCH_MODEL = "models/gemini-3-pro-preview"
+
+
+def _section_key(name: str) -> str:
+    """Normalizes a section name for matching drafts against the plan."""
+    return " ".join(name.split()).casefold()
+
 
 def show_progress(
     done: List[Any], current: Any, todo: List[Any], name_function: Callable[[Any], str]
@@ -99,6 +199,27 @@ def show_progress(
     return progress
 
 
+class ProgressView:
+    """
+    Renders the same output as show_progress for a fixed list of items.
+
+    The lines for every item are formatted once, so rendering the progress for
+    the i-th item only joins the precomputed lines instead of rebuilding them.
+    """
+
+    def __init__(self, items: List[Any], name_function: Callable[[Any], str]):
+        names = [name_function(item) for item in items]
+        self._done_lines = [f"[x] {name}" for name in names]
+        self._current_lines = [f"[ ] {name} <-- YOU'RE CURRENTLY HERE" for name in names]
+        self._todo_lines = [f"[ ] {name}" for name in names]
+
+    def render(self, i: int) -> str:
+        """Returns the progress string with the i-th item as the current one."""
+        return "\n".join(
+            self._done_lines[:i] + [self._current_lines[i]] + self._todo_lines[i + 1 :]
+        )
+
+
 def list_available_plan_folders() -> List[Path]:
     """Returns plan folders under books/ that are not marked as ready."""
     books_root = Path("books")
@@ -128,6 +249,14 @@ def prompt_for_plan_selection(plan_folders: List[Path]) -> Optional[str]:
         print("No available plans found in books/.")
         return None
 
+    if not sys.stdin.isatty():
+        # Scripted run: there's nobody to answer the prompt
+        print(f"No terminal to prompt in, using the first plan: {plan_folders[0].name}")
+        return plan_folders[0].name
+
+    # Imported here so that runs with the folder passed on the command line don't pay for it
+    import questionary
+
     choice = questionary.select(
         "Select a plan to execute",
         choices=[
@@ -185,6 +314,21 @@ class FileSystemWriter(ContentWriter):
 
     def __init__(self, root_folder: Path):
         self.root_folder = root_folder
+        self._created_folders = set()
+
+    def _ensure_part_folder(self, part_number: int):
+        """Creates the part folder, at most once per writer."""
+        if part_number in self._created_folders:
+            return
+        part_folder = self.root_folder / f"part_{part_number:02d}"
+        part_folder.mkdir(exist_ok=True)
+        self._created_folders.add(part_number)
+
+    def _write(self, file: Path, content: str):
+        """Writes the file atomically so an interrupted run leaves no partial file."""
+        tmp_file = file.with_name(file.name + ".tmp")
+        tmp_file.write_bytes(content.encode("utf-8"))
+        os.replace(tmp_file, file)
 
     def _get_intro_path(self, part_number: int, chapter_number: int) -> Path:
         return (
@@ -213,26 +357,23 @@ class FileSystemWriter(ContentWriter):
         return self.root_folder / "back_cover.md"
 
     def save_intro(self, part_number, chapter_number, content):
-        part_folder = self.root_folder / f"part_{part_number:02d}"
-        part_folder.mkdir(exist_ok=True)
+        self._ensure_part_folder(part_number)
         file = self._get_intro_path(part_number, chapter_number)
-        file.write_text(content, encoding="utf-8")
+        self._write(file, content)
 
     def save_section(self, part_number, chapter_number, section_number, content):
-        part_folder = self.root_folder / f"part_{part_number:02d}"
-        part_folder.mkdir(exist_ok=True)
+        self._ensure_part_folder(part_number)
         file = self._get_section_path(part_number, chapter_number, section_number)
-        file.write_text(content, encoding="utf-8")
+        self._write(file, content)
 
     def save_part_intro(self, part_number, content):
-        part_folder = self.root_folder / f"part_{part_number:02d}"
-        part_folder.mkdir(exist_ok=True)
+        self._ensure_part_folder(part_number)
         file = self._get_part_intro_path(part_number)
-        file.write_text(content, encoding="utf-8")
+        self._write(file, content)
 
     def save_back_cover(self, content):
         file = self._get_back_cover_path()
-        file.write_text(content, encoding="utf-8")
+        self._write(file, content)
 
     def intro_exists(self, part_number, chapter_number):
         return self._get_intro_path(part_number, chapter_number).exists()
@@ -254,37 +395,131 @@ class CostTracker:
 
     def __init__(self):
         self.total_cost = 0.0
+        self.lock = threading.Lock()
 
-    def update(self, usage_metadata, item_name: str):
+    def update(self, usage_metadata, item_name: str, is_batch: bool = False):
         """Updates the total cost by calculating cost from usage_metadata."""
-        report = calculate_gemini_3_cost(usage_metadata)
-        self.total_cost += report.total_cost
+        report = calculate_gemini_3_cost(usage_metadata, is_batch=is_batch)
+        with self.lock:
+            self.total_cost += report.total_cost
+            total_cost = self.total_cost
         print(
-            f"  {item_name} cost: ${report.total_cost:.6f} | Total so far: ${self.total_cost:.6f}"
+            f"  {item_name} cost: ${report.total_cost:.6f} | Total so far: ${total_cost:.6f}"
         )
 
 
 class BookExecutor:
     """Orchestrates the book generation process."""
 
-    def __init__(self, book_plan: BookPlan, writer: ContentWriter):
+    def __init__(
+        self,
+        book_plan: BookPlan,
+        writer: ContentWriter,
+        max_concurrency: int = 1,
+        cache: Optional[LLMCache] = None,
+        batch_sections: bool = False,
+        parallel_sections: int = 1,
+        chapters_per_call: int = 1,
+        use_batch: bool = False,
+    ):
         self.book_plan = book_plan
         self.writer = writer
         self.tracker = CostTracker()
+        # Number of chapters generated at the same time. 1 keeps the original
+        # sequential flow, anything above switches to the async client.
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        # Write all missing sections of a chapter with a single LLM call
+        self.batch_sections = batch_sections
+        # Number of sections of a chapter written at the same time. The
+        # section prompts only reference the other sections by name, so they
+        # don't depend on each other's content.
+        self.parallel_sections = parallel_sections
+        # Write the sections of this many chapters with a single structured
+        # call. Chapters only see each other's names, not their text.
+        self.chapters_per_call = chapters_per_call
+        # Submit all missing intros and sections as one Batch API job: half
+        # the price, but the results can take hours
+        self.use_batch = use_batch
+
+        self._book_progress: Optional[ProgressView] = None
+        self._chapter_progress: Dict[int, ProgressView] = {}
+
+    def _call_llm(
+        self,
+        instructions: str,
+        prompt: str,
+        item_name: str,
+        response_json_schema: Optional[dict] = None,
+    ):
+        """Calls the LLM (or the cache) and tracks the cost of the call."""
+        if self.cache:
+            cached = self.cache.get(
+                instructions, prompt, response_json_schema=response_json_schema
+            )
+            if cached is not None:
+                print(f"  {item_name} served from cache.")
+                return cached
+
+        response = llm(
+            instructions=instructions,
+            prompt=prompt,
+            response_json_schema=response_json_schema,
+        )
+        self.tracker.update(response.usage_metadata, item_name)
+
+        if self.cache:
+            self.cache.put(
+                instructions,
+                prompt,
+                response,
+                response_json_schema=response_json_schema,
+            )
+        return response
 
-    def process_section(
+    async def _call_llm_async(
+        self,
+        instructions: str,
+        prompt: str,
+        item_name: str,
+        response_json_schema: Optional[dict] = None,
+    ):
+        """Async variant of _call_llm."""
+        if self.cache:
+            cached = self.cache.get(
+                instructions, prompt, response_json_schema=response_json_schema
+            )
+            if cached is not None:
+                print(f"  {item_name} served from cache.")
+                return cached
+
+        response = await llm_async(
+            instructions=instructions,
+            prompt=prompt,
+            response_json_schema=response_json_schema,
+        )
+        self.tracker.update(response.usage_metadata, item_name)
+
+        if self.cache:
+            self.cache.put(
+                instructions,
+                prompt,
+                response,
+                response_json_schema=response_json_schema,
+            )
+        return response
+
+    def _build_section_prompt(
         self,
         section: BookSectionPlan,
         chapter_spec: ChapterSpecs,
         chapter_progress: str,
         book_progress: str,
     ) -> str:
-        """Generates content for a single section."""
-        print(f"  Writing Section: {section.name}")
-
+        """Builds the writer prompt for a single section."""
         section_outline = "\n".join(section.bullet_points)
 
-        section_prompt = section_prompt_template.format(
+        return section_prompt_template.format(
             chapter_name=chapter_spec.chapter.name,
             section_name=section.name,
             section_outline=section_outline,
@@ -292,31 +527,42 @@ class BookExecutor:
             book_progress=book_progress,
         )
 
-        section_response = llm(instructions=writer_instructions, prompt=section_prompt)
-
-        self.tracker.update(section_response.usage_metadata, "Section")
+    def _get_chapter_progress_view(self, current_spec: ChapterSpecs) -> ProgressView:
+        """Returns the (cached) progress view for the sections of a chapter."""
+        view = self._chapter_progress.get(current_spec.chapter_number)
+        if view is None:
+            view = ProgressView(current_spec.sections, name_function=lambda c: c.name)
+            self._chapter_progress[current_spec.chapter_number] = view
+        return view
 
-        return section_response.text
-
-    def _process_chapter_intro(self, current_spec: ChapterSpecs):
-        """Generates and saves the chapter introduction."""
-        if self.writer.intro_exists(
-            current_spec.part_number, current_spec.chapter_number
-        ):
-            print("  Intro already exists, skipping.")
-            return
+    def _build_chapter_progress(self, i: int, current_spec: ChapterSpecs) -> str:
+        """Builds the chapter progress string for the i-th section."""
+        return self._get_chapter_progress_view(current_spec).render(i)
 
-        chapter_overview = yaml.safe_dump(
-            current_spec.chapter.model_dump(), allow_unicode=True, sort_keys=False
-        )
+    def _build_book_progress(
+        self,
+        current_spec: ChapterSpecs,
+        chapters_done: List[ChapterSpecs],
+        chapters_todo: List[ChapterSpecs],
+    ) -> str:
+        """Builds the book progress string for the current chapter."""
+        if self._book_progress is not None:
+            return self._book_progress.render(len(chapters_done))
 
-        intro_response = llm(
-            instructions=chapter_intro_instructions, prompt=chapter_overview
+        return show_progress(
+            chapters_done,
+            current_spec,
+            chapters_todo,
+            name_function=lambda c: c.chapter.name,
         )
 
-        self.tracker.update(intro_response.usage_metadata, "Intro")
+    def _build_chapter_overview(self, current_spec: ChapterSpecs) -> str:
+        """Builds the prompt for the chapter introduction."""
+        # pydantic serializes straight to JSON, without the dict and the YAML emitter
+        return current_spec.chapter.model_dump_json()
 
-        intro_text = intro_response.text
+    def _save_chapter_intro(self, current_spec: ChapterSpecs, intro_text: str):
+        """Adds the chapter heading to the intro and saves it."""
         intro_full_text = (
             f"# {current_spec.chapter_number}. {current_spec.chapter.name}"
             "\n\n"
@@ -327,44 +573,229 @@ class BookExecutor:
             current_spec.part_number, current_spec.chapter_number, intro_full_text
         )
 
-    def _process_single_section(
-        self, i: int, current_spec: ChapterSpecs, book_progress: str
+    def _save_section(
+        self, current_spec: ChapterSpecs, section_number: int, section_content: str
     ):
-        """Processes a single section within a chapter."""
-        current_section = current_spec.sections[i]
-        section_number = i + 1
+        """Adds the section heading to the content and saves it."""
+        current_section = current_spec.sections[section_number - 1]
+        full_section_text = (f"## {current_section.name}\n\n{section_content}").strip()
+
+        self.writer.save_section(
+            current_spec.part_number,
+            current_spec.chapter_number,
+            section_number,
+            full_section_text,
+        )
 
-        if self.writer.section_exists(
+    def _section_exists(self, current_spec: ChapterSpecs, section_number: int) -> bool:
+        """Checks if a section exists and reports when it's skipped."""
+        if not self.writer.section_exists(
             current_spec.part_number, current_spec.chapter_number, section_number
         ):
+            return False
+
+        current_section = current_spec.sections[section_number - 1]
+        print(
+            f"  Section {section_number} ({current_section.name}) already exists, skipping."
+        )
+        return True
+
+    def _intro_exists(self, current_spec: ChapterSpecs) -> bool:
+        """Checks if a chapter intro exists and reports when it's skipped."""
+        if not self.writer.intro_exists(
+            current_spec.part_number, current_spec.chapter_number
+        ):
+            return False
+
+        print("  Intro already exists, skipping.")
+        return True
+
+    def _build_chapter_outline(self, current_spec: ChapterSpecs) -> str:
+        """Lists every section of the chapter with its bullet points."""
+        outline_builder = []
+        for section in current_spec.sections:
+            outline_builder.append(f"{section.name}:")
+            outline_builder.extend(f"- {bp}" for bp in section.bullet_points)
+            outline_builder.append("")
+        return "\n".join(outline_builder).strip()
+
+    def _build_sections_to_write(
+        self, current_spec: ChapterSpecs, missing: List[int]
+    ) -> str:
+        """Numbers the names of the sections that still have to be written."""
+        return "\n".join(
+            f"{n}. {current_spec.sections[i].name}"
+            for n, i in enumerate(missing, start=1)
+        )
+
+    def _build_chapter_sections_prompt(
+        self, current_spec: ChapterSpecs, missing: List[int], book_progress: str
+    ) -> str:
+        """Builds a single prompt asking for all the missing sections."""
+        return chapter_sections_prompt_template.format(
+            chapter_name=current_spec.chapter.name,
+            chapter_outline=self._build_chapter_outline(current_spec),
+            sections_to_write=self._build_sections_to_write(current_spec, missing),
+            book_progress=book_progress,
+        )
+
+    def _build_chapters_sections_prompt(
+        self, pending: List[Tuple[int, ChapterSpecs, List[int]]], book_progress: str
+    ) -> str:
+        """Builds a single prompt asking for the missing sections of several chapters."""
+        chapters = "\n\n".join(
+            chapter_block_template.format(
+                chapter_number=spec.chapter_number,
+                chapter_name=spec.chapter.name,
+                chapter_outline=self._build_chapter_outline(spec),
+                sections_to_write=self._build_sections_to_write(spec, missing),
+            )
+            for _, spec, missing in pending
+        )
+
+        return chapters_sections_prompt_template.format(
+            chapters=chapters,
+            book_progress=book_progress,
+        )
+
+    def _save_chapter_draft(
+        self, current_spec: ChapterSpecs, missing: List[int], response
+    ) -> List[int]:
+        """Saves the sections of a chapter draft.
+
+        Returns the indices of the sections the draft didn't cover. A draft
+        that doesn't parse leaves all of them to the per-section flow.
+        """
+        # Parsed from the text: a response read back from the disk cache
+        # has no typed `parsed` value
+        try:
+            draft = ChapterDraft.model_validate_json(response.text)
+        except ValidationError:
+            print("  Draft could not be parsed, writing the sections one by one.")
+            return missing
+        return self._save_chapter_sections(current_spec, missing, draft)
+
+    def _save_chapter_sections(
+        self, current_spec: ChapterSpecs, missing: List[int], draft: ChapterDraft
+    ) -> List[int]:
+        """Saves the drafted sections and returns the ones that are still missing.
+
+        Drafts are matched to the sections by name, not position, so a
+        reordered, renamed or merged section never lands in the wrong file.
+        """
+        drafts: Dict[str, List[str]] = {}
+        for section_draft in draft.sections:
+            drafts.setdefault(_section_key(section_draft.name), []).append(
+                section_draft.markdown
+            )
+
+        leftover = []
+        for i in missing:
+            matches = drafts.get(_section_key(current_spec.sections[i].name))
+            if not matches:
+                leftover.append(i)
+                continue
+            self._save_section(current_spec, i + 1, matches.pop(0))
+
+        unmatched = sum(len(matches) for matches in drafts.values())
+        if leftover or unmatched:
             print(
-                f"  Section {section_number} ({current_section.name}) already exists, skipping."
+                f"  Draft matched {len(missing) - len(leftover)} of {len(missing)} sections "
+                f"({unmatched} unknown ignored), writing the rest one by one."
             )
-            return
+        return leftover
+
+    def _save_book_draft(
+        self, pending: List[Tuple[int, ChapterSpecs, List[int]]], response
+    ) -> List[Tuple[int, ChapterSpecs, List[int]]]:
+        """Saves the chapters of a multi-chapter draft.
+
+        Returns (chapter index, spec, section indices) for everything the
+        draft didn't cover. A draft that doesn't parse, typically because the response ran
+        into the output token limit, leaves all of it to the per-section flow.
+        """
+        # Parsed from the text for the same reason as in _save_chapter_draft
+        try:
+            draft = BookDraft.model_validate_json(response.text)
+        except ValidationError:
+            print("  Draft could not be parsed, writing the sections one by one.")
+            return pending
+
+        leftover = []
+        for (index, spec, missing), chapter_draft in zip(pending, draft.chapters):
+            remaining = self._save_chapter_sections(spec, missing, chapter_draft)
+            if remaining:
+                leftover.append((index, spec, remaining))
+
+        leftover.extend(pending[len(draft.chapters) :])
+        return leftover
+
+    def _chapter_batches(self, chapter_specs: List[ChapterSpecs]) -> List[List[int]]:
+        """Splits the chapter indices into groups of chapters_per_call."""
+        k = self.chapters_per_call
+        return [
+            list(range(start, min(start + k, len(chapter_specs))))
+            for start in range(0, len(chapter_specs), k)
+        ]
+
+    def _missing_sections(self, current_spec: ChapterSpecs) -> List[int]:
+        """Returns the indices of the sections that still have to be written."""
+        return [
+            i
+            for i in range(len(current_spec.sections))
+            if not self._section_exists(current_spec, i + 1)
+        ]
 
-        sections_completed = current_spec.sections[:i]
-        sections_todo = current_spec.sections[i + 1 :]
+    def process_section(
+        self,
+        section: BookSectionPlan,
+        chapter_spec: ChapterSpecs,
+        chapter_progress: str,
+        book_progress: str,
+    ) -> str:
+        """Generates content for a single section."""
+        print(f"  Writing Section: {section.name}")
 
-        chapter_progress = show_progress(
-            sections_completed,
-            current_section,
-            sections_todo,
-            name_function=lambda c: c.name,
+        section_prompt = self._build_section_prompt(
+            section, chapter_spec, chapter_progress, book_progress
         )
 
-        section_content = self.process_section(
-            current_section, current_spec, chapter_progress, book_progress
+        section_response = self._call_llm(
+            writer_instructions, section_prompt, "Section"
         )
 
-        full_section_text = (f"## {current_section.name}\n\n{section_content}").strip()
+        return section_response.text
 
-        self.writer.save_section(
-            current_spec.part_number,
-            current_spec.chapter_number,
-            section_number,
-            full_section_text,
+    def _process_chapter_intro(self, current_spec: ChapterSpecs):
+        """Generates and saves the chapter introduction."""
+        if self._intro_exists(current_spec):
+            return
+
+        chapter_overview = self._build_chapter_overview(current_spec)
+
+        intro_response = self._call_llm(
+            chapter_intro_instructions, chapter_overview, "Intro"
         )
 
+        self._save_chapter_intro(current_spec, intro_response.text)
+
+    def _process_single_section(
+        self, i: int, current_spec: ChapterSpecs, book_progress: str
+    ):
+        """Processes a single section within a chapter."""
+        section_number = i + 1
+
+        if self._section_exists(current_spec, section_number):
+            return
+
+        chapter_progress = self._build_chapter_progress(i, current_spec)
+
+        section_content = self.process_section(
+            current_spec.sections[i], current_spec, chapter_progress, book_progress
+        )
+
+        self._save_section(current_spec, section_number, section_content)
+
     def _process_chapter_sections(
         self,
         current_spec: ChapterSpecs,
@@ -372,16 +803,103 @@ class BookExecutor:
         chapters_todo: List[ChapterSpecs],
     ):
         """Iterates through and processes all sections in a chapter."""
-        book_progress = show_progress(
-            chapters_done,
-            current_spec,
-            chapters_todo,
-            name_function=lambda c: c.chapter.name,
+        book_progress = self._build_book_progress(
+            current_spec, chapters_done, chapters_todo
         )
 
+        if self.batch_sections:
+            self._process_chapter_sections_batched(current_spec, book_progress)
+            return
+
+        if self.parallel_sections > 1:
+            self._process_chapter_sections_parallel(current_spec, book_progress)
+            return
+
         for i in range(len(current_spec.sections)):
             self._process_single_section(i, current_spec, book_progress)
 
+    def _process_chapter_sections_parallel(
+        self, current_spec: ChapterSpecs, book_progress: str
+    ):
+        """Writes the sections of a chapter with a bounded thread pool."""
+        # Build the view up front so the workers only read from it
+        self._get_chapter_progress_view(current_spec)
+
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.parallel_sections) as pool:
+            futures = {
+                pool.submit(self._process_single_section, i, current_spec, book_progress): i
+                for i in range(len(current_spec.sections))
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"  Section {futures[future] + 1} failed: {e}")
+                    errors.append(e)
+
+        # The other sections are saved, a rerun only has to redo the failed ones
+        if errors:
+            raise errors[0]
+
+    def _process_chapter_sections_batched(
+        self, current_spec: ChapterSpecs, book_progress: str
+    ):
+        """Writes all missing sections of a chapter with one structured call."""
+        missing = self._missing_sections(current_spec)
+        if not missing:
+            return
+
+        print(f"  Writing {len(missing)} sections in one call")
+        prompt = self._build_chapter_sections_prompt(
+            current_spec, missing, book_progress
+        )
+        response = self._call_llm(
+            chapter_sections_instructions,
+            prompt,
+            "Sections",
+            response_json_schema=CHAPTER_DRAFT_SCHEMA,
+        )
+
+        leftover = self._save_chapter_draft(current_spec, missing, response)
+        for i in leftover:
+            self._process_single_section(i, current_spec, book_progress)
+
+    def _process_chapter_batch(
+        self, chapter_specs: List[ChapterSpecs], batch: List[int]
+    ):
+        """Writes the intros and sections of a group of chapters.
+
+        The sections of all the chapters come from a single structured call.
+        """
+        specs = [chapter_specs[i] for i in batch]
+        names = ", ".join(str(spec.chapter_number) for spec in specs)
+        print(f"Processing Chapters {names}")
+
+        for spec in specs:
+            self._process_chapter_intro(spec)
+
+        pending = [(i, spec, self._missing_sections(spec)) for i, spec in zip(batch, specs)]
+        pending = [(i, spec, missing) for i, spec, missing in pending if missing]
+        if not pending:
+            return
+
+        print(f"  Writing {len(pending)} chapters in one call")
+        prompt = self._build_chapters_sections_prompt(
+            pending, self._book_progress.render(batch[0])
+        )
+        response = self._call_llm(
+            chapters_sections_instructions,
+            prompt,
+            "Chapters",
+            response_json_schema=BOOK_DRAFT_SCHEMA,
+        )
+
+        for index, spec, missing in self._save_book_draft(pending, response):
+            book_progress = self._book_progress.render(index)
+            for i in missing:
+                self._process_single_section(i, spec, book_progress)
+
     def process_chapter(
         self,
         current_spec: ChapterSpecs,
@@ -400,25 +918,216 @@ class BookExecutor:
         chapter_cost = self.tracker.total_cost - start_cost
         print(f"Chapter {current_spec.chapter_number} cost: ${chapter_cost:.6f}")
 
-    def _build_chapter_specs(self) -> List[ChapterSpecs]:
-        """Builds a flat list of chapter specifications from the book plan."""
-        chapter_specs = []
-        part_idx = 0
-        chapter_idx = 0
-
-        for part in self.book_plan.parts:
-            part_idx += 1
-            for chapter in part.chapters:
-                chapter_idx += 1
-                specs = ChapterSpecs(
-                    part=part,
-                    part_number=part_idx,
-                    chapter=chapter,
-                    chapter_number=chapter_idx,
-                    sections=chapter.sections,
+    async def process_section_async(
+        self,
+        section: BookSectionPlan,
+        chapter_spec: ChapterSpecs,
+        chapter_progress: str,
+        book_progress: str,
+    ) -> str:
+        """Async variant of process_section."""
+        print(f"  Writing Section: {section.name}")
+
+        section_prompt = self._build_section_prompt(
+            section, chapter_spec, chapter_progress, book_progress
+        )
+
+        section_response = await self._call_llm_async(
+            writer_instructions, section_prompt, "Section"
+        )
+
+        return section_response.text
+
+    async def _process_chapter_intro_async(self, current_spec: ChapterSpecs):
+        """Async variant of _process_chapter_intro."""
+        if self._intro_exists(current_spec):
+            return
+
+        chapter_overview = self._build_chapter_overview(current_spec)
+
+        intro_response = await self._call_llm_async(
+            chapter_intro_instructions, chapter_overview, "Intro"
+        )
+
+        self._save_chapter_intro(current_spec, intro_response.text)
+
+    async def _process_single_section_async(
+        self, i: int, current_spec: ChapterSpecs, book_progress: str
+    ):
+        """Async variant of _process_single_section."""
+        section_number = i + 1
+
+        if self._section_exists(current_spec, section_number):
+            return
+
+        chapter_progress = self._build_chapter_progress(i, current_spec)
+
+        section_content = await self.process_section_async(
+            current_spec.sections[i], current_spec, chapter_progress, book_progress
+        )
+
+        self._save_section(current_spec, section_number, section_content)
+
+    async def _process_chapter_sections_async(
+        self,
+        current_spec: ChapterSpecs,
+        chapters_done: List[ChapterSpecs],
+        chapters_todo: List[ChapterSpecs],
+    ):
+        """Async variant of _process_chapter_sections."""
+        book_progress = self._build_book_progress(
+            current_spec, chapters_done, chapters_todo
+        )
+
+        if self.batch_sections:
+            await self._process_chapter_sections_batched_async(
+                current_spec, book_progress
+            )
+            return
+
+        if self.parallel_sections > 1:
+            semaphore = asyncio.Semaphore(self.parallel_sections)
+
+            async def run_section(i: int):
+                async with semaphore:
+                    await self._process_single_section_async(
+                        i, current_spec, book_progress
+                    )
+
+            await asyncio.gather(
+                *(run_section(i) for i in range(len(current_spec.sections)))
+            )
+            return
+
+        for i in range(len(current_spec.sections)):
+            await self._process_single_section_async(i, current_spec, book_progress)
+
+    async def _process_chapter_sections_batched_async(
+        self, current_spec: ChapterSpecs, book_progress: str
+    ):
+        """Async variant of _process_chapter_sections_batched."""
+        missing = self._missing_sections(current_spec)
+        if not missing:
+            return
+
+        print(f"  Writing {len(missing)} sections in one call")
+        prompt = self._build_chapter_sections_prompt(
+            current_spec, missing, book_progress
+        )
+        response = await self._call_llm_async(
+            chapter_sections_instructions,
+            prompt,
+            "Sections",
+            response_json_schema=CHAPTER_DRAFT_SCHEMA,
+        )
+
+        leftover = self._save_chapter_draft(current_spec, missing, response)
+        for i in leftover:
+            await self._process_single_section_async(i, current_spec, book_progress)
+
+    async def _process_chapter_batch_async(
+        self, chapter_specs: List[ChapterSpecs], batch: List[int]
+    ):
+        """Async variant of _process_chapter_batch."""
+        specs = [chapter_specs[i] for i in batch]
+        names = ", ".join(str(spec.chapter_number) for spec in specs)
+        print(f"Processing Chapters {names}")
+
+        intros = asyncio.gather(
+            *(self._process_chapter_intro_async(spec) for spec in specs)
+        )
+
+        pending = [(i, spec, self._missing_sections(spec)) for i, spec in zip(batch, specs)]
+        pending = [(i, spec, missing) for i, spec, missing in pending if missing]
+        if not pending:
+            await intros
+            return
+
+        print(f"  Writing {len(pending)} chapters in one call")
+        prompt = self._build_chapters_sections_prompt(
+            pending, self._book_progress.render(batch[0])
+        )
+        response, _ = await asyncio.gather(
+            self._call_llm_async(
+                chapters_sections_instructions,
+                prompt,
+                "Chapters",
+                response_json_schema=BOOK_DRAFT_SCHEMA,
+            ),
+            intros,
+        )
+
+        for index, spec, missing in self._save_book_draft(pending, response):
+            book_progress = self._book_progress.render(index)
+            for i in missing:
+                await self._process_single_section_async(i, spec, book_progress)
+
+    async def process_chapter_async(
+        self,
+        current_spec: ChapterSpecs,
+        chapters_done: List[ChapterSpecs],
+        chapters_todo: List[ChapterSpecs],
+    ):
+        """Processes a chapter, writing the intro alongside the sections."""
+        print(
+            f"Processing Chapter {current_spec.chapter_number}: {current_spec.chapter.name}"
+        )
+
+        await asyncio.gather(
+            self._process_chapter_intro_async(current_spec),
+            self._process_chapter_sections_async(
+                current_spec, chapters_done, chapters_todo
+            ),
+        )
+
+    async def _process_all_chapters_async(self, chapter_specs: List[ChapterSpecs]):
+        """Processes up to max_concurrency chapters at the same time."""
+        print(
+            f"Total chapters to write: {len(chapter_specs)} "
+            f"(concurrency: {self.max_concurrency})"
+        )
+        self._book_progress = ProgressView(
+            chapter_specs, name_function=lambda c: c.chapter.name
+        )
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self.chapters_per_call > 1:
+
+            async def run_batch(batch: List[int]):
+                async with semaphore:
+                    await self._process_chapter_batch_async(chapter_specs, batch)
+
+            await asyncio.gather(
+                *(run_batch(batch) for batch in self._chapter_batches(chapter_specs))
+            )
+            return
+
+        async def run_chapter(i: int, current_spec: ChapterSpecs):
+            chapters_done = chapter_specs[:i]
+            chapters_todo = chapter_specs[i + 1 :]
+
+            async with semaphore:
+                await self.process_chapter_async(
+                    current_spec, chapters_done, chapters_todo
                 )
-                chapter_specs.append(specs)
-        return chapter_specs
+            print(f"Chapter {current_spec.chapter_number} completed.")
+
+        await asyncio.gather(
+            *(run_chapter(i, spec) for i, spec in enumerate(chapter_specs))
+        )
+
+    @functools.cached_property
+    def chapter_specs(self) -> List[ChapterSpecs]:
+        """Flat list of chapter specifications, built once from the book plan."""
+        # Chapters are numbered across the whole book, not per part
+        chapter_numbers = itertools.count(1)
+        return [
+            ChapterSpecs(
+                part, part_number, chapter, next(chapter_numbers), chapter.sections
+            )
+            for part_number, part in enumerate(self.book_plan.parts, start=1)
+            for chapter in part.chapters
+        ]
 
     def _process_back_cover(self):
         """Saves the back cover description."""
@@ -431,6 +1140,7 @@ class BookExecutor:
 
     def _process_part_intros(self):
         """Saves the part introductions."""
+        part_label = get_part_label(self.book_plan.book_language)
         for i, part in enumerate(self.book_plan.parts):
             part_number = i + 1
             if self.writer.part_intro_exists(part_number):
@@ -438,7 +1148,6 @@ class BookExecutor:
                 continue
 
             print(f"Saving Part {part_number} intro...")
-            part_label = get_part_label(self.book_plan.book_language)
             content = (
                 f"# {part_label} {part_number}: {part.name}\n\n{part.introduction}"
             )
@@ -447,6 +1156,14 @@ class BookExecutor:
     def _process_all_chapters(self, chapter_specs: List[ChapterSpecs]):
         """Iterates through and processes all chapters."""
         print(f"Total chapters to write: {len(chapter_specs)}")
+        self._book_progress = ProgressView(
+            chapter_specs, name_function=lambda c: c.chapter.name
+        )
+
+        if self.chapters_per_call > 1:
+            for batch in self._chapter_batches(chapter_specs):
+                self._process_chapter_batch(chapter_specs, batch)
+            return
 
         for i, current_spec in enumerate(chapter_specs):
             chapters_done = chapter_specs[:i]
@@ -455,16 +1172,121 @@ class BookExecutor:
             self.process_chapter(current_spec, chapters_done, chapters_todo)
             print(f"Chapter {current_spec.chapter_number} completed.")
 
+    def _build_batch_items(
+        self, chapter_specs: List[ChapterSpecs]
+    ) -> List[Tuple[str, str, str, Callable[[str], None]]]:
+        """Collects (item name, instructions, prompt, save) for everything missing.
+
+        The section prompts only depend on the plan, so every chapter can go
+        into the same job.
+        """
+        self._book_progress = ProgressView(
+            chapter_specs, name_function=lambda c: c.chapter.name
+        )
+
+        items = []
+        for chapter_index, spec in enumerate(chapter_specs):
+            if not self._intro_exists(spec):
+                items.append(
+                    (
+                        "Intro",
+                        chapter_intro_instructions,
+                        self._build_chapter_overview(spec),
+                        functools.partial(self._save_chapter_intro, spec),
+                    )
+                )
+
+            book_progress = self._book_progress.render(chapter_index)
+            for i in self._missing_sections(spec):
+                prompt = self._build_section_prompt(
+                    spec.sections[i],
+                    spec,
+                    self._build_chapter_progress(i, spec),
+                    book_progress,
+                )
+                items.append(
+                    (
+                        "Section",
+                        writer_instructions,
+                        prompt,
+                        functools.partial(self._save_section, spec, i + 1),
+                    )
+                )
+        return items
+
+    def _process_all_chapters_batch(self, chapter_specs: List[ChapterSpecs]):
+        """Writes all missing intros and sections with a single inline Batch API job."""
+        items = self._build_batch_items(chapter_specs)
+        print(f"Total requests to submit: {len(items)}")
+        if not items:
+            return
+
+        configs = {
+            instructions: types.GenerateContentConfig(system_instruction=instructions)
+            for instructions in (chapter_intro_instructions, writer_instructions)
+        }
+        inlined_requests = [
+            types.InlinedRequest(contents=prompt, config=configs[instructions])
+            for _, instructions, prompt, _ in items
+        ]
+
+        client = get_client()
+        batch_job = client.batches.create(
+            model=BATCH_MODEL,
+            src=inlined_requests,
+            config={"display_name": f"{self.book_plan.slug}-sections"},
+        )
+        print(f"Batch job created: {batch_job.name}")
+        print("Waiting for job to complete...")
+
+        batch_job = wait_for_batch(client, batch_job)
+
+        # Inline responses come back in the order of the requests. Failed
+        # items stay missing, so a rerun only submits those.
+        for (item_name, _, _, save), inlined_response in zip(
+            items, batch_job.dest.inlined_responses
+        ):
+            if inlined_response.error:
+                print(f"  {item_name} failed: {inlined_response.error}")
+                continue
+
+            response = inlined_response.response
+            self.tracker.update(response.usage_metadata, item_name, is_batch=True)
+            save(response.text)
+
     def execute(self):
         """Executes the entire book generation plan."""
         self._process_back_cover()
         self._process_part_intros()
-        chapter_specs = self._build_chapter_specs()
-        self._process_all_chapters(chapter_specs)
+        chapter_specs = self.chapter_specs
+        if self.use_batch:
+            self._process_all_chapters_batch(chapter_specs)
+        elif self.max_concurrency > 1:
+            asyncio.run(self._process_all_chapters_async(chapter_specs))
+        else:
+            self._process_all_chapters(chapter_specs)
         print(f"Execution completed. Total Cost: ${self.tracker.total_cost:.6f}")
 
 
-def execute_plan(folder: str):
+@functools.lru_cache(maxsize=16)
+def _load_plan(path_str: str, mtime_ns: int) -> BookPlan:
+    """Parses and validates a plan file.
+
+    The modification time is part of the cache key, so an edited plan is
+    loaded again while repeated calls from a notebook are served from memory.
+    """
+    return load_plan_model(Path(path_str), BookPlan)
+
+
+def execute_plan(
+    folder: str,
+    max_concurrency: int = 1,
+    use_cache: bool = False,
+    batch_sections: bool = False,
+    parallel_sections: int = 1,
+    chapters_per_call: int = 1,
+    use_batch: bool = False,
+):
     root_folder = Path("books") / folder
     plan_yaml = root_folder / "plan.yaml"
 
@@ -478,20 +1300,87 @@ def execute_plan(folder: str):
         return
 
     print(f"Loading plan from {plan_yaml}...")
-    with plan_yaml.open("rt", encoding="utf-8") as f_in:
-        data = yaml.safe_load(f_in)
-        book_plan = BookPlan.model_validate(data)
+    book_plan = _load_plan(str(plan_yaml), plan_yaml.stat().st_mtime_ns)
 
     writer = FileSystemWriter(root_folder)
-    executor = BookExecutor(book_plan, writer)
+    cache = LLMCache(root_folder / ".llm_cache") if use_cache else None
+    executor = BookExecutor(
+        book_plan,
+        writer,
+        max_concurrency=max_concurrency,
+        cache=cache,
+        batch_sections=batch_sections,
+        parallel_sections=parallel_sections,
+        chapters_per_call=chapters_per_call,
+        use_batch=use_batch,
+    )
     executor.execute()
 
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        execute_plan(sys.argv[1])
-    else:
+def main():
+    """
+    uv run python -m book_generator.execute fireworks-ru --concurrency 4
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate the book content from a plan in books/<folder>."
+    )
+    parser.add_argument(
+        "folder",
+        nargs="?",
+        help="Book folder under books/. Prompts for a plan when omitted.",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of chapters to generate at the same time (default: 1).",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Cache LLM responses in books/<folder>/.llm_cache and reuse them.",
+    )
+    parser.add_argument(
+        "--batch-sections",
+        action="store_true",
+        help="Write all sections of a chapter with a single LLM call.",
+    )
+    parser.add_argument(
+        "--parallel-sections",
+        type=int,
+        default=1,
+        help="Number of sections of a chapter to write at the same time (default: 1).",
+    )
+    parser.add_argument(
+        "--chapters-per-call",
+        type=int,
+        default=1,
+        help="Write the sections of this many chapters with one LLM call (default: 1).",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Submit all missing intros and sections as one Batch API job (half the cost, slower).",
+    )
+    args = parser.parse_args()
+
+    folder = args.folder
+    if not folder:
         available_plans = list_available_plan_folders()
-        selected_plan = prompt_for_plan_selection(available_plans)
-        if selected_plan:
-            execute_plan(selected_plan)
+        folder = prompt_for_plan_selection(available_plans)
+
+    if folder:
+        execute_plan(
+            folder,
+            max_concurrency=args.concurrency,
+            use_cache=args.cache,
+            batch_sections=args.batch_sections,
+            parallel_sections=args.parallel_sections,
+            chapters_per_call=args.chapters_per_call,
+            use_batch=args.batch,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from google.genai import types
+from pydantic import ValidationError
+
+
+class LLMCache:
+    """On-disk cache of LLM responses keyed by (instructions, prompt, model).
+
+    Each response is stored as JSON under `cache_dir/<sha256>.json`, so a rerun
+    with the same prompts is served from disk instead of calling Gemini again.
+    Structured calls also include their response schema in the key.
+    """
+
+    def __init__(self, cache_dir: Path = Path(".llm_cache")):
+        self.cache_dir = Path(cache_dir)
+        self._memory = {}
+        # Set after the first put, so later ones skip the mkdir
+        self._dir_ready = False
+
+    def _key(
+        self,
+        instructions: str,
+        prompt: str,
+        model: str,
+        response_json_schema: Optional[dict] = None,
+    ) -> str:
+        parts = [instructions, prompt, model]
+        if response_json_schema is not None:
+            # Left out for plain text calls so existing cache files still match
+            parts.append(json.dumps(response_json_schema, sort_keys=True))
+        payload = "\0".join(parts)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(
+        self,
+        instructions: str,
+        prompt: str,
+        model: str = "models/gemini-3-pro-preview",
+        response_json_schema: Optional[dict] = None,
+    ) -> Optional[types.GenerateContentResponse]:
+        """Returns the cached response or None on a miss."""
+        key = self._key(instructions, prompt, model, response_json_schema)
+        if key in self._memory:
+            return self._memory[key]
+
+        try:
+            data = self._get_path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+        try:
+            response = types.GenerateContentResponse.model_validate_json(data)
+        except ValidationError:
+            # A broken file is a miss, the next put overwrites it
+            return None
+        self._memory[key] = response
+        return response
+
+    def put(
+        self,
+        instructions: str,
+        prompt: str,
+        response: types.GenerateContentResponse,
+        model: str = "models/gemini-3-pro-preview",
+        response_json_schema: Optional[dict] = None,
+    ):
+        """Stores the response for the given request."""
+        key = self._key(instructions, prompt, model, response_json_schema)
+        self._memory[key] = response
+
+        if not self._dir_ready:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._dir_ready = True
+        # Written atomically so an interrupted run leaves no truncated file.
+        # The temp name is per thread, parallel workers can store the same key.
+        path = self._get_path(key)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(response.model_dump_json(exclude_none=True).encode("utf-8"))
+        os.replace(tmp_path, path)
@@ -1,26 +1,47 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from dataclasses import dataclass
 from typing import Literal
 
 
 class BookSectionPlan(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
     bullet_points: list[str]
 
 
 class BookChapterPlan(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
     # chapter_intro: str
     sections: list[BookSectionPlan]
 
 
 class BookPartPlan(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
     introduction: str
     chapters: list[BookChapterPlan]
 
 
+class SectionDraft(BaseModel):
+    name: str
+    markdown: str
+
+
+class ChapterDraft(BaseModel):
+    sections: list[SectionDraft]
+
+
+class BookDraft(BaseModel):
+    chapters: list[ChapterDraft]
+
+
 class BookPlan(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     book_language: Literal["ru", "en", "de"]
     name: str
     slug: str  # Filesystem-safe short name
@@ -29,7 +50,7 @@ class BookPlan(BaseModel):
     parts: list[BookPartPlan]
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ChapterSpecs:
     part: BookPartPlan
     part_number: int
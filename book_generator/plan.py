@@ -1,11 +1,14 @@
 import argparse
 from pathlib import Path
 
-import yaml
-
 from google.genai import types
 from book_generator.models import BookPlan
-from book_generator.utils import get_client, calculate_gemini_3_cost
+from book_generator.utils import (
+    get_client,
+    calculate_gemini_3_cost,
+    yaml_dump,
+    write_plan_json,
+)
 
 planner_instructions = """
 Your role is planning the book. 
@@ -27,34 +30,48 @@ Do not add numbers to chapter and section names. It will be added later automati
 IMPORTANT: Generate a 'slug' field that is a filesystem-safe version of the book name (lowercase, hyphens instead of spaces, max 50 chars, no special characters except hyphens).
 """
 
+BOOK_PLAN_SCHEMA = BookPlan.model_json_schema()
 
-def generate_text_plan_stream(topic: str, size: str):
-    """Generate initial book plan as streaming text."""
-    instructions = "You are a book planning assistant. Create detailed, comprehensive book outlines."
-    prompt = f"""Create a detailed book plan for the following:
+text_plan_instructions = "You are a book planning assistant. Create detailed, comprehensive book outlines."
+refine_plan_instructions = "You are a book planning assistant. Update the book outline based on user feedback."
 
-Topic: {topic}
-Size: {size}
+# The configs don't depend on the call arguments, so they're built once
+text_plan_config = types.GenerateContentConfig(
+    system_instruction=text_plan_instructions,
+)
+refine_plan_config = types.GenerateContentConfig(
+    system_instruction=refine_plan_instructions,
+)
+book_plan_config = types.GenerateContentConfig(
+    system_instruction=planner_instructions,
+    response_mime_type="application/json",
+    response_json_schema=BOOK_PLAN_SCHEMA,
+)
 
-Please provide a comprehensive book outline including parts (if applicable), chapters, and sections with brief descriptions."""
 
+def stream_text(config, prompt):
+    """
+    Streams a Gemini response as text.
+
+    Yields the text chunks, then ("__DONE__", full_text, cost).
+    """
     client = get_client()
     response = client.models.generate_content_stream(
         model="models/gemini-3-pro-preview",
-        config=types.GenerateContentConfig(
-            system_instruction=instructions,
-        ),
+        config=config,
         contents=prompt,
     )
 
-    full_text = ""
+    text_parts = []
     last_chunk = None
     for chunk in response:
         last_chunk = chunk
         if chunk.text:
-            full_text += chunk.text
+            text_parts.append(chunk.text)
             yield chunk.text
 
+    full_text = "".join(text_parts)
+
     # Get usage from the last chunk
     if last_chunk and hasattr(last_chunk, "usage_metadata"):
         cost_report = calculate_gemini_3_cost(last_chunk.usage_metadata)
@@ -64,9 +81,20 @@ Please provide a comprehensive book outline including parts (if applicable), cha
         yield ("__DONE__", full_text, 0.0)
 
 
+def generate_text_plan_stream(topic: str, size: str):
+    """Generate initial book plan as streaming text."""
+    prompt = f"""Create a detailed book plan for the following:
+
+Topic: {topic}
+Size: {size}
+
+Please provide a comprehensive book outline including parts (if applicable), chapters, and sections with brief descriptions."""
+
+    yield from stream_text(text_plan_config, prompt)
+
+
 def refine_text_plan_stream(current_plan: str, feedback: str):
     """Refine text plan based on feedback with streaming."""
-    instructions = "You are a book planning assistant. Update the book outline based on user feedback."
     prompt = f"""Current plan:
 
 {current_plan}
@@ -75,30 +103,7 @@ User request: {feedback}
 
 Please provide the updated plan."""
 
-    client = get_client()
-    response = client.models.generate_content_stream(
-        model="models/gemini-3-pro-preview",
-        config=types.GenerateContentConfig(
-            system_instruction=instructions,
-        ),
-        contents=prompt,
-    )
-
-    full_text = ""
-    last_chunk = None
-    for chunk in response:
-        last_chunk = chunk
-        if chunk.text:
-            full_text += chunk.text
-            yield chunk.text
-
-    # Get usage from the last chunk
-    if last_chunk and hasattr(last_chunk, "usage_metadata"):
-        cost_report = calculate_gemini_3_cost(last_chunk.usage_metadata)
-        yield ("__DONE__", full_text, cost_report.total_cost)
-    else:
-        # Fallback if no usage metadata
-        yield ("__DONE__", full_text, 0.0)
+    yield from stream_text(refine_plan_config, prompt)
 
 
 def create_book_plan(prompt):
@@ -107,20 +112,29 @@ def create_book_plan(prompt):
     client = get_client()
     plan_response = client.models.generate_content(
         model="models/gemini-3-pro-preview",
-        config=types.GenerateContentConfig(
-            system_instruction=planner_instructions,
-            response_mime_type="application/json",
-            response_json_schema=BookPlan.model_json_schema(),
-        ),
+        config=book_plan_config,
         contents=prompt,
     )
 
-    calculate_gemini_3_cost(plan_response.usage_metadata, print_cost=True)
-    book_plan = BookPlan.model_validate(plan_response.parsed)
-    cost_report = calculate_gemini_3_cost(plan_response.usage_metadata)
+    cost_report = calculate_gemini_3_cost(plan_response.usage_metadata, print_cost=True)
+    book_plan = BookPlan.model_validate_json(plan_response.text)
     return book_plan, cost_report.total_cost
 
 
+def create_book_plan_stream(prompt):
+    """
+    Create structured book plan from text, streaming the JSON as it arrives.
+
+    Yields the raw JSON text chunks, then ("__DONE__", book_plan, cost).
+    """
+    for chunk in stream_text(book_plan_config, prompt):
+        if isinstance(chunk, tuple) and chunk[0] == "__DONE__":
+            _, full_text, cost = chunk
+            yield ("__DONE__", BookPlan.model_validate_json(full_text), cost)
+        else:
+            yield chunk
+
+
 def save_plan(book_plan, destination):
     """
     Save the book plan to YAML. Destination can be a directory or a file path.
@@ -136,9 +150,9 @@ def save_plan(book_plan, destination):
     folder_path.mkdir(parents=True, exist_ok=True)
 
     with plan_yaml.open("wt", encoding="utf-8") as f_out:
-        yaml.safe_dump(
-            book_plan.model_dump(), f_out, allow_unicode=True, sort_keys=False
-        )
+        yaml_dump(book_plan.model_dump(), f_out)
+    # The first execute run can then skip parsing the YAML it just got
+    write_plan_json(plan_yaml, book_plan)
     print(f"Plan saved to {plan_yaml}")
     return plan_yaml
 
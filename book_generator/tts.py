@@ -1,15 +1,88 @@
-import os
-import wave
-import threading
+import asyncio
+import functools
 import io
-from pathlib import Path
-from typing import Optional
-from concurrent.futures import ThreadPoolExecutor
+import queue
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Set
 from tqdm.auto import tqdm
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from book_generator.utils import get_client, calculate_tts_cost
 
+# Markdown files smaller than this are empty stubs with nothing to read out
+MIN_TTS_BYTES = 8
+
+# Long chapters are uploaded in 8 MB parts, four at a time
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024, max_concurrency=4
+)
+
+# botocore only computes CRC32C with the awscrt extension (boto3[crt]);
+# CRC32 goes through zlib and needs nothing extra
+try:
+    import awscrt  # noqa: F401
+
+    S3_CHECKSUM_ALGORITHM = "CRC32C"
+except ImportError:
+    S3_CHECKSUM_ALGORITHM = "CRC32"
+
+# RIFF/WAVE header of a PCM file: everything before the sample data
+_WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
+
+def _wav_header(
+    n_bytes: int, channels: int = 1, rate: int = 24000, sample_width: int = 2
+) -> bytes:
+    """Builds the 44-byte header for n_bytes of PCM data."""
+    return _WAV_HEADER.pack(
+        b"RIFF",
+        36 + n_bytes,
+        b"WAVE",
+        b"fmt ",
+        16,  # fmt chunk size
+        1,  # PCM
+        channels,
+        rate,
+        rate * channels * sample_width,  # byte rate
+        channels * sample_width,  # block align
+        sample_width * 8,  # bits per sample
+        b"data",
+        n_bytes,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_s3_client(max_pool_connections: int = 32):
+    """Returns a shared S3 client (boto3 clients are thread-safe).
+
+    The connection pool is sized for the number of concurrent uploads, so
+    bursts reuse kept-alive connections instead of opening new ones.
+    """
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        retries={"max_attempts": 5, "mode": "adaptive"},
+        tcp_keepalive=True,
+    )
+    return boto3.client("s3", config=config)
+
+
+@dataclass(slots=True)
+class TTSJob:
+    """A markdown file to convert, with its output locations."""
+
+    src: Path
+    rel: PurePosixPath  # Relative to the book folder
+    out: Path  # Local WAV path
+    s3_key: str
+
 
 class TTSGenerator:
     def __init__(
@@ -18,15 +91,31 @@ class TTSGenerator:
         voice_name: str = "Charon",
         num_threads: int = 1,
         s3_bucket: Optional[str] = None,
+        verbose: bool = True,
     ):
         self.model = model
         self.voice_name = voice_name
+        # Generation config for an audio response, shared by every request
+        self._tts_config = {
+            "response_modalities": ["AUDIO"],
+            "speech_config": {
+                "voice_config": {
+                    "prebuilt_voice_config": {"voice_name": voice_name}
+                }
+            },
+        }
         self.client = get_client()
         self.total_cost = 0.0
         self.cost_lock = threading.Lock()
         self.num_threads = num_threads
         self.s3_bucket = s3_bucket
-        self.s3_client = boto3.client("s3") if s3_bucket else None
+        # Per-file "Processing"/"Skipping" messages; the progress bar is always shown
+        self.verbose = verbose
+        self.s3_client = (
+            get_s3_client(max(32, num_threads * 2)) if s3_bucket else None
+        )
+        # Keys already in the bucket, listed once per book
+        self._existing_s3_keys: Optional[Set[str]] = None
 
     def _save_wave_file(
         self,
@@ -37,11 +126,10 @@ class TTSGenerator:
         sample_width: int = 2,
     ):
         """Saves PCM data to a WAV file."""
-        with wave.open(str(filename), "wb") as wf:
-            wf.setnchannels(channels)
-            wf.setsampwidth(sample_width)
-            wf.setframerate(rate)
-            wf.writeframes(pcm_data)
+        # Two writes instead of concatenating, which would copy the whole PCM
+        with open(filename, "wb") as fh:
+            fh.write(_wav_header(len(pcm_data), channels, rate, sample_width))
+            fh.write(pcm_data)
 
     def _create_wave_bytes(
         self,
@@ -51,26 +139,60 @@ class TTSGenerator:
         sample_width: int = 2,
     ) -> bytes:
         """Creates WAV file bytes from PCM data."""
-        buffer = io.BytesIO()
-        with wave.open(buffer, "wb") as wf:
-            wf.setnchannels(channels)
-            wf.setsampwidth(sample_width)
-            wf.setframerate(rate)
-            wf.writeframes(pcm_data)
-        return buffer.getvalue()
+        return _wav_header(len(pcm_data), channels, rate, sample_width) + pcm_data
 
     def _upload_to_s3(self, wav_bytes: bytes, s3_key: str):
         """Uploads WAV bytes to S3."""
         try:
-            self.s3_client.put_object(
+            # BytesIO shares the buffer of wav_bytes, and the transfer manager
+            # reads it in chunks instead of signing one full-size body
+            self.s3_client.upload_fileobj(
+                Fileobj=io.BytesIO(wav_bytes),
                 Bucket=self.s3_bucket,
                 Key=s3_key,
-                Body=wav_bytes,
-                ContentType="audio/wav",
+                ExtraArgs={
+                    "ContentType": "audio/wav",
+                    "ChecksumAlgorithm": S3_CHECKSUM_ALGORITHM,
+                },
+                Config=S3_TRANSFER_CONFIG,
             )
         except Exception as e:
             raise Exception(f"Failed to upload to S3: {e}")
 
+    def _log(self, message: str):
+        """Prints a per-file status message when running verbose."""
+        if self.verbose:
+            tqdm.write(message)
+
+    def _response_to_wave_bytes(self, response) -> Optional[bytes]:
+        """Extracts the audio of a TTS response as WAV bytes and tracks its cost."""
+        if not response.candidates:
+            tqdm.write("No candidates returned")
+            return None
+
+        parts = response.candidates[0].content.parts
+        if not parts:
+            tqdm.write("No parts returned")
+            return None
+
+        inline_data = parts[0].inline_data
+        if not inline_data or not inline_data.data:
+            tqdm.write("No audio data returned")
+            return None
+
+        # Create WAV bytes from PCM data
+        wav_bytes = self._create_wave_bytes(inline_data.data)
+
+        # Calculate and track cost
+        cost = calculate_tts_cost(
+            response.usage_metadata, is_batch=False, print_cost=False
+        )
+        with self.cost_lock:
+            self.total_cost += cost
+        tqdm.write(f"  Cost: ${cost:.6f}")
+
+        return wav_bytes
+
     def generate_audio_bytes(self, text: str) -> Optional[bytes]:
         """Generates audio from text and returns WAV bytes."""
         if not text.strip():
@@ -80,42 +202,26 @@ class TTSGenerator:
             response = self.client.models.generate_content(
                 model=self.model,
                 contents=text,
-                config={
-                    "response_modalities": ["AUDIO"],
-                    "speech_config": {
-                        "voice_config": {
-                            "prebuilt_voice_config": {"voice_name": self.voice_name}
-                        }
-                    },
-                },
+                config=self._tts_config,
             )
+            return self._response_to_wave_bytes(response)
 
-            if not response.candidates:
-                tqdm.write("No candidates returned")
-                return None
-
-            parts = response.candidates[0].content.parts
-            if not parts:
-                tqdm.write("No parts returned")
-                return None
-
-            inline_data = parts[0].inline_data
-            if not inline_data or not inline_data.data:
-                tqdm.write("No audio data returned")
-                return None
+        except Exception as e:
+            tqdm.write(f"Error generating audio: {e}")
+            return None
 
-            # Create WAV bytes from PCM data
-            wav_bytes = self._create_wave_bytes(inline_data.data)
+    async def generate_audio_bytes_async(self, text: str) -> Optional[bytes]:
+        """Async variant of generate_audio_bytes."""
+        if not text.strip():
+            return None
 
-            # Calculate and track cost
-            cost = calculate_tts_cost(
-                response.usage_metadata, is_batch=False, print_cost=False
+        try:
+            response = await self.client.aio.models.generate_content(
+                model=self.model,
+                contents=text,
+                config=self._tts_config,
             )
-            with self.cost_lock:
-                self.total_cost += cost
-            tqdm.write(f"  Cost: ${cost:.6f}")
-
-            return wav_bytes
+            return self._response_to_wave_bytes(response)
 
         except Exception as e:
             tqdm.write(f"Error generating audio: {e}")
@@ -129,52 +235,143 @@ class TTSGenerator:
             output_path.write_bytes(wav_bytes)
             tqdm.write(f"  Generated {output_path.name}")
 
+    def _list_s3_keys(self, prefix: str) -> Set[str]:
+        """Lists all keys under the prefix, 1000 per request."""
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        return {
+            obj["Key"]
+            for page in paginator.paginate(Bucket=self.s3_bucket, Prefix=prefix)
+            for obj in page.get("Contents", [])
+        }
+
     def _s3_file_exists(self, s3_key: str) -> bool:
         """Check if a file exists in S3."""
+        if self._existing_s3_keys is not None:
+            return s3_key in self._existing_s3_keys
+
         try:
             self.s3_client.head_object(Bucket=self.s3_bucket, Key=s3_key)
             return True
-        except:
-            return False
+        except ClientError as e:
+            # Credential and throttling errors must not read as "not generated yet"
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _is_tiny(self, file_path: Path) -> bool:
+        """Checks the size on disk so empty stubs are never read or sent."""
+        if file_path.stat().st_size < MIN_TTS_BYTES:
+            self._log(f"Skipping tiny: {file_path}")
+            return True
+        return False
+
+    def _scan_markdown(self, base_path: Path) -> List[Path]:
+        """Returns the markdown files of a book in a stable order."""
+        return sorted(base_path.rglob("*.md"))
 
-    def _process_single_file(
+    def _build_job(
         self, file_path: Path, base_path: Path, audio_base_path: Path, book_name: str
-    ):
+    ) -> TTSJob:
+        """Derives the output locations of a markdown file."""
+        rel = PurePosixPath(file_path.relative_to(base_path).as_posix())
+        wav_rel = rel.with_suffix(".wav")
+        return TTSJob(
+            src=file_path,
+            rel=rel,
+            out=audio_base_path / wav_rel,
+            s3_key=f"{book_name}/{wav_rel}",
+        )
+
+    def _process_single_file(self, job: TTSJob):
         """Worker function for processing a single file."""
         try:
-            # Construct paths
-            relative_path = file_path.relative_to(base_path)
-
             if self.s3_bucket:
                 # Check if file exists in S3
-                s3_key = f"{book_name}/{relative_path.with_suffix('.wav')}"
-                s3_key = s3_key.replace("\\", "/")  # Normalize path separators
+                if self._s3_file_exists(job.s3_key):
+                    self._log(f"Skipping existing audio: {job.rel}")
+                    return
 
-                if self._s3_file_exists(s3_key):
-                    tqdm.write(f"Skipping existing audio: {relative_path}")
+                if self._is_tiny(job.src):
                     return
 
-                tqdm.write(f"Processing: {relative_path}")
-                text = file_path.read_text(encoding="utf-8")
+                self._log(f"Processing: {job.rel}")
+                text = job.src.read_text(encoding="utf-8")
 
                 # Generate audio and upload to S3
                 wav_bytes = self.generate_audio_bytes(text)
                 if wav_bytes:
-                    self._upload_to_s3(wav_bytes, s3_key)
-                    tqdm.write(f"  Uploaded to S3: s3://{self.s3_bucket}/{s3_key}")
+                    self._upload_to_s3(wav_bytes, job.s3_key)
+                    tqdm.write(f"  Uploaded to S3: s3://{self.s3_bucket}/{job.s3_key}")
             else:
                 # Original behavior: save to local filesystem
-                output_path = audio_base_path / relative_path.with_suffix(".wav")
-                if output_path.exists():
-                    tqdm.write(f"Skipping existing audio: {output_path.name}")
+                if job.out.exists():
+                    self._log(f"Skipping existing audio: {job.out.name}")
                     return
 
-                tqdm.write(f"Processing: {relative_path}")
-                text = file_path.read_text(encoding="utf-8")
-                self.generate_audio(text, output_path)
+                if self._is_tiny(job.src):
+                    return
+
+                self._log(f"Processing: {job.rel}")
+                text = job.src.read_text(encoding="utf-8")
+                self.generate_audio(text, job.out)
 
         except Exception as e:
-            tqdm.write(f"Error processing {file_path}: {e}")
+            tqdm.write(f"Error processing {job.src}: {e}")
+
+    async def _process_single_file_async(self, job: TTSJob):
+        """Async variant of _process_single_file.
+
+        The blocking S3 and disk calls run in the default thread pool.
+        """
+        try:
+            if self.s3_bucket:
+                if await asyncio.to_thread(self._s3_file_exists, job.s3_key):
+                    self._log(f"Skipping existing audio: {job.rel}")
+                    return
+
+                if self._is_tiny(job.src):
+                    return
+
+                self._log(f"Processing: {job.rel}")
+                text = await asyncio.to_thread(job.src.read_text, encoding="utf-8")
+
+                wav_bytes = await self.generate_audio_bytes_async(text)
+                if wav_bytes:
+                    await asyncio.to_thread(self._upload_to_s3, wav_bytes, job.s3_key)
+                    tqdm.write(f"  Uploaded to S3: s3://{self.s3_bucket}/{job.s3_key}")
+            else:
+                if job.out.exists():
+                    self._log(f"Skipping existing audio: {job.out.name}")
+                    return
+
+                if self._is_tiny(job.src):
+                    return
+
+                self._log(f"Processing: {job.rel}")
+                text = await asyncio.to_thread(job.src.read_text, encoding="utf-8")
+
+                wav_bytes = await self.generate_audio_bytes_async(text)
+                if wav_bytes:
+                    job.out.parent.mkdir(parents=True, exist_ok=True)
+                    await asyncio.to_thread(job.out.write_bytes, wav_bytes)
+                    tqdm.write(f"  Generated {job.out.name}")
+
+        except Exception as e:
+            tqdm.write(f"Error processing {job.src}: {e}")
+
+    async def _process_files_async(self, jobs: List[TTSJob]):
+        """Processes the files with at most num_threads requests in flight."""
+        semaphore = asyncio.Semaphore(self.num_threads)
+
+        async def run(job: TTSJob):
+            async with semaphore:
+                await self._process_single_file_async(job)
+
+        tasks = [asyncio.create_task(run(job)) for job in jobs]
+        with tqdm(total=len(tasks), desc="Generating Audio") as progress:
+            for task in asyncio.as_completed(tasks):
+                await task
+                progress.update()
 
     def _process_book_standard(
         self,
@@ -184,64 +381,36 @@ class TTSGenerator:
         limit: Optional[int] = None,
     ):
         """Processes files using the Standard API with parallel execution."""
-        files_to_process = []
-        for root, _, files in os.walk(base_path):
-            for file in files:
-                if file.endswith(".md"):
-                    files_to_process.append(Path(root) / file)
+        files_to_process = self._scan_markdown(base_path)
 
         if limit:
             files_to_process = files_to_process[:limit]
 
         print(f"Found {len(files_to_process)} markdown files to process.")
 
+        # Paths are derived once here rather than in every worker
+        jobs = [
+            self._build_job(file_path, base_path, audio_base_path, book_name)
+            for file_path in files_to_process
+        ]
+
+        if self.s3_bucket:
+            # One listing instead of a HEAD request per file
+            self._existing_s3_keys = self._list_s3_keys(f"{book_name}/")
+
         # Sequential execution if num_threads is 1
         if self.num_threads == 1:
-            for file_path in tqdm(files_to_process, desc="Generating Audio"):
-                self._process_single_file(
-                    file_path, base_path, audio_base_path, book_name
-                )
+            for job in tqdm(jobs, desc="Generating Audio"):
+                self._process_single_file(job)
             return
 
-        # Parallel execution
-        pool = ThreadPoolExecutor(max_workers=self.num_threads)
-        interrupted = False
-
+        # Concurrent execution: num_threads requests in flight on one event loop
         try:
-            with tqdm(total=len(files_to_process), desc="Generating Audio") as progress:
-                futures = []
-                for file_path in files_to_process:
-                    future = pool.submit(
-                        self._process_single_file,
-                        file_path,
-                        base_path,
-                        audio_base_path,
-                        book_name,
-                    )
-                    future.add_done_callback(lambda p: progress.update())
-                    futures.append(future)
-
-                # Wait for all futures with timeout to allow keyboard interrupts
-                from concurrent.futures import TimeoutError as FuturesTimeoutError
-
-                for future in futures:
-                    while True:
-                        try:
-                            future.result(timeout=1.0)
-                            break
-                        except FuturesTimeoutError:
-                            continue
-
+            asyncio.run(self._process_files_async(jobs))
         except KeyboardInterrupt:
+            # asyncio.run has already cancelled the pending requests
             print("\nStopping...")
-            interrupted = True
-            pool.shutdown(wait=False, cancel_futures=True)
-            import sys
-
             sys.exit(0)
-        finally:
-            if not interrupted:
-                pool.shutdown(wait=True)
 
     def process_book(self, book_folder: str, limit: Optional[int] = None):
         """
@@ -261,3 +430,74 @@ class TTSGenerator:
         self._process_book_standard(base_path, audio_base_path, book_folder, limit)
 
         print(f"TTS Generation Completed. Total Estimated Cost: ${self.total_cost:.6f}")
+
+    def watch_and_process(self, book_folder: str, poll_interval: float = 2.0):
+        """
+        Keeps converting the markdown files of a book as they are written.
+
+        The folder is rescanned every poll_interval seconds and a file is
+        queued once its modification time stays the same between two scans,
+        so chapters are picked up while the rest of the book is still being
+        generated. num_threads workers process the queue. Stops on Ctrl-C.
+
+        Args:
+            book_folder: Name of the folder in 'books/'.
+            poll_interval: Seconds between two scans of the folder.
+        """
+        base_path = Path("books") / book_folder
+        audio_base_path = Path("audio") / book_folder
+
+        if not base_path.exists():
+            print(f"Book folder not found: {base_path}")
+            return
+
+        if self.s3_bucket:
+            self._existing_s3_keys = self._list_s3_keys(f"{book_folder}/")
+
+        work_queue: queue.Queue = queue.Queue()
+
+        def worker():
+            while True:
+                job = work_queue.get()
+                if job is None:
+                    return
+                self._process_single_file(job)
+
+        workers = [
+            threading.Thread(target=worker, daemon=True)
+            for _ in range(self.num_threads)
+        ]
+        for thread in workers:
+            thread.start()
+
+        print(f"Watching {base_path} for new markdown files (Ctrl-C to stop)...")
+        last_seen: Dict[Path, int] = {}
+        queued: Set[Path] = set()
+        try:
+            while True:
+                for file_path in self._scan_markdown(base_path):
+                    if file_path in queued:
+                        continue
+                    mtime = file_path.stat().st_mtime_ns
+                    # Still being written if it changed since the last scan
+                    if last_seen.get(file_path) == mtime:
+                        queued.add(file_path)
+                        work_queue.put(
+                            self._build_job(
+                                file_path, base_path, audio_base_path, book_folder
+                            )
+                        )
+                    last_seen[file_path] = mtime
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            print("\nStopping...")
+        finally:
+            # Drop what hasn't started yet and let the running files finish
+            while not work_queue.empty():
+                work_queue.get_nowait()
+            for _ in workers:
+                work_queue.put(None)
+            for thread in workers:
+                thread.join()
+
+        print(f"TTS Generation Completed. Total Estimated Cost: ${self.total_cost:.6f}")
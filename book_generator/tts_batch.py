@@ -1,36 +1,89 @@
-import os
+import base64
+import io
 import json
-import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 from google.genai import types
-from book_generator.utils import get_client, calculate_tts_cost
+from book_generator.utils import get_client, calculate_tts_cost, wait_for_batch
 from book_generator.tts import TTSGenerator
 
 
 class TTSBatchGenerator(TTSGenerator):
     """TTS Generator using the Batch API for cost savings."""
-    
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._batch_request_template = {
+            "model": self.model,
+            "config": self._tts_config,
+        }
+
     def _create_batch_request(self, text: str, custom_id: str) -> Dict:
         """Creates a single request dictionary for the batch job."""
         return {
             "custom_id": custom_id,
             "request": {
-                "model": self.model,
+                **self._batch_request_template,
                 "contents": [{"parts": [{"text": text}]}],
-                "config": {
-                    "response_modalities": ["AUDIO"],
-                    "speech_config": {
-                        "voice_config": {
-                            "prebuilt_voice_config": {
-                                "voice_name": self.voice_name
-                            }
-                        }
-                    }
-                }
             }
         }
 
+    def _parse_result(
+        self, line: str, audio_base_path: Path
+    ) -> Optional[Tuple[str, Path, str, Dict]]:
+        """Parses one line of the batch output.
+
+        Returns (custom_id, output_path, base64 audio, usage metadata), or None
+        when the result has no audio.
+        """
+        result = json.loads(line)
+        custom_id = result["custom_id"]
+
+        output_path = audio_base_path / Path(custom_id).with_suffix(".wav")
+
+        if "error" in result:
+            print(f"Error for {custom_id}: {result['error']}")
+            return None
+
+        response_data = result["response"]
+        candidates = response_data.get("candidates", [])
+        if not candidates:
+            print(f"No candidates for {custom_id}")
+            return None
+
+        parts = candidates[0].get("content", {}).get("parts", [])
+        if not parts:
+            print(f"No parts for {custom_id}")
+            return None
+
+        inline_data = parts[0].get("inline_data", {})
+        data_b64 = inline_data.get("data")
+
+        if not data_b64:
+            print(f"No data for {custom_id}")
+            return None
+
+        usage = response_data.get("usage_metadata", {})
+        return custom_id, output_path, data_b64, usage
+
+    def _write_result(self, parsed: Tuple[str, Path, str, Dict]):
+        """Decodes the audio of one result and saves it as a WAV file."""
+        custom_id, output_path, data_b64, usage = parsed
+        try:
+            pcm_data = base64.b64decode(data_b64)
+
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            self._save_wave_file(output_path, pcm_data)
+
+            cost = calculate_tts_cost(usage, is_batch=True, print_cost=False)
+            with self.cost_lock:
+                self.total_cost += cost
+            print(f"  Generated {output_path.name} | Cost: ${cost:.6f}")
+
+        except Exception as e:
+            print(f"Error processing result for {custom_id}: {e}")
+
     def process_book(self, book_folder: str, limit: Optional[int] = None):
         """
         Processes markdown files in the book folder using Batch API.
@@ -50,34 +103,28 @@ class TTSBatchGenerator(TTSGenerator):
         batch_file_path = audio_base_path / "tts_batch_requests.jsonl"
 
         # 1. Prepare Requests
-        files_to_process = []
         requests = []
-        
+
         print("Scanning files...")
-        for root, _, files in os.walk(base_path):
-            for file in files:
-                if file.endswith(".md"):
-                    file_path = Path(root) / file
-                    relative_path = file_path.relative_to(base_path)
-                    output_path = audio_base_path / relative_path.with_suffix(".wav")
-                    
-                    if output_path.exists():
-                        print(f"Skipping existing audio: {output_path}")
-                        continue
-                        
-                    files_to_process.append((file_path, output_path))
-                    
-                    text = file_path.read_text(encoding="utf-8")
-                    if not text.strip():
-                        continue
-                        
-                    # Use relative path as custom_id
-                    custom_id = str(relative_path).replace("\\", "/")
-                    requests.append(self._create_batch_request(text, custom_id))
-                    
-                    if limit and len(requests) >= limit:
-                        break
-            
+        # One directory walk instead of an exists() call per chapter
+        existing_wavs = set(audio_base_path.rglob("*.wav"))
+        for file_path in self._scan_markdown(base_path):
+            job = self._build_job(file_path, base_path, audio_base_path, book_folder)
+
+            if job.out in existing_wavs:
+                self._log(f"Skipping existing audio: {job.out}")
+                continue
+
+            if self._is_tiny(file_path):
+                continue
+
+            text = file_path.read_text(encoding="utf-8")
+            if not text.strip():
+                continue
+
+            # Use relative path as custom_id
+            requests.append(self._create_batch_request(text, str(job.rel)))
+
             if limit and len(requests) >= limit:
                 break
 
@@ -87,10 +134,10 @@ class TTSBatchGenerator(TTSGenerator):
 
         print(f"Prepared {len(requests)} requests.")
         
-        # Write JSONL file
-        with batch_file_path.open("w", encoding="utf-8") as f:
-            for req in requests:
-                f.write(json.dumps(req) + "\n")
+        # Write JSONL file in one go
+        batch_file_path.write_text(
+            "".join(json.dumps(req) + "\n" for req in requests), encoding="utf-8"
+        )
 
         # 2. Submit Batch Job
         print("Uploading batch file...")
@@ -108,66 +155,36 @@ class TTSBatchGenerator(TTSGenerator):
         print(f"Batch job created: {batch_job.name}")
         print("Waiting for job to complete...")
 
-        # 3. Poll for Completion
-        while batch_job.state == "ACTIVE" or batch_job.state == "CREATING":
-            time.sleep(30)
-            batch_job = self.client.batches.get(name=batch_job.name)
-            print(f"Status: {batch_job.state}")
-
-        if batch_job.state != "SUCCEEDED":
-            print(f"Batch job failed with state: {batch_job.state}")
-            return
+        # 3. Poll for Completion, raises if the job didn't succeed
+        batch_job = wait_for_batch(self.client, batch_job)
 
         print("Job succeeded. Downloading results...")
 
         # 4. Retrieve and Process Results
         try:
              output_content = self.client.files.download(file=batch_job.output_file)
-             
-             for line in output_content.decode("utf-8").split("\n"):
-                 if not line.strip():
-                     continue
-                 result = json.loads(line)
-                 custom_id = result["custom_id"]
-                 
-                 output_path = audio_base_path / Path(custom_id).with_suffix(".wav")
-                 
-                 if "error" in result:
-                     print(f"Error for {custom_id}: {result['error']}")
-                     continue
-                     
-                 try:
-                     response_data = result["response"]
-                     candidates = response_data.get("candidates", [])
-                     if not candidates:
-                         print(f"No candidates for {custom_id}")
+
+             # files.download returns the whole output as bytes; the wrapper
+             # only decodes it line by line. What bounds memory is the number
+             # of results in flight: at most 2 * max_workers decoded WAVs.
+             lines = io.TextIOWrapper(io.BytesIO(output_content), encoding="utf-8")
+             max_workers = 16
+             with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                 pending = set()
+                 for line in lines:
+                     if not line.strip():
                          continue
-                         
-                     parts = candidates[0].get("content", {}).get("parts", [])
-                     if not parts:
-                         print(f"No parts for {custom_id}")
+                     try:
+                         parsed = self._parse_result(line, audio_base_path)
+                     except Exception as e:
+                         print(f"Error parsing result: {e}")
                          continue
-                         
-                     inline_data = parts[0].get("inline_data", {})
-                     data_b64 = inline_data.get("data")
-                     
-                     if not data_b64:
-                         print(f"No data for {custom_id}")
+                     if not parsed:
                          continue
-                         
-                     import base64
-                     pcm_data = base64.b64decode(data_b64)
-                     
-                     output_path.parent.mkdir(parents=True, exist_ok=True)
-                     self._save_wave_file(output_path, pcm_data)
-                     
-                     usage = response_data.get("usage_metadata", {})
-                     cost = calculate_tts_cost(usage, is_batch=True, print_cost=False)
-                     self.total_cost += cost
-                     print(f"  Generated {output_path.name} | Cost: ${cost:.6f}")
-                     
-                 except Exception as e:
-                     print(f"Error processing result for {custom_id}: {e}")
+
+                     pending.add(pool.submit(self._write_result, parsed))
+                     if len(pending) >= 2 * max_workers:
+                         _, pending = wait(pending, return_when=FIRST_COMPLETED)
 
         except Exception as e:
             print(f"Error downloading/processing results: {e}")
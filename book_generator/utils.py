@@ -1,13 +1,30 @@
+import functools
+import os
+import random
+import threading
+import time
 from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
 
+import yaml
 from google import genai
 from google.genai import types
 
+# libyaml-backed loader/dumper are much faster; PyYAML may be built without them
+try:
+    from yaml import CSafeDumper as YamlDumper, CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeDumper as YamlDumper, SafeLoader as YamlLoader
 
-import os
 
 # Initialize the client
 _client = None
+_client_lock = threading.Lock()
+
+# Let the SDK retry 408/429/5xx responses with jittered exponential backoff
+# (1s, 2s, 4s, ... capped at 60s). Other errors, like a 400, fail right away.
+LLM_RETRY_OPTIONS = types.HttpRetryOptions(attempts=6, initial_delay=1.0, max_delay=60.0)
 
 def _load_key_from_dot_envrc():
     # Load .envrc if it exists
@@ -28,14 +45,56 @@ def _load_key_from_dot_envrc():
 
 def get_client():
     global _client
+    # Checked again under the lock, another thread may have created it first
     if _client is None:
-        if "GEMINI_API_KEY" not in os.environ:
-            _load_key_from_dot_envrc()
+        with _client_lock:
+            if _client is None:
+                if "GEMINI_API_KEY" not in os.environ:
+                    _load_key_from_dot_envrc()
 
-        _client = genai.Client()
+                _client = genai.Client(
+                    http_options=types.HttpOptions(retry_options=LLM_RETRY_OPTIONS)
+                )
     return _client
 
 
+# Batch jobs are polled quickly at first, backing off up to this many seconds
+BATCH_POLL_MAX_DELAY = 60.0
+
+BATCH_DONE_STATES = {
+    types.JobState.JOB_STATE_SUCCEEDED,
+    types.JobState.JOB_STATE_PARTIALLY_SUCCEEDED,
+    types.JobState.JOB_STATE_FAILED,
+    types.JobState.JOB_STATE_CANCELLED,
+    types.JobState.JOB_STATE_EXPIRED,
+}
+
+BATCH_SUCCESS_STATES = {
+    types.JobState.JOB_STATE_SUCCEEDED,
+    types.JobState.JOB_STATE_PARTIALLY_SUCCEEDED,
+}
+
+
+def wait_for_batch(client, batch_job):
+    """Polls the batch job until it's done and returns the finished job.
+
+    Raises RuntimeError when the job didn't succeed, so the run doesn't end
+    as if everything was written.
+    """
+    delay = 2.0
+    while batch_job.state not in BATCH_DONE_STATES:
+        time.sleep(delay * random.uniform(0.8, 1.2))
+        delay = min(delay * 1.5, BATCH_POLL_MAX_DELAY)
+        batch_job = client.batches.get(name=batch_job.name)
+        print(f"Status: {batch_job.state}")
+
+    if batch_job.state not in BATCH_SUCCESS_STATES:
+        raise RuntimeError(
+            f"Batch job {batch_job.name} failed with state: {batch_job.state}"
+        )
+    return batch_job
+
+
 @dataclass
 class CostReport:
     total_cost: float
@@ -44,38 +103,67 @@ class CostReport:
     prompt_tokens: int
     output_tokens: int
     tier_name: str
+    cached_tokens: int = 0
+
+def _get_val_obj(data, attr):
+    # The SDK sets missing counts to None rather than leaving them out
+    return getattr(data, attr, None) or 0
 
-def calculate_gemini_3_cost(usage_metadata, print_cost=False) -> CostReport:
+
+def _get_val_dict(data, attr):
+    return data.get(attr) or 0
+
+
+def _token_getter(usage_metadata):
+    """Picks the token count accessor for usage metadata objects or dicts."""
+    return _get_val_dict if isinstance(usage_metadata, dict) else _get_val_obj
+
+
+def calculate_gemini_3_cost(usage_metadata, print_cost=False, is_batch=False) -> CostReport:
     """
     Calculates cost for Gemini 3 Pro Preview based on usage_metadata object.
     Automatically handles the pricing tiers for prompts above/below 200k tokens.
+    Prompt tokens served from Gemini's context cache are billed at the cached rate.
+    Batch API requests are billed at half the standard rates.
     """
 
     # 1. Safely extract token counts (handling both object attributes and dict keys)
-    def get_val(data, attr):
-        return getattr(data, attr, data.get(attr, 0)) if hasattr(data, 'get') else getattr(data, attr, 0)
+    get_val = _token_getter(usage_metadata)
 
     prompt_tokens = get_val(usage_metadata, 'prompt_token_count')
     candidates_tokens = get_val(usage_metadata, 'candidates_token_count')
     # Use 0 if thoughts_token_count is missing (backward compatibility)
     thoughts_tokens = get_val(usage_metadata, 'thoughts_token_count') 
+    # Part of prompt_token_count that was read from the (implicit) context cache
+    cached_tokens = get_val(usage_metadata, 'cached_content_token_count')
 
     # 2. Determine Pricing Tier (Nov 2025 Rates)
     # If prompt is > 200k, rates increase for both input and output
     if prompt_tokens > 200_000:
         input_rate = 4.00
+        cached_rate = 0.40
         output_rate = 18.00
         tier_name = "Long Context (>200k)"
     else:
         input_rate = 2.00
+        cached_rate = 0.20
         output_rate = 12.00
         tier_name = "Standard (<200k)"
 
+    if is_batch:
+        input_rate /= 2
+        cached_rate /= 2
+        output_rate /= 2
+        tier_name += " Batch"
+
     # 3. Calculate Costs
     # Thoughts are billed as output tokens
     total_output_tokens = candidates_tokens + thoughts_tokens
 
-    input_cost = (prompt_tokens / 1_000_000) * input_rate
+    input_cost = (
+        ((prompt_tokens - cached_tokens) / 1_000_000) * input_rate
+        + (cached_tokens / 1_000_000) * cached_rate
+    )
     output_cost = (total_output_tokens / 1_000_000) * output_rate
     total_cost = input_cost + output_cost
 
@@ -84,6 +172,7 @@ def calculate_gemini_3_cost(usage_metadata, print_cost=False) -> CostReport:
         print(f"--- Gemini 3 Pro Cost Report ---")
         print(f"Tier:            {tier_name}")
         print(f"Prompt Tokens:   {prompt_tokens:,}  (@ ${input_rate}/1M)")
+        print(f"  - Cached:      {cached_tokens:,}  (@ ${cached_rate}/1M)")
         print(f"Output Tokens:   {total_output_tokens:,}  (@ ${output_rate}/1M)")
         print(f"  - Candidates:  {candidates_tokens:,}")
         print(f"  - Thoughts:    {thoughts_tokens:,}")
@@ -98,7 +187,8 @@ def calculate_gemini_3_cost(usage_metadata, print_cost=False) -> CostReport:
         output_cost=output_cost,
         prompt_tokens=prompt_tokens,
         output_tokens=total_output_tokens,
-        tier_name=tier_name
+        tier_name=tier_name,
+        cached_tokens=cached_tokens,
     )
 
 
@@ -111,8 +201,7 @@ def calculate_tts_cost(usage_metadata, is_batch=False, print_cost=False) -> floa
     Batch:    Input $0.25, Output (Audio) $5.00
     """
     # Extract token counts
-    def get_val(data, attr):
-        return getattr(data, attr, data.get(attr, 0)) if hasattr(data, 'get') else getattr(data, attr, 0)
+    get_val = _token_getter(usage_metadata)
 
     prompt_tokens = get_val(usage_metadata, 'prompt_token_count')
     candidates_tokens = get_val(usage_metadata, 'candidates_token_count')
@@ -139,13 +228,88 @@ def calculate_tts_cost(usage_metadata, is_batch=False, print_cost=False) -> floa
 
     return total_cost
 
-def llm(instructions, prompt, model="models/gemini-3-pro-preview"):
+@functools.lru_cache(maxsize=32)
+def _text_config(instructions):
+    # The executor sends the same few system instructions over and over
+    return types.GenerateContentConfig(system_instruction=instructions)
+
+
+def _generate_config(instructions, response_json_schema=None):
+    if response_json_schema is None:
+        return _text_config(instructions)
+
+    return types.GenerateContentConfig(
+        system_instruction=instructions,
+        response_mime_type="application/json",
+        response_json_schema=response_json_schema,
+    )
+
+
+def yaml_dump(data, stream=None):
+    """yaml.safe_dump with the project defaults, using libyaml when available."""
+    return yaml.dump(
+        data, stream, Dumper=YamlDumper, allow_unicode=True, sort_keys=False
+    )
+
+
+def yaml_load(stream):
+    """yaml.safe_load, using libyaml when available."""
+    return yaml.load(stream, Loader=YamlLoader)
+
+
+def load_plan_model(plan_yaml: Path, model):
+    """
+    Loads and validates plan.yaml as `model`, going through a plan.json copy when it's fresh.
+
+    The copy is validated by pydantic-core straight from JSON bytes, which skips
+    both the YAML parser and the intermediate dict. It gets the modification
+    time of the YAML it came from, so it's rewritten as soon as plan.yaml changes.
+    """
+    plan_yaml = Path(plan_yaml)
+    plan_json = plan_yaml.with_suffix(".json")
+    mtime_ns = plan_yaml.stat().st_mtime_ns
+
+    try:
+        if plan_json.stat().st_mtime_ns == mtime_ns:
+            return model.model_validate_json(plan_json.read_bytes())
+    except (OSError, ValueError):
+        # Missing, unreadable or out-of-date copy: load the YAML
+        pass
+
+    plan = model.model_validate(yaml_load(plan_yaml.read_bytes()))
+    write_plan_json(plan_yaml, plan, mtime_ns)
+    return plan
+
+
+def write_plan_json(plan_yaml: Path, plan, mtime_ns: Optional[int] = None):
+    """Writes the plan.json copy of plan.yaml that load_plan_model reads."""
+    plan_yaml = Path(plan_yaml)
+    plan_json = plan_yaml.with_suffix(".json")
+    try:
+        if mtime_ns is None:
+            mtime_ns = plan_yaml.stat().st_mtime_ns
+        plan_json.write_bytes(plan.model_dump_json().encode("utf-8"))
+        os.utime(plan_json, ns=(mtime_ns, mtime_ns))
+    except OSError:
+        # Read-only folder: just skip the copy
+        pass
+
+
+def llm(instructions, prompt, model="models/gemini-3-pro-preview", response_json_schema=None):
     client = get_client()
     response = client.models.generate_content(
         model=model,
-        config=types.GenerateContentConfig(
-            system_instruction=instructions,
-        ),
+        config=_generate_config(instructions, response_json_schema),
+        contents=prompt
+    )
+    return response
+
+
+async def llm_async(instructions, prompt, model="models/gemini-3-pro-preview", response_json_schema=None):
+    client = get_client()
+    response = await client.aio.models.generate_content(
+        model=model,
+        config=_generate_config(instructions, response_json_schema),
         contents=prompt
     )
     return response
@@ -1,12 +1,31 @@
+import argparse
+import asyncio
+import functools
+import itertools
+import os
 import sys
-import yaml
 from pathlib import Path
-from typing import List, Callable, Any, Literal, Optional
+from typing import List, Iterator, Literal, Optional
 
-import questionary
+from google.genai import types
 
+from book_generator.llm_cache import LLMCache
 from chapter_based.models import BookPlan, ChapterSpecs
-from book_generator.utils import llm, calculate_gemini_3_cost
+from book_generator.utils import (
+    llm,
+    llm_async,
+    get_client,
+    calculate_gemini_3_cost,
+    load_plan_model,
+    wait_for_batch,
+)
+
+
+PART_LABELS = {
+    "en": "Part",
+    "ru": "Часть",
+    "de": "Teil",
+}
 
 
 def get_part_label(language: Literal["ru", "en", "de"]) -> str:
@@ -18,12 +37,7 @@ def get_part_label(language: Literal["ru", "en", "de"]) -> str:
     Returns:
         The localized word for 'Part' in the specified language
     """
-    labels = {
-        "en": "Part",
-        "ru": "Часть",
-        "de": "Teil",
-    }
-    return labels.get(language, "Part")
+    return PART_LABELS.get(language, "Part")
 
 
 writer_instructions = """
@@ -41,9 +55,14 @@ The output language should match the input language.
 """.strip()
 
 
-chapter_prompt_template = """
-The book title: {book_title}
+# The part of the chapter prompt that is the same for every chapter of a book.
+# It's formatted once per executor, and keeping it (and writer_instructions)
+# byte-identical at the start of each request lets Gemini's implicit prompt
+# caching reuse it across chapters.
+chapter_prompt_prefix_template = "The book title: {book_title}\n\n"
 
+
+chapter_prompt_template = """
 The chapter name: {chapter_name}
 
 Chapter outline (bullet points to cover):
@@ -56,37 +75,33 @@ Current book progress:
 """.strip()
 
 
-def show_progress(
-    done: List[Any], current: Any, todo: List[Any], name_function: Callable[[Any], str]
-) -> str:
-    """
-    Generates a progress string showing completed, current, and upcoming items.
+BATCH_MODEL = "models/gemini-3-pro-preview"
 
-    Args:
-        done: List of completed items.
-        current: The item currently being processed.
-        todo: List of items yet to be processed.
-        name_function: Function to extract a display name from an item.
+# "bullet_points" directly on a chapter, as laid out by yaml_dump
+CHAPTER_BULLET_POINTS_MARKER = b"\n    bullet_points:"
 
-    Returns:
-        A formatted string representing the progress.
-    """
-    progress_builder = []
 
-    for c in done:
-        line = f"[x] {name_function(c)}"
-        progress_builder.append(line)
-
-    line = f"[ ] {name_function(current)} <-- YOU'RE CURRENTLY HERE"
-    progress_builder.append(line)
+class ProgressTracker:
+    """
+    Builds the book progress string for each item in order.
 
-    for c in todo:
-        line = f"[ ] {name_function(c)}"
-        progress_builder.append(line)
+    The lines are formatted once; every advance() only flips the markers of
+    the previous and the current item before joining them.
+    """
 
-    progress = "\n".join(progress_builder)
+    def __init__(self, names: List[str]):
+        self.names = names
+        self.lines = [f"[ ] {name}" for name in names]
+        self.index = 0
 
-    return progress
+    def advance(self) -> str:
+        """Marks the next item as current and returns the progress string."""
+        i = self.index
+        if i > 0:
+            self.lines[i - 1] = f"[x] {self.names[i - 1]}"
+        self.lines[i] = f"[ ] {self.names[i]} <-- YOU'RE CURRENTLY HERE"
+        self.index += 1
+        return "\n".join(self.lines)
 
 
 def list_available_plan_folders() -> List[Path]:
@@ -106,19 +121,16 @@ def list_available_plan_folders() -> List[Path]:
         if ready_flag.exists():
             continue
 
-        if plan_file.exists():
-            # Check if it's a chapter-based plan (no sections in chapters)
-            with plan_file.open("rt", encoding="utf-8") as f:
-                data = yaml.safe_load(f)
-                # Chapter-based plans have "bullet_points" directly in chapters
-                is_chapter_based = False
-                for part in data.get("parts", []):
-                    for chapter in part.get("chapters", []):
-                        if "bullet_points" in chapter:
-                            is_chapter_based = True
-                            break
-                if is_chapter_based:
-                    available.append(folder)
+        try:
+            plan_bytes = plan_file.read_bytes()
+        except FileNotFoundError:
+            continue
+
+        # Sniff instead of parsing: plans are written by save_plan (yaml_dump),
+        # which puts chapter keys at exactly 4 spaces and section keys at 6.
+        # The full parse and validation happen in execute_plan.
+        if CHAPTER_BULLET_POINTS_MARKER in plan_bytes:
+            available.append(folder)
 
     return available
 
@@ -129,6 +141,14 @@ def prompt_for_plan_selection(plan_folders: List[Path]) -> Optional[str]:
         print("No available chapter-based plans found in books/.")
         return None
 
+    if not sys.stdin.isatty():
+        # Scripted run: there's nobody to answer the prompt
+        print(f"No terminal to prompt in, using the first plan: {plan_folders[0].name}")
+        return plan_folders[0].name
+
+    # Imported here so that runs with the folder passed on the command line don't pay for it
+    import questionary
+
     choice = questionary.select(
         "Select a chapter-based plan to execute",
         choices=[
@@ -174,39 +194,65 @@ class FileSystemWriter(ContentWriter):
 
     def __init__(self, root_folder: Path):
         self.root_folder = root_folder
+        # Every chapter path is asked for at least twice (exists + save),
+        # so the Path objects are built once per writer
+        self._part_folders = {}
+        self._chapter_paths = {}
+        self._part_intro_paths = {}
+        self._back_cover_path = root_folder / "back_cover.md"
+        self._created_folders = set()
+
+    def _write(self, file: Path, content: str):
+        """Writes the file atomically so an interrupted run leaves no partial file."""
+        tmp_file = file.with_name(file.name + ".tmp")
+        tmp_file.write_bytes(content.encode("utf-8"))
+        os.replace(tmp_file, file)
+
+    def _get_part_folder(self, part_number: int) -> Path:
+        folder = self._part_folders.get(part_number)
+        if folder is None:
+            folder = self.root_folder / f"part_{part_number:02d}"
+            self._part_folders[part_number] = folder
+        return folder
+
+    def _ensure_part_folder(self, part_number: int):
+        """Creates the part folder, at most once per writer."""
+        if part_number in self._created_folders:
+            return
+        self._get_part_folder(part_number).mkdir(exist_ok=True)
+        self._created_folders.add(part_number)
 
     def _get_chapter_path(self, part_number: int, chapter_number: int) -> Path:
-        return (
-            self.root_folder
-            / f"part_{part_number:02d}"
-            / f"{chapter_number:02d}_chapter.md"
-        )
+        key = (part_number, chapter_number)
+        path = self._chapter_paths.get(key)
+        if path is None:
+            path = self._get_part_folder(part_number) / f"{chapter_number:02d}_chapter.md"
+            self._chapter_paths[key] = path
+        return path
 
     def _get_part_intro_path(self, part_number: int) -> Path:
-        return (
-            self.root_folder
-            / f"part_{part_number:02d}"
-            / f"_part_{part_number:02d}_intro.md"
-        )
+        path = self._part_intro_paths.get(part_number)
+        if path is None:
+            path = self._get_part_folder(part_number) / f"_part_{part_number:02d}_intro.md"
+            self._part_intro_paths[part_number] = path
+        return path
 
     def _get_back_cover_path(self) -> Path:
-        return self.root_folder / "back_cover.md"
+        return self._back_cover_path
 
     def save_chapter(self, part_number, chapter_number, content):
-        part_folder = self.root_folder / f"part_{part_number:02d}"
-        part_folder.mkdir(exist_ok=True)
+        self._ensure_part_folder(part_number)
         file = self._get_chapter_path(part_number, chapter_number)
-        file.write_text(content, encoding="utf-8")
+        self._write(file, content)
 
     def save_part_intro(self, part_number, content):
-        part_folder = self.root_folder / f"part_{part_number:02d}"
-        part_folder.mkdir(exist_ok=True)
+        self._ensure_part_folder(part_number)
         file = self._get_part_intro_path(part_number)
-        file.write_text(content, encoding="utf-8")
+        self._write(file, content)
 
     def save_back_cover(self, content):
         file = self._get_back_cover_path()
-        file.write_text(content, encoding="utf-8")
+        self._write(file, content)
 
     def chapter_exists(self, part_number, chapter_number):
         return self._get_chapter_path(part_number, chapter_number).exists()
@@ -224,9 +270,9 @@ class CostTracker:
     def __init__(self):
         self.total_cost = 0.0
 
-    def update(self, usage_metadata, item_name: str):
+    def update(self, usage_metadata, item_name: str, is_batch: bool = False):
         """Updates the total cost by calculating cost from usage_metadata."""
-        report = calculate_gemini_3_cost(usage_metadata)
+        report = calculate_gemini_3_cost(usage_metadata, is_batch=is_batch)
         self.total_cost += report.total_cost
         print(
             f"  {item_name} cost: ${report.total_cost:.6f} | Total so far: ${self.total_cost:.6f}"
@@ -236,10 +282,70 @@ class CostTracker:
 class BookExecutor:
     """Orchestrates the chapter-based book generation process."""
 
-    def __init__(self, book_plan: BookPlan, writer: ContentWriter):
+    def __init__(
+        self,
+        book_plan: BookPlan,
+        writer: ContentWriter,
+        max_concurrency: int = 1,
+        use_batch: bool = False,
+        cache: Optional[LLMCache] = None,
+    ):
         self.book_plan = book_plan
         self.writer = writer
         self.tracker = CostTracker()
+        # Number of chapters generated at the same time. 1 keeps the original
+        # sequential flow, anything above switches to the async client.
+        self.max_concurrency = max_concurrency
+        # Submit all missing chapters as one Batch API job: half the price,
+        # but the results can take hours
+        self.use_batch = use_batch
+        self.cache = cache
+        self._prompt_prefix = chapter_prompt_prefix_template.format(
+            book_title=book_plan.name
+        )
+
+    def _call_llm(self, instructions: str, prompt: str, item_name: str):
+        """Calls the LLM (or the cache) and tracks the cost of the call."""
+        if self.cache:
+            cached = self.cache.get(instructions, prompt)
+            if cached is not None:
+                print(f"  {item_name} served from cache.")
+                return cached
+
+        response = llm(instructions=instructions, prompt=prompt)
+        self.tracker.update(response.usage_metadata, item_name)
+
+        if self.cache:
+            self.cache.put(instructions, prompt, response)
+        return response
+
+    async def _call_llm_async(self, instructions: str, prompt: str, item_name: str):
+        """Async variant of _call_llm."""
+        if self.cache:
+            cached = self.cache.get(instructions, prompt)
+            if cached is not None:
+                print(f"  {item_name} served from cache.")
+                return cached
+
+        response = await llm_async(instructions=instructions, prompt=prompt)
+        # Runs on the event loop thread, so the tracker needs no lock
+        self.tracker.update(response.usage_metadata, item_name)
+
+        if self.cache:
+            self.cache.put(instructions, prompt, response)
+        return response
+
+    def _build_chapter_prompt(self, chapter_spec: ChapterSpecs, book_progress: str) -> str:
+        """Builds the writer prompt for a chapter."""
+        return self._prompt_prefix + chapter_prompt_template.format(
+            chapter_name=chapter_spec.chapter.name,
+            chapter_outline=chapter_spec.chapter_outline,
+            book_progress=book_progress,
+        )
+
+    def _format_chapter(self, chapter_spec: ChapterSpecs, text: str) -> str:
+        """Adds the chapter title as level-1 heading."""
+        return f"# {chapter_spec.chapter_number}. {chapter_spec.chapter.name}\n\n{text}"
 
     def process_chapter(
         self,
@@ -249,23 +355,27 @@ class BookExecutor:
         """Generates content for a full chapter."""
         print(f"  Writing Chapter: {chapter_spec.chapter.name}")
 
-        chapter_outline = "\n".join(f"- {bp}" for bp in chapter_spec.chapter.bullet_points)
+        chapter_prompt = self._build_chapter_prompt(chapter_spec, book_progress)
 
-        chapter_prompt = chapter_prompt_template.format(
-            book_title=self.book_plan.name,
-            chapter_name=chapter_spec.chapter.name,
-            chapter_outline=chapter_outline,
-            book_progress=book_progress,
-        )
+        chapter_response = self._call_llm(writer_instructions, chapter_prompt, "Chapter")
 
-        chapter_response = llm(instructions=writer_instructions, prompt=chapter_prompt)
+        return self._format_chapter(chapter_spec, chapter_response.text)
 
-        self.tracker.update(chapter_response.usage_metadata, "Chapter")
+    async def process_chapter_async(
+        self,
+        chapter_spec: ChapterSpecs,
+        book_progress: str,
+    ) -> str:
+        """Async variant of process_chapter."""
+        print(f"  Writing Chapter: {chapter_spec.chapter.name}")
 
-        # Add chapter title as level-1 heading
-        chapter_content = f"# {chapter_spec.chapter_number}. {chapter_spec.chapter.name}\n\n{chapter_response.text}"
+        chapter_prompt = self._build_chapter_prompt(chapter_spec, book_progress)
+
+        chapter_response = await self._call_llm_async(
+            writer_instructions, chapter_prompt, "Chapter"
+        )
 
-        return chapter_content
+        return self._format_chapter(chapter_spec, chapter_response.text)
 
     def _process_single_chapter(
         self, i: int, chapter_specs: List[ChapterSpecs], book_progress: str
@@ -289,46 +399,143 @@ class BookExecutor:
             chapter_content,
         )
 
+    def _iter_book_progress(self, chapter_specs: List[ChapterSpecs]) -> Iterator[str]:
+        """Yields the book progress for each chapter in order."""
+        tracker = ProgressTracker([spec.chapter.name for spec in chapter_specs])
+        for _ in chapter_specs:
+            yield tracker.advance()
+
+    def _build_book_progresses(self, chapter_specs: List[ChapterSpecs]) -> List[str]:
+        """Builds the book progress of every chapter up front.
+
+        The progress only depends on the plan order, not on the written text.
+        """
+        return list(self._iter_book_progress(chapter_specs))
+
+    def _process_all_chapters_batch(self, chapter_specs: List[ChapterSpecs]):
+        """Writes all missing chapters with a single inline Batch API job."""
+        todo = [
+            (current_spec, book_progress)
+            for current_spec, book_progress in zip(
+                chapter_specs, self._build_book_progresses(chapter_specs)
+            )
+            if not self.writer.chapter_exists(
+                current_spec.part_number, current_spec.chapter_number
+            )
+        ]
+        print(
+            f"Total chapters to write: {len(todo)} "
+            f"({len(chapter_specs) - len(todo)} already exist)"
+        )
+        if not todo:
+            return
+
+        config = types.GenerateContentConfig(system_instruction=writer_instructions)
+        inlined_requests = [
+            types.InlinedRequest(
+                contents=self._build_chapter_prompt(current_spec, book_progress),
+                config=config,
+            )
+            for current_spec, book_progress in todo
+        ]
+
+        client = get_client()
+        batch_job = client.batches.create(
+            model=BATCH_MODEL,
+            src=inlined_requests,
+            config={"display_name": f"{self.book_plan.slug}-chapters"},
+        )
+        print(f"Batch job created: {batch_job.name}")
+        print("Waiting for job to complete...")
+
+        batch_job = wait_for_batch(client, batch_job)
+
+        # Inline responses come back in the order of the requests
+        for (current_spec, _), inlined_response in zip(
+            todo, batch_job.dest.inlined_responses
+        ):
+            if inlined_response.error:
+                print(
+                    f"  Chapter {current_spec.chapter_number} failed: {inlined_response.error}"
+                )
+                continue
+
+            response = inlined_response.response
+            self.tracker.update(response.usage_metadata, "Chapter", is_batch=True)
+            self.writer.save_chapter(
+                current_spec.part_number,
+                current_spec.chapter_number,
+                self._format_chapter(current_spec, response.text),
+            )
+            print(f"Chapter {current_spec.chapter_number} completed.")
+
+    async def _process_all_chapters_async(self, chapter_specs: List[ChapterSpecs]):
+        """Processes up to max_concurrency chapters at the same time."""
+        print(
+            f"Total chapters to write: {len(chapter_specs)} "
+            f"(concurrency: {self.max_concurrency})"
+        )
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_chapter(i: int, book_progress: str):
+            current_spec = chapter_specs[i]
+            if self.writer.chapter_exists(
+                current_spec.part_number, current_spec.chapter_number
+            ):
+                print(
+                    f"  Chapter {current_spec.chapter_number} ({current_spec.chapter.name}) already exists, skipping."
+                )
+                return
+
+            async with semaphore:
+                chapter_content = await self.process_chapter_async(
+                    current_spec, book_progress
+                )
+
+            self.writer.save_chapter(
+                current_spec.part_number,
+                current_spec.chapter_number,
+                chapter_content,
+            )
+            print(f"Chapter {current_spec.chapter_number} completed.")
+
+        book_progresses = self._build_book_progresses(chapter_specs)
+
+        await asyncio.gather(
+            *(run_chapter(i, progress) for i, progress in enumerate(book_progresses))
+        )
+
     def _process_all_chapters(self, chapter_specs: List[ChapterSpecs]):
         """Iterates through and processes all chapters."""
         print(f"Total chapters to write: {len(chapter_specs)}")
 
-        for i, current_spec in enumerate(chapter_specs):
-            chapters_done = chapter_specs[:i]
-            chapters_todo = chapter_specs[i + 1 :]
-
+        book_progresses = self._iter_book_progress(chapter_specs)
+        for i, (current_spec, book_progress) in enumerate(
+            zip(chapter_specs, book_progresses)
+        ):
             print(
                 f"Processing Chapter {current_spec.chapter_number}: {current_spec.chapter.name}"
             )
 
-            book_progress = show_progress(
-                chapters_done,
-                current_spec,
-                chapters_todo,
-                name_function=lambda c: c.chapter.name,
-            )
-
             self._process_single_chapter(i, chapter_specs, book_progress)
             print(f"Chapter {current_spec.chapter_number} completed.")
 
-    def _build_chapter_specs(self) -> List[ChapterSpecs]:
-        """Builds a flat list of chapter specifications from the book plan."""
-        chapter_specs = []
-        part_idx = 0
-        chapter_idx = 0
-
-        for part in self.book_plan.parts:
-            part_idx += 1
-            for chapter in part.chapters:
-                chapter_idx += 1
-                specs = ChapterSpecs(
-                    part=part,
-                    part_number=part_idx,
-                    chapter=chapter,
-                    chapter_number=chapter_idx,
-                )
-                chapter_specs.append(specs)
-        return chapter_specs
+    @functools.cached_property
+    def chapter_specs(self) -> List[ChapterSpecs]:
+        """Flat list of chapter specifications, built once from the book plan."""
+        # Chapters are numbered across the whole book, not per part
+        chapter_numbers = itertools.count(1)
+        return [
+            ChapterSpecs(
+                part=part,
+                part_number=part_number,
+                chapter=chapter,
+                chapter_number=next(chapter_numbers),
+                chapter_outline="\n".join(f"- {bp}" for bp in chapter.bullet_points),
+            )
+            for part_number, part in enumerate(self.book_plan.parts, start=1)
+            for chapter in part.chapters
+        ]
 
     def _process_back_cover(self):
         """Saves the back cover description."""
@@ -341,6 +548,7 @@ class BookExecutor:
 
     def _process_part_intros(self):
         """Saves the part introductions."""
+        part_label = get_part_label(self.book_plan.book_language)
         for i, part in enumerate(self.book_plan.parts):
             part_number = i + 1
             if self.writer.part_intro_exists(part_number):
@@ -348,22 +556,46 @@ class BookExecutor:
                 continue
 
             print(f"Saving Part {part_number} intro...")
-            part_label = get_part_label(self.book_plan.book_language)
             content = (
                 f"# {part_label} {part_number}: {part.name}\n\n{part.introduction}"
             )
             self.writer.save_part_intro(part_number, content)
 
+    async def _process_part_intros_async(self):
+        """Async variant of _process_part_intros, the writes run in a worker thread."""
+        await asyncio.to_thread(self._process_part_intros)
+
+    async def _execute_async(self):
+        """Writes the part intros while the first chapters wait for the LLM."""
+        intros_task = asyncio.create_task(self._process_part_intros_async())
+        chapter_specs = self.chapter_specs
+        await asyncio.gather(
+            intros_task, self._process_all_chapters_async(chapter_specs)
+        )
+
     def execute(self):
         """Executes the entire book generation plan."""
         self._process_back_cover()
+        if self.max_concurrency > 1 and not self.use_batch:
+            asyncio.run(self._execute_async())
+            print(f"Execution completed. Total Cost: ${self.tracker.total_cost:.6f}")
+            return
+
         self._process_part_intros()
-        chapter_specs = self._build_chapter_specs()
-        self._process_all_chapters(chapter_specs)
+        chapter_specs = self.chapter_specs
+        if self.use_batch:
+            self._process_all_chapters_batch(chapter_specs)
+        else:
+            self._process_all_chapters(chapter_specs)
         print(f"Execution completed. Total Cost: ${self.tracker.total_cost:.6f}")
 
 
-def execute_plan(folder: str):
+def execute_plan(
+    folder: str,
+    max_concurrency: int = 1,
+    use_batch: bool = False,
+    use_cache: bool = False,
+):
     root_folder = Path("books") / folder
     plan_yaml = root_folder / "plan.yaml"
 
@@ -377,20 +609,64 @@ def execute_plan(folder: str):
         return
 
     print(f"Loading plan from {plan_yaml}...")
-    with plan_yaml.open("rt", encoding="utf-8") as f_in:
-        data = yaml.safe_load(f_in)
-        book_plan = BookPlan.model_validate(data)
+    book_plan = load_plan_model(plan_yaml, BookPlan)
 
     writer = FileSystemWriter(root_folder)
-    executor = BookExecutor(book_plan, writer)
+    cache = LLMCache(root_folder / ".llm_cache") if use_cache else None
+    executor = BookExecutor(
+        book_plan,
+        writer,
+        max_concurrency=max_concurrency,
+        use_batch=use_batch,
+        cache=cache,
+    )
     executor.execute()
 
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        execute_plan(sys.argv[1])
-    else:
+def main():
+    """
+    uv run python -m chapter_based.execute fireworks-ru --concurrency 4
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate the chapters of a chapter-based plan in books/<folder>."
+    )
+    parser.add_argument(
+        "folder",
+        nargs="?",
+        help="Book folder under books/. Prompts for a plan when omitted.",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of chapters to generate at the same time (default: 1).",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Submit all missing chapters as one Batch API job (half the cost, slower).",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Cache LLM responses in books/<folder>/.llm_cache and reuse them.",
+    )
+    args = parser.parse_args()
+
+    folder = args.folder
+    if not folder:
         available_plans = list_available_plan_folders()
-        selected_plan = prompt_for_plan_selection(available_plans)
-        if selected_plan:
-            execute_plan(selected_plan)
+        folder = prompt_for_plan_selection(available_plans)
+
+    if folder:
+        execute_plan(
+            folder,
+            max_concurrency=args.concurrency,
+            use_batch=args.batch,
+            use_cache=args.cache,
+        )
+
+
+if __name__ == "__main__":
+    main()
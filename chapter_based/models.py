@@ -1,20 +1,26 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from dataclasses import dataclass
 from typing import Literal
 
 
 class ChapterPlan(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
     bullet_points: list[str]  # 7-8 bullet points outlining the chapter content
 
 
 class BookPartPlan(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
     introduction: str
     chapters: list[ChapterPlan]
 
 
 class BookPlan(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     book_language: Literal["ru", "en", "de"]
     name: str
     slug: str  # Filesystem-safe short name
@@ -23,10 +29,13 @@ class BookPlan(BaseModel):
     parts: list[BookPartPlan]
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ChapterSpecs:
     part: BookPartPlan
     part_number: int
 
     chapter: ChapterPlan
     chapter_number: int
+
+    # Bullet points formatted for the prompt, built once with the spec
+    chapter_outline: str
@@ -1,10 +1,14 @@
 import argparse
 from pathlib import Path
 
-import yaml
-
 from google.genai import types
 from chapter_based.models import BookPlan
+from book_generator.plan import (
+    stream_text,
+    text_plan_config,
+    refine_text_plan_stream,
+    save_plan,
+)
 from book_generator.utils import get_client, calculate_gemini_3_cost
 
 planner_instructions = """
@@ -27,10 +31,18 @@ Do not add numbers to chapter names. They will be added later automatically.
 IMPORTANT: Generate a 'slug' field that is a filesystem-safe version of the book name (lowercase, hyphens instead of spaces, max 50 chars, no special characters except hyphens).
 """
 
+BOOK_PLAN_SCHEMA = BookPlan.model_json_schema()
+
+# The config doesn't depend on the call arguments, so it's built once
+book_plan_config = types.GenerateContentConfig(
+    system_instruction=planner_instructions,
+    response_mime_type="application/json",
+    response_json_schema=BOOK_PLAN_SCHEMA,
+)
+
 
 def generate_text_plan_stream(topic: str, size: str):
     """Generate initial book plan as streaming text."""
-    instructions = "You are a book planning assistant. Create detailed, comprehensive book outlines."
     prompt = f"""Create a detailed book plan for the following:
 
 Topic: {topic}
@@ -39,67 +51,7 @@ Size: {size}
 Please provide a comprehensive book outline including parts (if applicable) and chapters with brief descriptions.
 Each chapter should have 7-8 bullet points outlining the key topics to cover."""
 
-    client = get_client()
-    response = client.models.generate_content_stream(
-        model="models/gemini-3-pro-preview",
-        config=types.GenerateContentConfig(
-            system_instruction=instructions,
-        ),
-        contents=prompt,
-    )
-
-    full_text = ""
-    last_chunk = None
-    for chunk in response:
-        last_chunk = chunk
-        if chunk.text:
-            full_text += chunk.text
-            yield chunk.text
-
-    # Get usage from the last chunk
-    if last_chunk and hasattr(last_chunk, "usage_metadata"):
-        cost_report = calculate_gemini_3_cost(last_chunk.usage_metadata)
-        yield ("__DONE__", full_text, cost_report.total_cost)
-    else:
-        # Fallback if no usage metadata
-        yield ("__DONE__", full_text, 0.0)
-
-
-def refine_text_plan_stream(current_plan: str, feedback: str):
-    """Refine text plan based on feedback with streaming."""
-    instructions = "You are a book planning assistant. Update the book outline based on user feedback."
-    prompt = f"""Current plan:
-
-{current_plan}
-
-User request: {feedback}
-
-Please provide the updated plan."""
-
-    client = get_client()
-    response = client.models.generate_content_stream(
-        model="models/gemini-3-pro-preview",
-        config=types.GenerateContentConfig(
-            system_instruction=instructions,
-        ),
-        contents=prompt,
-    )
-
-    full_text = ""
-    last_chunk = None
-    for chunk in response:
-        last_chunk = chunk
-        if chunk.text:
-            full_text += chunk.text
-            yield chunk.text
-
-    # Get usage from the last chunk
-    if last_chunk and hasattr(last_chunk, "usage_metadata"):
-        cost_report = calculate_gemini_3_cost(last_chunk.usage_metadata)
-        yield ("__DONE__", full_text, cost_report.total_cost)
-    else:
-        # Fallback if no usage metadata
-        yield ("__DONE__", full_text, 0.0)
+    yield from stream_text(text_plan_config, prompt)
 
 
 def create_book_plan(prompt):
@@ -108,42 +60,15 @@ def create_book_plan(prompt):
     client = get_client()
     plan_response = client.models.generate_content(
         model="models/gemini-3-pro-preview",
-        config=types.GenerateContentConfig(
-            system_instruction=planner_instructions,
-            response_mime_type="application/json",
-            response_json_schema=BookPlan.model_json_schema(),
-        ),
+        config=book_plan_config,
         contents=prompt,
     )
 
-    calculate_gemini_3_cost(plan_response.usage_metadata, print_cost=True)
-    book_plan = BookPlan.model_validate(plan_response.parsed)
-    cost_report = calculate_gemini_3_cost(plan_response.usage_metadata)
+    cost_report = calculate_gemini_3_cost(plan_response.usage_metadata, print_cost=True)
+    book_plan = BookPlan.model_validate_json(plan_response.text)
     return book_plan, cost_report.total_cost
 
 
-def save_plan(book_plan, destination):
-    """
-    Save the book plan to YAML. Destination can be a directory or a file path.
-    """
-    destination_path = Path(destination)
-    if destination_path.suffix:
-        folder_path = destination_path.parent
-        plan_yaml = destination_path
-    else:
-        folder_path = destination_path
-        plan_yaml = folder_path / "plan.yaml"
-
-    folder_path.mkdir(parents=True, exist_ok=True)
-
-    with plan_yaml.open("wt", encoding="utf-8") as f_out:
-        yaml.safe_dump(
-            book_plan.model_dump(), f_out, allow_unicode=True, sort_keys=False
-        )
-    print(f"Plan saved to {plan_yaml}")
-    return plan_yaml
-
-
 def main():
     """
     uv run python -m chapter_based.plan \\
@@ -17,13 +17,12 @@ def main():
         print(f"Error: Streamlit app not found at {ui_app_path}")
         sys.exit(1)
 
-    # Update sys.argv to tell Streamlit which script to run
-    sys.argv = ["streamlit", "run", str(ui_app_path)]
+    # Start the Streamlit server directly, the same way `streamlit run` does
+    # after parsing its arguments, without going through the Click CLI
+    from streamlit.web import bootstrap
 
-    # Import and run Streamlit CLI
-    from streamlit.web import cli as stcli
-
-    sys.exit(stcli.main())
+    bootstrap.load_config_options(flag_options={})
+    bootstrap.run(str(ui_app_path), False, [], {})
 
 
 if __name__ == "__main__":
@@ -1,12 +1,23 @@
 import os
+import re
+import shutil
 import sys
 import yaml
 import subprocess
-import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import questionary
 
+# libyaml-backed loader is much faster; PyYAML may be built without it
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# Threads reading the book files ahead of pandoc
+READ_WORKERS = 8
+
 
 def load_plan(book_dir):
     plan_path = book_dir / "plan.yaml"
@@ -14,8 +25,8 @@ def load_plan(book_dir):
         print(f"Error: plan.yaml not found in {book_dir}")
         sys.exit(1)
 
-    with open(plan_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+    # libyaml decodes the UTF-8 bytes itself
+    return yaml.load(plan_path.read_bytes(), Loader=YamlLoader)
 
 
 def shift_headers(content, shift_by):
@@ -23,43 +34,74 @@ def shift_headers(content, shift_by):
     Shifts markdown headers by a specified amount.
     e.g. if shift_by is 1, # becomes ##, ## becomes ###
     """
-    lines = content.split("\n")
-    new_lines = []
-    # Regex to match markdown headers (at start of line)
-    # We only shift headers that are 1-6 hashes long
-    header_regex = re.compile(r"^(#{1,6})\s+(.*)")
+    if content.startswith("#"):
+        pos = 0
+    else:
+        pos = content.find("\n#")
+        if pos == -1:
+            # No headers at all, which is most of the body text
+            return content
+        pos += 1
 
-    for line in lines:
-        match = header_regex.match(line)
-        if match:
-            hashes, text = match.groups()
-            new_hashes = "#" * (len(hashes) + shift_by)
-            new_lines.append(f"{new_hashes} {text}")
-        else:
-            new_lines.append(line)
+    pieces = []
+    last = 0
+    length = len(content)
+    while pos != -1:
+        # pos is at the first "#" of a line: count the run of hashes
+        end = pos
+        while end < length and content[end] == "#":
+            end += 1
+        level = end - pos
 
-    return "\n".join(new_lines)
+        # A header is 1-6 hashes followed by same-line whitespace
+        text_start = end
+        while text_start < length and content[text_start] != "\n" and content[text_start].isspace():
+            text_start += 1
 
+        if level <= 6 and text_start > end:
+            pieces.append(content[last:pos])
+            pieces.append("#" * (level + shift_by) + " ")
+            last = text_start
 
-def get_sorted_parts(book_dir):
-    parts = []
-    for item in os.listdir(book_dir):
-        if os.path.isdir(book_dir / item) and item.startswith("part_"):
-            parts.append(item)
-    return sorted(parts)
+        pos = content.find("\n#", end)
+        if pos != -1:
+            pos += 1
 
+    pieces.append(content[last:])
+    return "".join(pieces)
 
-def get_sorted_files(part_dir):
-    files = []
-    for item in os.listdir(part_dir):
-        if item.endswith(".md") and not item.startswith("_"):
-            files.append(item)
-    return sorted(files)
 
+NUMBER_RE = re.compile(r"\d+")
 
-def collect_markdown_content(book_dir):
-    full_content = []
 
+def natural_sort_key(name):
+    """Orders names by the numbers in them, so part_10 comes after part_2."""
+    return tuple(int(n) for n in NUMBER_RE.findall(name)), name
+
+
+def get_sorted_parts(book_dir):
+    # scandir entries carry the file type from the directory read, no extra stat per item
+    with os.scandir(book_dir) as entries:
+        return sorted(
+            (e.name for e in entries if e.is_dir() and e.name.startswith("part_")),
+            key=natural_sort_key,
+        )
+
+
+def get_sorted_files(part_dir):
+    with os.scandir(part_dir) as entries:
+        return sorted(
+            (
+                e.name
+                for e in entries
+                if e.is_file() and e.name.endswith(".md") and not e.name.startswith("_")
+            ),
+            key=natural_sort_key,
+        )
+
+
+def _iter_book_files(book_dir):
+    """Yields (path, shift_by) for every markdown file of the book, in reading order."""
     # 1. Add Title Page info (optional, pandoc handles metadata, but good to have in text)
     # We'll skip explicit title page in markdown and let pandoc metadata handle it.
 
@@ -73,34 +115,47 @@ def collect_markdown_content(book_dir):
         # Process Part Intro
         part_intro_path = part_dir / f"_part_{part_number}_intro.md"
         if part_intro_path.exists():
-            with open(part_intro_path, "r", encoding="utf-8") as f:
-                content = f.read()
-                # Part intro is usually H1 (# Часть X...), keep it as H1
-                full_content.append(content)
-                full_content.append("\n\n")
+            # Part intro is usually H1 (# Часть X...), keep it as H1.
+            yield part_intro_path, 0
 
         # Process Chapters and Sections
         files = get_sorted_files(part_dir)
         for filename in files:
             file_path = part_dir / filename
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
 
             if filename.endswith("_00_intro.md"):
                 # Chapter Intro. Currently H1 (# 1. Chapter...).
                 # We want it to be H2 to sit under Part (H1).
                 # Shift by 1.
-                content = shift_headers(content, 1)
+                yield file_path, 1
             else:
                 # Section. Currently H2 (## Section...).
                 # We want it to be H3.
                 # Shift by 1.
-                content = shift_headers(content, 1)
+                yield file_path, 1
 
-            full_content.append(content)
-            full_content.append("\n\n")
 
-    return "".join(full_content)
+def _read_book_file(file_path, shift_by):
+    """Returns the file as UTF-8 bytes with its headers shifted by `shift_by`."""
+    if shift_by == 0:
+        # Nothing to change, so the file goes out without decoding
+        return file_path.read_bytes()
+
+    content = file_path.read_text(encoding="utf-8")
+    return shift_headers(content, shift_by).encode("utf-8")
+
+
+def collect_markdown_content(book_dir):
+    """Yields the markdown of the whole book as UTF-8 bytes, one file at a time."""
+    files = list(_iter_book_files(book_dir))
+    paths = [file_path for file_path, _ in files]
+    shifts = [shift_by for _, shift_by in files]
+
+    # The reads overlap each other and pandoc; map() still yields in book order
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        for content in pool.map(_read_book_file, paths, shifts):
+            yield content
+            yield b"\n\n"
 
 
 def list_available_book_folders(books_root: Path) -> list[Path]:
@@ -109,12 +164,14 @@ def list_available_book_folders(books_root: Path) -> list[Path]:
         return []
 
     available = []
-    for folder in sorted(books_root.iterdir()):
-        if not folder.is_dir():
-            continue
-
-        if (folder / "plan.yaml").exists():
-            available.append(folder)
+    with os.scandir(books_root) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if not entry.is_dir():
+                continue
+
+            folder = Path(entry.path)
+            if (folder / "plan.yaml").exists():
+                available.append(folder)
     return available
 
 
@@ -138,6 +195,12 @@ def main():
     base_dir = Path(__file__).parent.parent
     books_root = base_dir / "books"
 
+    # Checked up front, not after a book was picked and its plan loaded
+    pandoc = shutil.which("pandoc")
+    if pandoc is None:
+        print("Error: pandoc not found. Please install pandoc.")
+        sys.exit(1)
+
     if len(sys.argv) >= 2:
         book_name = sys.argv[1]
     else:
@@ -161,15 +224,6 @@ def main():
     # Author is not in plan.yaml usually, defaulting to "AI Author" or checking if it's there
     author = plan.get("author", "A.I. Grigorev")
 
-    # Collect Content
-    print("Collecting markdown content...")
-    markdown_content = collect_markdown_content(book_dir)
-
-    # Save temporary combined markdown
-    temp_md_path = book_dir / f"{book_name}_combined.md"
-    with open(temp_md_path, "w", encoding="utf-8") as f:
-        f.write(markdown_content)
-
     # Output EPUB path
     output_epub = book_dir / f"{book_name}.epub"
 
@@ -177,9 +231,11 @@ def main():
     # --toc: Table of Contents
     # --metadata: Set metadata fields
     # --top-level-division=part: Helps pandoc understand the structure (though we manually shifted headers)
+    # The markdown is streamed to stdin ("-") instead of a combined temp file
     cmd = [
-        "pandoc",
-        str(temp_md_path),
+        pandoc,
+        "-",
+        "--from=markdown",
         "-o",
         str(output_epub),
         "--toc",
@@ -205,19 +261,34 @@ def main():
     # Print command safely (handling non-ASCII characters in Windows console)
     print(f"Running pandoc to create {output_epub.name}...")
 
+    # Binary pipe: the chunks are already UTF-8 encoded
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    print("Streaming markdown content...")
     try:
-        subprocess.run(cmd, check=True)
-        print(f"Successfully created: {output_epub}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error running pandoc: {e}")
+        for chunk in collect_markdown_content(book_dir):
+            process.stdin.write(chunk)
+    except BrokenPipeError:
+        # pandoc exited early; its return code reports the error below
+        pass
+    except Exception as e:
+        # Closing stdin would let pandoc finish a truncated EPUB
+        process.kill()
+        process.wait()
+        output_epub.unlink(missing_ok=True)
+        print(f"Error reading the book files: {e}")
         sys.exit(1)
-    except FileNotFoundError:
-        print("Error: pandoc not found. Please install pandoc.")
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    returncode = process.wait()
+    if returncode != 0:
+        print(f"Error running pandoc: exit status {returncode}")
         sys.exit(1)
-
-    # Cleanup temp file
-    if temp_md_path.exists():
-        os.remove(temp_md_path)
+    print(f"Successfully created: {output_epub}")
 
 
 if __name__ == "__main__":
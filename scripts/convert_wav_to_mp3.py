@@ -1,7 +1,10 @@
 """
 Convert WAV files from S3 bucket to MP3 format.
 
-For each WAV file in the S3 bucket:
+For each WAV file in the S3 bucket the audio is streamed from S3 through
+ffmpeg and the MP3 straight back to S3, without touching the local disk.
+
+With --keep-local the files go through the audio/book_name folder instead:
 1. Download WAV file
 2. Convert to MP3 using ffmpeg
 3. Upload MP3 back to S3 bucket
@@ -9,56 +12,205 @@ For each WAV file in the S3 bucket:
 5. Keep MP3 in audio/book_name folder
 """
 
+import functools
+import itertools
+import os
 import subprocess
-from pathlib import Path
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path, PurePosixPath
 from typing import Optional
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from tqdm.auto import tqdm
 
+MB = 1024 * 1024
+
+# Parts of a single file downloaded or uploaded at the same time
+TRANSFER_THREADS = 4
+
+# MP3s smaller than this go up in a single put_object
+MULTIPART_THRESHOLD = 8 * MB
+
+# Size of the WAV chunks fed to ffmpeg
+STREAM_CHUNK_SIZE = 1 * MB
+
+# WAVs are streamed as ranged GETs of this size, TRANSFER_THREADS at a time
+RANGE_PART_SIZE = 8 * MB
+
+# No banner or progress output: ffmpeg only writes errors to stderr
+FFMPEG_QUIET = ["-hide_banner", "-loglevel", "error"]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_s3_client(max_pool_connections: int):
+    """Returns a shared S3 client (boto3 clients are thread-safe).
+
+    Building a client loads the service model and resolves the endpoint, so
+    converters created for one book after another reuse the same one and its
+    kept-alive connections.
+    """
+    return boto3.client("s3", config=Config(max_pool_connections=max_pool_connections))
+
+
+def _available_cpus() -> int:
+    """Cores this process may run on, which can be fewer than os.cpu_count()."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        # macOS and Windows have no sched_getaffinity
+        return os.cpu_count() or 1
+
+
+class _PrefixedStream:
+    """Reads `head` first and then the rest of `stream`."""
+
+    def __init__(self, head: bytes, stream):
+        self._head = head
+        self._stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        if not self._head:
+            return self._stream.read(size)
+
+        if size < 0:
+            data, self._head = self._head + self._stream.read(), b""
+            return data
+
+        # Full reads: s3transfer makes a part out of whatever one read returns
+        data, self._head = self._head[:size], self._head[size:]
+        if len(data) < size:
+            data += self._stream.read(size - len(data))
+        return data
+
+
+def _interleave_by_book(keys: list) -> list:
+    """
+    Round-robins the keys between books, so the workers start on several S3
+    prefixes at once instead of all hitting the first book.
+    """
+    by_book = {}
+    for key in keys:
+        by_book.setdefault(key.split("/", 1)[0], []).append(key)
+
+    return [
+        key
+        for group in itertools.zip_longest(*by_book.values())
+        for key in group
+        if key is not None
+    ]
+
 
 class WavToMp3Converter:
-    def __init__(self, s3_bucket: str, output_bucket: Optional[str] = None):
+    def __init__(
+        self,
+        s3_bucket: str,
+        output_bucket: Optional[str] = None,
+        concurrency: int = 4,
+        keep_local: bool = False,
+    ):
         """
         Initialize converter.
 
         Args:
             s3_bucket: Source S3 bucket containing WAV files
             output_bucket: Destination S3 bucket for MP3 files (defaults to same bucket)
+            concurrency: Number of files processed at the same time
+            keep_local: Convert through local files and keep the MP3 in audio/
         """
         self.s3_bucket = s3_bucket
         self.output_bucket = output_bucket or s3_bucket
-        self.s3_client = boto3.client("s3")
+        self.concurrency = concurrency
+        self.keep_local = keep_local
+        # libmp3lame uses one core per file: local conversions beyond the
+        # core count only add context switches
+        self._encode_slots = threading.BoundedSemaphore(_available_cpus())
+        # boto3 clients are thread-safe. The connection pool (10 by default)
+        # has to fit the parts of every worker, or they queue for a connection.
+        # A streamed file downloads and uploads its parts at the same time.
+        self.max_connections = max(10, concurrency * TRANSFER_THREADS * 2)
+        self.s3_client = _get_s3_client(self.max_connections)
+        # Large WAVs are fetched and stored as parallel multipart transfers. The
+        # default of 10 threads per file would oversubscribe the worker pool.
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=16 * MB,
+            max_concurrency=TRANSFER_THREADS,
+            use_threads=True,
+        )
 
-    def _list_wav_files(self, book_name: Optional[str] = None) -> list:
+    def _list_keys(self, bucket: str, book_name: Optional[str], suffix: str) -> list:
         """
-        List all WAV files in the S3 bucket.
+        List the keys in an S3 bucket with the given extension.
 
         Args:
+            bucket: S3 bucket to list
             book_name: Optional book name to filter files
+            suffix: Lowercase extension to match, e.g. ".wav"
 
         Returns:
-            List of S3 object keys ending in .wav
+            List of S3 object keys ending in `suffix`
         """
-        prefix = f"{book_name}/" if book_name else ""
+        if book_name:
+            # The trailing slash keeps "sirens" from also matching "sirens-2/"
+            return self._list_prefix(bucket, f"{book_name}/", suffix)
+
+        # Every book: list the top-level book folders, then page through the
+        # books at the same time instead of one listing for the whole bucket
+        keys = []
+        book_prefixes = []
+        paginator = self.s3_client.get_paginator("list_objects_v2")
 
-        wav_files = []
+        for page in paginator.paginate(Bucket=bucket, Delimiter="/"):
+            book_prefixes.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+            for obj in page.get("Contents", []):
+                key = obj["Key"]
+                if key.lower().endswith(suffix):
+                    keys.append(key)
+
+        if book_prefixes:
+            workers = min(self.max_connections, len(book_prefixes))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for book_keys in pool.map(
+                    lambda prefix: self._list_prefix(bucket, prefix, suffix),
+                    book_prefixes,
+                ):
+                    keys.extend(book_keys)
+
+        return keys
+
+    def _list_prefix(self, bucket: str, prefix: str, suffix: str) -> list:
+        """List the keys under one prefix with the given extension."""
+        keys = []
         paginator = self.s3_client.get_paginator("list_objects_v2")
 
-        for page in paginator.paginate(Bucket=self.s3_bucket, Prefix=prefix):
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
             if "Contents" not in page:
                 continue
 
             for obj in page["Contents"]:
                 key = obj["Key"]
-                if key.lower().endswith(".wav"):
-                    wav_files.append(key)
+                if key.lower().endswith(suffix):
+                    keys.append(key)
 
-        return wav_files
+        return keys
+
+    def _list_wav_files(self, book_name: Optional[str] = None) -> list:
+        """List all WAV files in the source bucket."""
+        return self._list_keys(self.s3_bucket, book_name, ".wav")
+
+    def _list_mp3_keys(self, book_name: Optional[str] = None) -> frozenset:
+        """List the MP3 files already in the output bucket."""
+        return frozenset(self._list_keys(self.output_bucket, book_name, ".mp3"))
 
     def _download_wav(self, s3_key: str, local_path: Path):
         """Download WAV file from S3."""
-        local_path.parent.mkdir(parents=True, exist_ok=True)
-        self.s3_client.download_file(self.s3_bucket, s3_key, str(local_path))
+        self.s3_client.download_file(
+            self.s3_bucket, s3_key, str(local_path), Config=self.transfer_config
+        )
 
     def _convert_to_mp3(self, wav_path: Path, mp3_path: Path):
         """
@@ -68,48 +220,210 @@ class WavToMp3Converter:
             wav_path: Path to input WAV file
             mp3_path: Path to output MP3 file
         """
-        mp3_path.parent.mkdir(parents=True, exist_ok=True)
-
         # Use ffmpeg to convert WAV to MP3
         # -i: input file
         # -codec:a libmp3lame: use MP3 encoder
         # -q:a 2: VBR quality (0-9, where 0 is best quality)
         # -y: overwrite output file without asking
+        # -nostdin: don't read keys from the terminal shared by the workers
+        # -threads 1: one thread per ffmpeg, the workers run several at once
         cmd = [
             "ffmpeg",
+            *FFMPEG_QUIET,
+            "-nostdin",
             "-i",
             str(wav_path),
             "-codec:a",
             "libmp3lame",
             "-q:a",
             "2",
+            "-threads",
+            "1",
             "-y",
             str(mp3_path),
         ]
 
-        result = subprocess.run(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
+        with self._encode_slots:
+            result = subprocess.run(
+                cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
 
         if result.returncode != 0:
-            raise Exception(f"ffmpeg failed: {result.stderr}")
+            message = result.stderr.decode("utf-8", errors="replace")
+            raise Exception(f"ffmpeg failed: {message}")
 
     def _upload_mp3(self, mp3_path: Path, s3_key: str):
         """Upload MP3 file to S3."""
+        if mp3_path.stat().st_size < MULTIPART_THRESHOLD:
+            # One request, without the transfer manager's threads and probing
+            self.s3_client.put_object(
+                Bucket=self.output_bucket,
+                Key=s3_key,
+                Body=mp3_path.read_bytes(),
+                ContentType="audio/mpeg",
+            )
+            return
+
         self.s3_client.upload_file(
             str(mp3_path),
             self.output_bucket,
             s3_key,
             ExtraArgs={"ContentType": "audio/mpeg"},
+            Config=self.transfer_config,
         )
 
-    def _process_single_file(self, s3_key: str):
+    def _iter_wav_parts(self, s3_key: str):
         """
-        Process a single WAV file: download, convert, upload, cleanup.
+        Yield the bytes of a WAV in S3 in order.
+
+        The first ranged GET also reports the size of the object. The rest of
+        a large file is fetched as parallel ranged GETs a few parts ahead of
+        ffmpeg, so one slow connection doesn't cap the whole file.
 
         Args:
             s3_key: S3 key of the WAV file
         """
+        first = self.s3_client.get_object(
+            Bucket=self.s3_bucket, Key=s3_key, Range=f"bytes=0-{RANGE_PART_SIZE - 1}"
+        )
+        yield from first["Body"].iter_chunks(STREAM_CHUNK_SIZE)
+
+        # No ContentRange: the server ignored the range and sent everything
+        content_range = first.get("ContentRange")
+        if not content_range:
+            return
+        total = int(content_range.rsplit("/", 1)[1])
+        if total <= RANGE_PART_SIZE:
+            return
+
+        def fetch(start: int) -> bytes:
+            end = min(start + RANGE_PART_SIZE, total) - 1
+            part = self.s3_client.get_object(
+                Bucket=self.s3_bucket, Key=s3_key, Range=f"bytes={start}-{end}"
+            )
+            return part["Body"].read()
+
+        # At most TRANSFER_THREADS parts are held in memory
+        with ThreadPoolExecutor(max_workers=TRANSFER_THREADS) as pool:
+            pending = deque()
+            for start in range(RANGE_PART_SIZE, total, RANGE_PART_SIZE):
+                pending.append(pool.submit(fetch, start))
+                if len(pending) == TRANSFER_THREADS:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _stream_to_mp3(self, s3_key: str, mp3_s3_key: str):
+        """
+        Convert a WAV in S3 to an MP3 in S3 by piping it through ffmpeg.
+
+        Args:
+            s3_key: S3 key of the WAV file
+            mp3_s3_key: S3 key for the MP3 file
+        """
+        # -f mp3: the output is a pipe, so there is no extension to go by.
+        # ffmpeg can't seek back in a pipe to fill in the VBR (Xing) header, so
+        # some players estimate the duration; --keep-local writes a full header.
+        # stderr goes to a temporary file: a pipe nobody reads could fill up
+        # and stall ffmpeg.
+        # No encode slot is taken here: a streaming ffmpeg mostly waits on S3.
+        cmd = [
+            "ffmpeg",
+            *FFMPEG_QUIET,
+            "-i",
+            "pipe:0",
+            "-codec:a",
+            "libmp3lame",
+            "-q:a",
+            "2",
+            "-threads",
+            "1",
+            "-f",
+            "mp3",
+            "pipe:1",
+        ]
+
+        with tempfile.TemporaryFile() as stderr:
+            proc = subprocess.Popen(
+                cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr
+            )
+
+            feed_errors = []
+
+            def feed():
+                try:
+                    for chunk in self._iter_wav_parts(s3_key):
+                        proc.stdin.write(chunk)
+                except (BrokenPipeError, ValueError):
+                    # ffmpeg exited early; its return code reports the error
+                    pass
+                except Exception as e:
+                    # A failed S3 read must not look like the end of the WAV:
+                    # ffmpeg would finish a truncated MP3 and exit 0
+                    feed_errors.append(e)
+                    proc.kill()
+                finally:
+                    try:
+                        proc.stdin.close()
+                    except BrokenPipeError:
+                        pass
+
+            feeder = threading.Thread(target=feed, daemon=True)
+            feeder.start()
+
+            # Short chapters fit under the multipart threshold: they are kept
+            # in memory and stored with one put_object once ffmpeg succeeded
+            mp3_head = b""
+            uploaded = False
+            try:
+                mp3_head = proc.stdout.read(MULTIPART_THRESHOLD)
+                if len(mp3_head) == MULTIPART_THRESHOLD:
+                    self.s3_client.upload_fileobj(
+                        _PrefixedStream(mp3_head, proc.stdout),
+                        self.output_bucket,
+                        mp3_s3_key,
+                        ExtraArgs={"ContentType": "audio/mpeg"},
+                        Config=self.transfer_config,
+                    )
+                    uploaded = True
+            except BaseException:
+                # Unblocks the feeder, which is waiting on a full pipe
+                proc.kill()
+                raise
+            finally:
+                feeder.join()
+                proc.stdout.close()
+
+            returncode = proc.wait()
+            if feed_errors or returncode != 0:
+                if uploaded:
+                    # The upload stored whatever ffmpeg wrote before failing
+                    self.s3_client.delete_object(
+                        Bucket=self.output_bucket, Key=mp3_s3_key
+                    )
+                if feed_errors:
+                    raise feed_errors[0]
+                stderr.seek(0)
+                message = stderr.read().decode("utf-8", errors="replace")
+                raise Exception(f"ffmpeg failed: {message}")
+
+        if not uploaded:
+            self.s3_client.put_object(
+                Bucket=self.output_bucket,
+                Key=mp3_s3_key,
+                Body=mp3_head,
+                ContentType="audio/mpeg",
+            )
+
+    def _process_single_file(self, s3_key: str, existing_mp3s: frozenset = frozenset()):
+        """
+        Process a single WAV file: stream it through ffmpeg to S3, or with
+        keep_local download, convert, upload, cleanup.
+
+        Args:
+            s3_key: S3 key of the WAV file
+            existing_mp3s: S3 keys of the MP3s already in the output bucket
+        """
         try:
             # Parse the S3 key to extract book name and relative path
             # Expected format: book_name/path/to/file.wav
@@ -124,19 +438,24 @@ class WavToMp3Converter:
             # Create local paths
             audio_dir = Path("audio") / book_name
             wav_path = audio_dir / relative_path
-            mp3_relative = Path(relative_path).with_suffix(".mp3")
+            # S3 keys always use "/", whatever the local path separator is
+            mp3_relative = PurePosixPath(relative_path).with_suffix(".mp3")
             mp3_path = audio_dir / mp3_relative
 
             # S3 key for MP3
-            mp3_s3_key = f"{book_name}/{mp3_relative}".replace("\\", "/")
+            mp3_s3_key = f"{book_name}/{mp3_relative}"
 
             # Check if MP3 already exists in S3
-            try:
-                self.s3_client.head_object(Bucket=self.output_bucket, Key=mp3_s3_key)
+            if mp3_s3_key in existing_mp3s:
                 tqdm.write(f"Skipping (MP3 exists in S3): {s3_key}")
                 return
-            except:
-                pass  # MP3 doesn't exist, proceed with conversion
+
+            if not self.keep_local:
+                tqdm.write(f"Processing: {s3_key}")
+                tqdm.write("  Streaming WAV through ffmpeg to S3...")
+                self._stream_to_mp3(s3_key, mp3_s3_key)
+                tqdm.write(f"  Uploaded: s3://{self.output_bucket}/{mp3_s3_key}")
+                return
 
             # Check if MP3 already exists locally
             if mp3_path.exists():
@@ -184,9 +503,31 @@ class WavToMp3Converter:
             return
 
         print(f"Found {len(wav_files)} WAV files to convert")
-
-        for wav_file in tqdm(wav_files, desc="Converting WAV to MP3"):
-            self._process_single_file(wav_file)
+        wav_files = _interleave_by_book(wav_files)
+
+        # One listing instead of a HEAD request per file
+        existing_mp3s = self._list_mp3_keys(book_name)
+
+        if self.keep_local:
+            # The files of a book share a few folders; create them once up
+            # front instead of before every download and conversion
+            local_dirs = {(Path("audio") / key).parent for key in wav_files if "/" in key}
+            for local_dir in local_dirs:
+                local_dir.mkdir(parents=True, exist_ok=True)
+
+        # Each file is mostly waiting on S3, so the files overlap in a thread
+        # pool. _process_single_file reports its own errors.
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [
+                pool.submit(self._process_single_file, wav_file, existing_mp3s)
+                for wav_file in wav_files
+            ]
+            for future in tqdm(
+                as_completed(futures),
+                total=len(futures),
+                desc="Converting WAV to MP3",
+            ):
+                future.result()
 
         print("Conversion completed!")
 
@@ -214,11 +555,26 @@ def main():
         type=str,
         help="Destination S3 bucket for MP3 files (defaults to source bucket)",
     )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of files to process at the same time (default: 4).",
+    )
+    parser.add_argument(
+        "--keep-local",
+        action="store_true",
+        help="Convert through local files and keep the MP3s in audio/book_name.",
+    )
 
     args = parser.parse_args()
 
     converter = WavToMp3Converter(
-        s3_bucket=args.source_bucket, output_bucket=args.output_bucket
+        s3_bucket=args.source_bucket,
+        output_bucket=args.output_bucket,
+        concurrency=args.concurrency,
+        keep_local=args.keep_local,
     )
 
     converter.convert_book(args.book)
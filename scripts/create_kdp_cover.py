@@ -9,18 +9,110 @@ Creates a PDF cover with:
 The script reads book metadata from plan.yaml and creates a KDP-complaint cover.
 """
 
+import functools
 import yaml
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from reportlab.lib.units import inch
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 from reportlab.lib.colors import HexColor, white
 from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfbase.ttfonts import TTFont
 import os
 
 
+# Cover colors, parsed once
+BACK_COVER_BG = HexColor("#1a1a2e")
+SEPARATOR_COLOR = HexColor("#e94560")
+DESCRIPTION_COLOR = HexColor("#e8e8e8")
+FRONT_COVER_BG = HexColor("#0f3460")
+SPINE_BG = HexColor("#16213e")
+
+# libyaml-backed loader is much faster; PyYAML may be built without it
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+
+@functools.lru_cache(maxsize=16)
+def _load_plan(path_str: str, mtime_ns: int) -> dict:
+    """Parses plan.yaml; the mtime in the key makes an edited plan load again."""
+    with open(path_str, "rb") as f:
+        return yaml.load(f, Loader=YamlLoader)
+
+
+@functools.lru_cache(maxsize=8192)
+def _char_width(font: str, font_size: float, ch: str) -> float:
+    """Width of a single character, looked up in the font metrics once."""
+    return stringWidth(ch, font, font_size)
+
+
+def _text_width(text: str, font: str, font_size: float) -> float:
+    """Same as canvas.stringWidth, summed from the cached character widths."""
+    return sum(_char_width(font, font_size, ch) for ch in text)
+
+
+@functools.lru_cache(maxsize=1)
+def _register_fonts() -> tuple:
+    """
+    Register Unicode-compatible fonts for Cyrillic support.
+
+    Runs once per process: parsing the TTF files is the slow part, and
+    ReportLab keeps registered fonts globally anyway.
+
+    Returns:
+        Tuple of (regular font name, bold font name)
+    """
+    try:
+        # Try to find DejaVu fonts in common Windows locations
+        windows_fonts = Path(os.environ.get("WINDIR", "C:\\Windows")) / "Fonts"
+
+        # Register DejaVuSans (supports Cyrillic)
+        dejavu_path = windows_fonts / "DejaVuSans.ttf"
+        dejavu_bold_path = windows_fonts / "DejaVuSans-Bold.ttf"
+
+        if dejavu_path.exists():
+            pdfmetrics.registerFont(TTFont("DejaVu", str(dejavu_path)))
+            font_regular = "DejaVu"
+        else:
+            # Fallback to Arial which has some Cyrillic support
+            arial_path = windows_fonts / "arial.ttf"
+            if arial_path.exists():
+                pdfmetrics.registerFont(TTFont("Arial-Unicode", str(arial_path)))
+                font_regular = "Arial-Unicode"
+            else:
+                # Last fallback to Helvetica (won't show Cyrillic properly)
+                font_regular = "Helvetica"
+                print(
+                    "Warning: Unicode font not found. Cyrillic text may not display correctly."
+                )
+
+        if dejavu_bold_path.exists():
+            pdfmetrics.registerFont(TTFont("DejaVu-Bold", str(dejavu_bold_path)))
+            font_bold = "DejaVu-Bold"
+        else:
+            # Fallback to Arial Bold
+            arial_bold_path = windows_fonts / "arialbd.ttf"
+            if arial_bold_path.exists():
+                pdfmetrics.registerFont(
+                    TTFont("Arial-Bold-Unicode", str(arial_bold_path))
+                )
+                font_bold = "Arial-Bold-Unicode"
+            else:
+                font_bold = "Helvetica-Bold"
+
+    except Exception as e:
+        print(f"Warning: Could not register Unicode fonts: {e}")
+        font_regular = "Helvetica"
+        font_bold = "Helvetica-Bold"
+
+    return font_regular, font_bold
+
+
 class KDPCoverGenerator:
     def __init__(self, book_folder: str, page_count: int = 300):
         """
@@ -60,48 +152,7 @@ class KDPCoverGenerator:
 
     def _register_fonts(self):
         """Register Unicode-compatible fonts for Cyrillic support."""
-        try:
-            # Try to find DejaVu fonts in common Windows locations
-            windows_fonts = Path(os.environ.get("WINDIR", "C:\\Windows")) / "Fonts"
-
-            # Register DejaVuSans (supports Cyrillic)
-            dejavu_path = windows_fonts / "DejaVuSans.ttf"
-            dejavu_bold_path = windows_fonts / "DejaVuSans-Bold.ttf"
-
-            if dejavu_path.exists():
-                pdfmetrics.registerFont(TTFont("DejaVu", str(dejavu_path)))
-                self.font_regular = "DejaVu"
-            else:
-                # Fallback to Arial which has some Cyrillic support
-                arial_path = windows_fonts / "arial.ttf"
-                if arial_path.exists():
-                    pdfmetrics.registerFont(TTFont("Arial-Unicode", str(arial_path)))
-                    self.font_regular = "Arial-Unicode"
-                else:
-                    # Last fallback to Helvetica (won't show Cyrillic properly)
-                    self.font_regular = "Helvetica"
-                    print(
-                        "Warning: Unicode font not found. Cyrillic text may not display correctly."
-                    )
-
-            if dejavu_bold_path.exists():
-                pdfmetrics.registerFont(TTFont("DejaVu-Bold", str(dejavu_bold_path)))
-                self.font_bold = "DejaVu-Bold"
-            else:
-                # Fallback to Arial Bold
-                arial_bold_path = windows_fonts / "arialbd.ttf"
-                if arial_bold_path.exists():
-                    pdfmetrics.registerFont(
-                        TTFont("Arial-Bold-Unicode", str(arial_bold_path))
-                    )
-                    self.font_bold = "Arial-Bold-Unicode"
-                else:
-                    self.font_bold = "Helvetica-Bold"
-
-        except Exception as e:
-            print(f"Warning: Could not register Unicode fonts: {e}")
-            self.font_regular = "Helvetica"
-            self.font_bold = "Helvetica-Bold"
+        self.font_regular, self.font_bold = _register_fonts()
 
     def _load_metadata(self) -> dict:
         """Load book metadata from plan.yaml."""
@@ -109,15 +160,21 @@ class KDPCoverGenerator:
         if not plan_path.exists():
             raise FileNotFoundError(f"plan.yaml not found in {self.book_path}")
 
-        with open(plan_path, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f)
+        return _load_plan(str(plan_path), plan_path.stat().st_mtime_ns)
 
     def _find_cover_image(self) -> Optional[Path]:
         """Find cover image in book folder."""
+        # One directory read instead of a stat per candidate extension. Names
+        # are compared lowercased, like exists() on Windows and macOS did.
+        covers = {
+            p.name.lower(): p
+            for p in self.book_path.iterdir()
+            if p.name.lower().startswith("cover.")
+        }
         for ext in [".png", ".jpg", ".jpeg"]:
-            cover_path = self.book_path / f"cover{ext}"
-            if cover_path.exists():
-                return cover_path
+            path = covers.get(f"cover{ext}")
+            if path is not None:
+                return path
         return None
 
     def _get_back_cover_text(self) -> str:
@@ -144,7 +201,7 @@ class KDPCoverGenerator:
         """
         # Background color - extend into bleed area
         # Extend left to edge (x - bleed), top/bottom to edges
-        c.setFillColor(HexColor("#1a1a2e"))
+        c.setFillColor(BACK_COVER_BG)
         c.rect(
             x - self.bleed,  # Extend left into bleed
             y - self.bleed,  # Extend bottom into bleed
@@ -176,17 +233,21 @@ class KDPCoverGenerator:
             title_y -= 22
 
         # Separator line
-        c.setStrokeColor(HexColor("#e94560"))
+        c.setStrokeColor(SEPARATOR_COLOR)
         c.setLineWidth(2)
         c.line(text_x, title_y - 10, text_x + text_width, title_y - 10)
 
         # Description text
         desc_y = title_y - 30
         c.setFont(self.font_regular, 11)
-        c.setFillColor(HexColor("#e8e8e8"))
+        c.setFillColor(DESCRIPTION_COLOR)
 
-        # Wrap description text
-        desc_lines = self._wrap_text(c, back_text, text_width, self.font_regular, 11)
+        # Wrap description text, only as many lines as fit above the bottom margin
+        bottom = y + margin
+        max_lines = int((desc_y - bottom) // 14) + 1 if desc_y >= bottom else 0
+        desc_lines = self._wrap_text(
+            c, back_text, text_width, self.font_regular, 11, max_lines=max_lines
+        )
         for line in desc_lines:
             if desc_y < y + margin:
                 break
@@ -194,22 +255,43 @@ class KDPCoverGenerator:
             desc_y -= 14
 
     def _wrap_text(
-        self, c: canvas.Canvas, text: str, max_width: float, font: str, font_size: int
+        self,
+        c: canvas.Canvas,
+        text: str,
+        max_width: float,
+        font: str,
+        font_size: int,
+        max_lines: Optional[int] = None,
     ) -> list:
-        """Wrap text to fit within max_width."""
+        """Wrap text to fit within max_width, stopping after max_lines lines if given."""
         c.setFont(font, font_size)
+        if max_lines is not None and max_lines <= 0:
+            return []
         words = text.split()
         lines = []
         current_line = []
+        current_width = 0.0
+        # Glyph widths just add up, so each word is measured once and the
+        # line width is kept as a running sum instead of re-measuring the line
+        space_width = _text_width(" ", font, font_size)
 
         for word in words:
-            test_line = " ".join(current_line + [word])
-            if c.stringWidth(test_line, font, font_size) <= max_width:
+            word_width = _text_width(word, font, font_size)
+            if not current_line:
+                test_width = word_width
+            else:
+                test_width = current_width + space_width + word_width
+
+            if test_width <= max_width:
                 current_line.append(word)
+                current_width = test_width
             else:
                 if current_line:
                     lines.append(" ".join(current_line))
+                    if max_lines is not None and len(lines) >= max_lines:
+                        return lines
                 current_line = [word]
+                current_width = word_width
 
         if current_line:
             lines.append(" ".join(current_line))
@@ -250,7 +332,7 @@ class KDPCoverGenerator:
     def _draw_generated_front_cover(self, c: canvas.Canvas, x: float, y: float):
         """Generate a simple front cover design."""
         # Background gradient (simulated with rectangles) - extend into bleed
-        c.setFillColor(HexColor("#0f3460"))
+        c.setFillColor(FRONT_COVER_BG)
         c.rect(
             x,  # Start at trim line
             y - self.bleed,  # Extend bottom into bleed
@@ -287,22 +369,21 @@ class KDPCoverGenerator:
         )
 
         for line in title_lines:
-            line_width = c.stringWidth(line, self.font_bold, 24)
+            line_width = _text_width(line, self.font_bold, 24)
             line_x = x + (self.trim_width - line_width) / 2
             c.drawString(line_x, title_y, line)
             title_y -= 30
 
-    def _draw_spine(self, c: canvas.Canvas, x: float, y: float):
+    def _draw_spine_background(self, c: canvas.Canvas, x: float, y: float):
         """
-        Draw spine in the middle.
+        Draw the spine background, extended into the top/bottom bleed.
 
         Args:
             c: ReportLab canvas
             x: X position of spine area
             y: Y position of spine area
         """
-        # Background - extend into top/bottom bleed
-        c.setFillColor(HexColor("#16213e"))
+        c.setFillColor(SPINE_BG)
         c.rect(
             x,
             y - self.bleed,  # Extend bottom into bleed
@@ -312,6 +393,15 @@ class KDPCoverGenerator:
             stroke=0,
         )
 
+    def _draw_spine(self, c: canvas.Canvas, x: float, y: float):
+        """
+        Draw spine text in the middle. The background is drawn separately.
+
+        Args:
+            c: ReportLab canvas
+            x: X position of spine area
+            y: Y position of spine area
+        """
         # Title on spine (rotated)
         book_title = self.metadata.get("name", "Book Title")
 
@@ -324,13 +414,23 @@ class KDPCoverGenerator:
 
         # Truncate title if too long for spine
         max_spine_text_width = self.trim_height - inch
-        while (
-            c.stringWidth(book_title, self.font_bold, 14) > max_spine_text_width
-            and len(book_title) > 10
-        ):
-            book_title = book_title[: len(book_title) - 4] + "..."
+        title_width = _text_width(book_title, self.font_bold, 14)
+        ellipsis_width = _text_width("...", self.font_bold, 14)
+        if title_width > max_spine_text_width and len(book_title) > 10:
+            # Binary search for the longest prefix that fits together with "...".
+            # Like cutting 4 characters and then one at a time, it keeps at
+            # least 7 characters (10 with the ellipsis) and at most len - 4.
+            lo, hi = 7, len(book_title) - 4
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                prefix_width = _text_width(book_title[:mid], self.font_bold, 14)
+                if prefix_width + ellipsis_width <= max_spine_text_width:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            book_title = book_title[:lo] + "..."
+            title_width = _text_width(book_title, self.font_bold, 14)
 
-        title_width = c.stringWidth(book_title, self.font_bold, 14)
         c.drawString(-title_width / 2, 0, book_title)
 
         c.restoreState()
@@ -354,8 +454,13 @@ class KDPCoverGenerator:
         draw_spine_text = self.spine_width >= min_spine_text_width
 
         # Create PDF canvas with full width (including spine)
+        # Compressed content streams keep the upload small; invariant output
+        # (no creation timestamp or random ID) makes reruns byte-identical
         c = canvas.Canvas(
-            str(output_path), pagesize=(self.total_width, self.total_height)
+            str(output_path),
+            pagesize=(self.total_width, self.total_height),
+            pageCompression=1,
+            invariant=1,
         )
 
         # Starting positions (accounting for bleed)
@@ -368,16 +473,7 @@ class KDPCoverGenerator:
         # Draw spine (MIDDLE) - always draw background, conditionally draw text
         spine_x = start_x + self.trim_width
 
-        # Draw spine background - extend into top/bottom bleed
-        c.setFillColor(HexColor("#16213e"))
-        c.rect(
-            spine_x,
-            start_y - self.bleed,  # Extend bottom into bleed
-            self.spine_width,
-            self.trim_height + 2 * self.bleed,  # Extend top and bottom
-            fill=1,
-            stroke=0,
-        )
+        self._draw_spine_background(c, spine_x, start_y)
 
         if draw_spine_text:
             self._draw_spine(c, spine_x, start_y)
@@ -411,6 +507,38 @@ class KDPCoverGenerator:
         pass
 
 
+def _generate_cover(book_folder: str, page_count: int) -> Path:
+    """Builds one cover; module-level so it can run in a worker process."""
+    return KDPCoverGenerator(book_folder=book_folder, page_count=page_count).generate_cover()
+
+
+def generate_covers(
+    book_folders: List[str], page_count: int = 300, max_workers: Optional[int] = None
+) -> List[Path]:
+    """
+    Generate covers for several books in parallel.
+
+    Building a PDF with ReportLab is CPU-bound Python, so the books are spread
+    over worker processes. Each worker registers the fonts once.
+
+    Args:
+        book_folders: Names of the book folders in 'books/'
+        page_count: Total page count for spine width calculation
+        max_workers: Number of worker processes (default: CPU count)
+
+    Returns:
+        Paths to the generated PDFs, in the order of book_folders
+    """
+    if len(book_folders) == 1:
+        return [_generate_cover(book_folders[0], page_count)]
+
+    workers = min(max_workers or os.cpu_count() or 1, len(book_folders))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(
+            pool.map(_generate_cover, book_folders, [page_count] * len(book_folders))
+        )
+
+
 def main():
     """Main entry point."""
     import argparse
@@ -419,7 +547,8 @@ def main():
     parser.add_argument(
         "book",
         type=str,
-        help="Book folder name (e.g., 'sirens')",
+        nargs="+",
+        help="Book folder name (e.g., 'sirens'); several books are built in parallel",
     )
     parser.add_argument(
         "--pages",
@@ -435,7 +564,13 @@ def main():
 
     args = parser.parse_args()
 
-    generator = KDPCoverGenerator(book_folder=args.book, page_count=args.pages)
+    if len(args.book) > 1:
+        if args.output:
+            parser.error("--output can only be used with a single book")
+        generate_covers(args.book, page_count=args.pages)
+        return
+
+    generator = KDPCoverGenerator(book_folder=args.book[0], page_count=args.pages)
 
     output_path = Path(args.output) if args.output else None
     generator.generate_cover(output_path)
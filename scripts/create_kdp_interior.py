@@ -9,9 +9,10 @@ Creates a print-ready PDF with:
 - Aggregated markdown content
 
 Usage:
-    uv run python create_kdp_interior.py book_folder_name
+    uv run python create_kdp_interior.py book_folder_name [book_folder_name ...]
 """
 
+import functools
 import sys
 import os
 import yaml
@@ -19,8 +20,24 @@ import subprocess
 from pathlib import Path
 import re
 
+# libyaml-backed loader is much faster; PyYAML may be built without it
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 DOCKER_IMAGE_NAME = "kdp-generator"
 
+# Set once the image is known to exist, so later calls skip `docker inspect`
+_image_ready = False
+
+
+@functools.lru_cache(maxsize=16)
+def _load_plan(path_str, mtime_ns):
+    """Parses plan.yaml; the mtime in the key makes an edited plan load again."""
+    with open(path_str, "rb") as f:
+        return yaml.load(f, Loader=YamlLoader)
+
 
 def load_plan(book_dir):
     plan_path = book_dir / "plan.yaml"
@@ -28,48 +45,56 @@ def load_plan(book_dir):
         print(f"Error: plan.yaml not found in {book_dir}")
         sys.exit(1)
 
-    with open(plan_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+    return _load_plan(str(plan_path), plan_path.stat().st_mtime_ns)
+
+
+# Markdown headers (1-6 hashes at the start of a line) and the whitespace after them
+HEADER_RE = re.compile(r"^(#{1,6})[^\S\n]+", re.MULTILINE)
 
 
 def shift_headers(content, shift_by):
     """
     Shifts markdown headers by a specified amount.
     """
-    lines = content.split("\n")
-    new_lines = []
-    header_regex = re.compile(r"^(#{1,6})\s+(.*)")
+    if shift_by == 0:
+        return content
+    # Cheap check for text without any line starting with "#"
+    if not content.startswith("#") and "\n#" not in content:
+        return content
+    return HEADER_RE.sub(lambda m: "#" * (len(m.group(1)) + shift_by) + " ", content)
+
+
+NUMBER_RE = re.compile(r"\d+")
 
-    for line in lines:
-        match = header_regex.match(line)
-        if match:
-            hashes, text = match.groups()
-            new_hashes = "#" * (len(hashes) + shift_by)
-            new_lines.append(f"{new_hashes} {text}")
-        else:
-            new_lines.append(line)
 
-    return "\n".join(new_lines)
+def natural_sort_key(name):
+    """Orders names by the numbers in them, so part_10 comes after part_2."""
+    return tuple(int(n) for n in NUMBER_RE.findall(name)), name
 
 
 def get_sorted_parts(book_dir):
-    parts = []
-    for item in os.listdir(book_dir):
-        if os.path.isdir(book_dir / item) and item.startswith("part_"):
-            parts.append(item)
-    return sorted(parts)
+    # scandir entries carry the file type from the directory read, no extra stat per item
+    with os.scandir(book_dir) as entries:
+        return sorted(
+            (e.name for e in entries if e.is_dir() and e.name.startswith("part_")),
+            key=natural_sort_key,
+        )
 
 
 def get_sorted_files(part_dir):
-    files = []
-    for item in os.listdir(part_dir):
-        if item.endswith(".md") and not item.startswith("_"):
-            files.append(item)
-    return sorted(files)
+    with os.scandir(part_dir) as entries:
+        return sorted(
+            (
+                e.name
+                for e in entries
+                if e.is_file() and e.name.endswith(".md") and not e.name.startswith("_")
+            ),
+            key=natural_sort_key,
+        )
 
 
-def collect_markdown_content(book_dir):
-    full_content = []
+def write_markdown_content(book_dir, out):
+    """Writes the markdown of the whole book to `out`, one file at a time."""
     parts = get_sorted_parts(book_dir)
 
     for part_name in parts:
@@ -82,8 +107,8 @@ def collect_markdown_content(book_dir):
         if part_intro_path.exists():
             with open(part_intro_path, "r", encoding="utf-8") as f:
                 content = f.read()
-                full_content.append(content)
-                full_content.append("\n\n")
+                out.write(content)
+                out.write("\n\n")
 
         # Process Chapters and Sections
         files = get_sorted_files(part_dir)
@@ -99,14 +124,17 @@ def collect_markdown_content(book_dir):
                 # Section: Shift H2 -> H3
                 content = shift_headers(content, 1)
 
-            full_content.append(content)
-            full_content.append("\n\n")
+            out.write(content)
+            out.write("\n\n")
 
-    return "".join(full_content)
 
 
 def build_docker_image():
     """Builds the Docker image if it doesn't exist."""
+    global _image_ready
+    if _image_ready:
+        return
+
     print("Checking Docker image...")
     try:
         subprocess.run(
@@ -116,6 +144,7 @@ def build_docker_image():
             stderr=subprocess.DEVNULL,
         )
         print(f"Docker image '{DOCKER_IMAGE_NAME}' already exists.")
+        _image_ready = True
     except subprocess.CalledProcessError:
         print(f"Building Docker image '{DOCKER_IMAGE_NAME}'...")
         try:
@@ -125,27 +154,22 @@ def build_docker_image():
                 cwd=Path(__file__).parent,
             )
             print("Docker image built successfully.")
+            _image_ready = True
         except subprocess.CalledProcessError as e:
             print(f"Error building Docker image: {e}")
             sys.exit(1)
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python create_kdp_interior.py <book_folder_name>")
-        sys.exit(1)
-
-    book_name = sys.argv[1]
-    base_dir = Path(__file__).parent.parent
-    book_dir = base_dir / "books" / book_name
-
-    if not book_dir.exists():
-        print(f"Error: Book directory {book_dir} does not exist.")
-        sys.exit(1)
+def prepare_book(book_dir, book_name):
+    """
+    Builds the pandoc arguments for a book.
 
-    # Ensure Docker image is ready
-    build_docker_image()
+    The markdown is streamed to pandoc's stdin (see run_pandoc), so only the
+    output goes through the 'books' directory, mounted to /data in the container.
 
+    Returns:
+        Tuple of (pandoc arguments, output PDF path)
+    """
     print(f"Processing book: {book_name}")
 
     # Load Metadata
@@ -154,35 +178,14 @@ def main():
     language = plan.get("book_language", "en")
     author = plan.get("author", "A.I. Grigorev")
 
-    # Collect Content
-    print("Collecting markdown content...")
-    markdown_content = collect_markdown_content(book_dir)
-
-    # Save temporary combined markdown
-    temp_md_filename = f"{book_name}_interior.md"
-    temp_md_path = book_dir / temp_md_filename
-    with open(temp_md_path, "w", encoding="utf-8") as f:
-        f.write(markdown_content)
-
     # Output PDF filename
     output_pdf_filename = "kdp_interior.pdf"
     output_pdf_path = book_dir / output_pdf_filename
 
-    # Docker Command
-    # We mount the 'books' directory to /data in the container
-    # So inside container: /data/book_name/file.md
-
-    books_root_abs = (base_dir / "books").resolve()
     container_book_dir = f"/data/{book_name}"
 
-    cmd = [
-        "docker",
-        "run",
-        "--rm",
-        "-v",
-        f"{books_root_abs}:/data",
-        DOCKER_IMAGE_NAME,
-        f"{container_book_dir}/{temp_md_filename}",
+    pandoc_args = [
+        "--from=markdown",
         "-o",
         f"{container_book_dir}/{output_pdf_filename}",
         "--pdf-engine=xelatex",
@@ -218,7 +221,7 @@ def main():
     ]
 
     if language == "ru":
-        cmd += [
+        pandoc_args += [
             "-V",
             "lang=ru-RU",
             "-V",
@@ -227,17 +230,139 @@ def main():
             "polyglossia",
         ]
 
-    print("Running Docker to generate PDF...")
+    return pandoc_args, output_pdf_path
+
+
+def run_pandoc(cmd, book_dir):
+    """
+    Runs a docker command that starts pandoc and streams the book markdown to its stdin.
+
+    Raises:
+        subprocess.CalledProcessError: If the command exits with a non-zero code
+    """
+    print("Streaming markdown content...")
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, text=True, encoding="utf-8")
+    try:
+        write_markdown_content(book_dir, process.stdin)
+    except BrokenPipeError:
+        # pandoc exited early; its exit code below tells what happened
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    returncode = process.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
+def start_warm_container(books_root_abs):
+    """
+    Starts an idle container that later pandoc runs are exec'ed into.
+
+    Saves the container startup for every book after the first one.
+    The container is removed as soon as it's stopped.
+    """
+    result = subprocess.run(
+        [
+            "docker",
+            "run",
+            "-d",
+            "--rm",
+            "-v",
+            f"{books_root_abs}:/data",
+            "--entrypoint",
+            "sleep",
+            DOCKER_IMAGE_NAME,
+            "infinity",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.strip()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python create_kdp_interior.py <book_folder_name> [<book_folder_name> ...]")
+        sys.exit(1)
+
+    book_names = sys.argv[1:]
+    base_dir = Path(__file__).parent.parent
+    books_root = base_dir / "books"
+
+    for book_name in book_names:
+        book_dir = books_root / book_name
+        if not book_dir.exists():
+            print(f"Error: Book directory {book_dir} does not exist.")
+            sys.exit(1)
+
+    # Ensure Docker image is ready
+    build_docker_image()
+
+    books_root_abs = books_root.resolve()
+
+    if len(book_names) == 1:
+        book_name = book_names[0]
+        book_dir = books_root / book_name
+        pandoc_args, output_pdf_path = prepare_book(book_dir, book_name)
+
+        # Docker Command, -i keeps stdin open for the markdown
+        cmd = [
+            "docker",
+            "run",
+            "--rm",
+            "-i",
+            "-v",
+            f"{books_root_abs}:/data",
+            DOCKER_IMAGE_NAME,
+        ] + pandoc_args
+
+        print("Running Docker to generate PDF...")
+        try:
+            run_pandoc(cmd, book_dir)
+            print(f"[OK] KDP interior PDF generated: {output_pdf_path}")
+        except subprocess.CalledProcessError as e:
+            print(f"Error running Docker command: {e}")
+            sys.exit(1)
+        return
+
+    # Several books: one container, one pandoc run per book inside it
+    print(f"Starting Docker container for {len(book_names)} books...")
     try:
-        subprocess.run(cmd, check=True)
-        print(f"[OK] KDP interior PDF generated: {output_pdf_path}")
+        container_id = start_warm_container(books_root_abs)
     except subprocess.CalledProcessError as e:
-        print(f"Error running Docker command: {e}")
+        print(f"Error starting Docker container: {e}")
         sys.exit(1)
+
+    failed = []
+    try:
+        for book_name in book_names:
+            book_dir = books_root / book_name
+            pandoc_args, output_pdf_path = prepare_book(book_dir, book_name)
+            print("Running pandoc in Docker to generate PDF...")
+            try:
+                run_pandoc(
+                    ["docker", "exec", "-i", container_id, "pandoc"] + pandoc_args,
+                    book_dir,
+                )
+                print(f"[OK] KDP interior PDF generated: {output_pdf_path}")
+            except subprocess.CalledProcessError as e:
+                print(f"Error running Docker command for {book_name}: {e}")
+                failed.append(book_name)
     finally:
-        # Cleanup
-        if temp_md_path.exists():
-            os.remove(temp_md_path)
+        subprocess.run(
+            ["docker", "stop", container_id],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    if failed:
+        print(f"Failed books: {', '.join(failed)}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ Creates an IAM user with read-only access to the S3 bucket for TTS audio files.
 import boto3
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 
 def create_s3_user():
@@ -52,10 +53,21 @@ def create_s3_user():
         print(f"Creating access key for '{user_name}'...")
 
         # First, delete old access keys if any (max 2 keys per user)
-        existing_keys = iam.list_access_keys(UserName=user_name)
-        for key in existing_keys["AccessKeyMetadata"]:
-            print(f"  Deleting old access key: {key['AccessKeyId']}")
-            iam.delete_access_key(UserName=user_name, AccessKeyId=key["AccessKeyId"])
+        paginator = iam.get_paginator("list_access_keys")
+        old_key_ids = [
+            key["AccessKeyId"]
+            for page in paginator.paginate(UserName=user_name)
+            for key in page["AccessKeyMetadata"]
+        ]
+
+        def delete_key(key_id):
+            print(f"  Deleting old access key: {key_id}")
+            iam.delete_access_key(UserName=user_name, AccessKeyId=key_id)
+
+        # Independent round trips, so they run at the same time
+        if old_key_ids:
+            with ThreadPoolExecutor(max_workers=len(old_key_ids)) as pool:
+                list(pool.map(delete_key, old_key_ids))
 
         # Create new access key
         response = iam.create_access_key(UserName=user_name)
@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from book_generator.execute import show_progress
+from chapter_based.execute import FileSystemWriter, ProgressTracker
+
+
+class TestProgressTracker(unittest.TestCase):
+    def test_advance_matches_show_progress(self):
+        items = ["Chapter 1", "Chapter 2", "Chapter 3"]
+        tracker = ProgressTracker(items)
+
+        for i in range(len(items)):
+            expected = show_progress(items[:i], items[i], items[i + 1:], lambda x: x)
+            self.assertEqual(tracker.advance(), expected)
+
+
+class TestFileSystemWriter(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_leaves_no_temp_files(self):
+        writer = FileSystemWriter(self.test_dir)
+        writer.save_part_intro(1, "Intro")
+        writer.save_chapter(1, 1, "Chapter")
+        writer.save_chapter(1, 1, "Chapter, rewritten")
+
+        part_folder = self.test_dir / "part_01"
+        self.assertEqual(
+            sorted(p.name for p in part_folder.iterdir()),
+            ["01_chapter.md", "_part_01_intro.md"],
+        )
+        self.assertEqual(
+            (part_folder / "01_chapter.md").read_text(encoding="utf-8"),
+            "Chapter, rewritten",
+        )
+        self.assertTrue(writer.chapter_exists(1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,18 @@
+import json
 import unittest
-from unittest.mock import patch, MagicMock
-import tempfile
-import shutil
-from pathlib import Path
-import yaml
-from book_generator.execute import BookExecutor, show_progress
+from unittest.mock import patch, MagicMock, AsyncMock
+from types import SimpleNamespace
+from google.genai import types
+from book_generator.execute import BookExecutor, ChapterSpecs, ProgressView, show_progress
 from book_generator.models import BookPlan, BookPartPlan, BookChapterPlan, BookSectionPlan
-from book_generator.execute import ChapterSpecs
+
+
+def make_response(text):
+    # A plain object is all the executor reads; MagicMock is much slower to build
+    return SimpleNamespace(
+        text=text,
+        usage_metadata={'prompt_token_count': 10, 'candidates_token_count': 10},
+    )
 
 
 class TestProgress(unittest.TestCase):
@@ -56,15 +62,22 @@ class TestProgress(unittest.TestCase):
         )
         self.assertEqual(result, expected)
 
+    def test_progress_view_matches_show_progress(self):
+        items = ["Item 1", "Item 2", "Item 3"]
+        view = ProgressView(items, lambda x: x)
+
+        for i in range(len(items)):
+            expected = show_progress(items[:i], items[i], items[i + 1:], lambda x: x)
+            self.assertEqual(view.render(i), expected)
+
 class TestExecution(unittest.TestCase):
-    def setUp(self):
-        self.test_dir = tempfile.mkdtemp()
-        self.root_folder = Path(self.test_dir) / 'sirens'
-        self.root_folder.mkdir()
-        
-        self.plan = BookPlan(
+    @classmethod
+    def setUpClass(cls):
+        # Read-only input of every test, validated once for the class
+        cls.plan = BookPlan(
             book_language='en',
             name="Test Book",
+            slug="test-book",
             target_reader="Testers",
             back_cover_description="A test book.",
             parts=[
@@ -99,15 +112,10 @@ class TestExecution(unittest.TestCase):
             ]
         )
 
-    def tearDown(self):
-        shutil.rmtree(self.test_dir)
-
     @patch('book_generator.execute.llm')
     def test_execute_book_flow(self, mock_llm):
         # Setup mock
-        mock_response = MagicMock()
-        mock_response.text = "Generated content"
-        mock_response.usage_metadata = {'prompt_token_count': 10, 'candidates_token_count': 10}
+        mock_response = make_response("Generated content")
         mock_llm.return_value = mock_response
 
         # Mock Writer
@@ -178,9 +186,7 @@ class TestExecution(unittest.TestCase):
     @patch('book_generator.execute.llm')
     def test_execute_book_skip_existing(self, mock_llm):
         # Setup mock
-        mock_response = MagicMock()
-        mock_response.text = "Generated content"
-        mock_response.usage_metadata = {'prompt_token_count': 10, 'candidates_token_count': 10}
+        mock_response = make_response("Generated content")
         mock_llm.return_value = mock_response
 
         # Mock Writer
@@ -226,9 +232,7 @@ class TestExecution(unittest.TestCase):
     @patch('book_generator.execute.llm')
     def test_process_chapter_intro(self, mock_llm):
         # Setup mock
-        mock_response = MagicMock()
-        mock_response.text = "Intro content"
-        mock_response.usage_metadata = {'prompt_token_count': 10, 'candidates_token_count': 10}
+        mock_response = make_response("Intro content")
         mock_llm.return_value = mock_response
 
         mock_writer = MagicMock()
@@ -259,15 +263,16 @@ class TestExecution(unittest.TestCase):
         executor._process_chapter_intro(chapter_spec)
 
         self.assertEqual(mock_llm.call_count, 1)
+        # The chapter overview is the chapter plan as JSON
+        overview = mock_llm.call_args.kwargs['prompt']
+        self.assertEqual(BookChapterPlan.model_validate_json(overview), chapter_plan)
         mock_writer.save_intro.assert_called_once()
         self.assertGreater(executor.tracker.total_cost, 0)
 
     @patch('book_generator.execute.llm')
     def test_process_single_section(self, mock_llm):
         # Setup mock
-        mock_response = MagicMock()
-        mock_response.text = "Section content"
-        mock_response.usage_metadata = {'prompt_token_count': 10, 'candidates_token_count': 10}
+        mock_response = make_response("Section content")
         mock_llm.return_value = mock_response
 
         mock_writer = MagicMock()
@@ -286,7 +291,6 @@ class TestExecution(unittest.TestCase):
         
         part_plan = self.plan.parts[0]
         
-        from book_generator.execute import ChapterSpecs
 
         chapter_spec = ChapterSpecs(
             part=part_plan,
@@ -306,9 +310,7 @@ class TestExecution(unittest.TestCase):
     @patch('book_generator.execute.llm')
     def test_process_chapter_sections(self, mock_llm):
         # Setup mock
-        mock_response = MagicMock()
-        mock_response.text = "Section content"
-        mock_response.usage_metadata = {'prompt_token_count': 10, 'candidates_token_count': 10}
+        mock_response = make_response("Section content")
         mock_llm.return_value = mock_response
 
         mock_writer = MagicMock()
@@ -327,7 +329,6 @@ class TestExecution(unittest.TestCase):
         
         part_plan = self.plan.parts[0]
         
-        from book_generator.execute import ChapterSpecs
 
         chapter_spec = ChapterSpecs(
             part=part_plan,
@@ -345,11 +346,241 @@ class TestExecution(unittest.TestCase):
         self.assertEqual(mock_writer.save_section.call_count, 2)
         self.assertGreater(executor.tracker.total_cost, 0)
 
-    def test_build_chapter_specs(self):
+    @patch('book_generator.execute.llm_async', new_callable=AsyncMock)
+    @patch('book_generator.execute.llm')
+    def test_execute_book_concurrent(self, mock_llm, mock_llm_async):
+        mock_response = make_response("Generated content")
+        mock_llm_async.return_value = mock_response
+
+        mock_writer = MagicMock()
+        mock_writer.intro_exists.return_value = False
+        mock_writer.section_exists.return_value = False
+
+        executor = BookExecutor(self.plan, mock_writer, max_concurrency=2)
+        executor.execute()
+
+        # Same 5 calls as the sequential flow, but through the async client
+        mock_llm.assert_not_called()
+        self.assertEqual(mock_llm_async.call_count, 5)
+
+        prompts = [c.kwargs['prompt'] for c in mock_llm_async.call_args_list]
+        prompt_2_1 = next(p for p in prompts if "The section name: Section 2.1" in p)
+        self.assertIn("[x] Chapter 1", prompt_2_1)
+        self.assertIn("[ ] Chapter 2 <-- YOU'RE CURRENTLY HERE", prompt_2_1)
+
+        mock_writer.save_intro.assert_any_call(1, 1, "# 1. Chapter 1\n\nGenerated content")
+        mock_writer.save_intro.assert_any_call(1, 2, "# 2. Chapter 2\n\nGenerated content")
+        mock_writer.save_section.assert_any_call(1, 1, 1, "## Section 1.1\n\nGenerated content")
+        mock_writer.save_section.assert_any_call(1, 1, 2, "## Section 1.2\n\nGenerated content")
+        mock_writer.save_section.assert_any_call(1, 2, 1, "## Section 2.1\n\nGenerated content")
+        self.assertGreater(executor.tracker.total_cost, 0)
+
+    @patch('book_generator.execute.llm')
+    def test_execute_book_batch_sections(self, mock_llm):
+        def llm_side_effect(instructions, prompt, response_json_schema=None):
+            if response_json_schema is None:
+                return make_response("Intro content")
+            # Each chapter has exactly one section left to write
+            name = "Section 1.2" if "1. Section 1.2" in prompt else "Section 2.1"
+            return make_response(json.dumps(
+                {"sections": [{"name": name, "markdown": "Batched content"}]}
+            ))
+
+        mock_llm.side_effect = llm_side_effect
+
+        mock_writer = MagicMock()
+        mock_writer.intro_exists.return_value = False
+        # Section 1.1 is already written
+        mock_writer.section_exists.side_effect = lambda p, c, s: (p, c, s) == (1, 1, 1)
+
+        executor = BookExecutor(self.plan, mock_writer, batch_sections=True)
+        executor.execute()
+
+        # 2 intros + 1 call per chapter
+        self.assertEqual(mock_llm.call_count, 4)
+
+        batch_prompt = mock_llm.call_args_list[1].kwargs['prompt']
+        self.assertIn("1. Section 1.2", batch_prompt)
+        self.assertNotIn("1. Section 1.1", batch_prompt)
+        self.assertIn("[ ] Chapter 1 <-- YOU'RE CURRENTLY HERE", batch_prompt)
+
+        self.assertEqual(mock_writer.save_section.call_count, 2)
+        mock_writer.save_section.assert_any_call(1, 1, 2, "## Section 1.2\n\nBatched content")
+        mock_writer.save_section.assert_any_call(1, 2, 1, "## Section 2.1\n\nBatched content")
+
+    @patch('book_generator.execute.llm')
+    def test_execute_book_batch_sections_matches_names(self, mock_llm):
+        def llm_side_effect(instructions, prompt, response_json_schema=None):
+            if response_json_schema is None:
+                return make_response("Generated content")
+            # Out of order, with one section the plan doesn't have
+            return make_response(json.dumps({"sections": [
+                {"name": "section 1.2", "markdown": "Drafted 1.2"},
+                {"name": "Something else", "markdown": "Unknown"},
+                {"name": "Section 2.1", "markdown": "Drafted 2.1"},
+            ]}))
+
+        mock_llm.side_effect = llm_side_effect
+
+        mock_writer = MagicMock()
+        mock_writer.intro_exists.return_value = True
+        mock_writer.section_exists.return_value = False
+
+        executor = BookExecutor(self.plan, mock_writer, batch_sections=True)
+        executor.execute()
+
+        saved = [c.args for c in mock_writer.save_section.call_args_list]
+        self.assertCountEqual(saved, [
+            (1, 1, 2, "## Section 1.2\n\nDrafted 1.2"),
+            # Not in the draft, written on its own
+            (1, 1, 1, "## Section 1.1\n\nGenerated content"),
+            (1, 2, 1, "## Section 2.1\n\nDrafted 2.1"),
+        ])
+
+    @patch('book_generator.execute.llm')
+    def test_execute_book_chapters_per_call(self, mock_llm):
+        def llm_side_effect(instructions, prompt, response_json_schema=None):
+            if response_json_schema is None:
+                return make_response("Intro content")
+            return make_response(json.dumps({"chapters": [
+                {"sections": [
+                    {"name": "Section 1.1", "markdown": "Content 1.1"},
+                    {"name": "Section 1.2", "markdown": "Content 1.2"},
+                ]},
+                {"sections": [{"name": "Section 2.1", "markdown": "Content 2.1"}]},
+            ]}))
+
+        mock_llm.side_effect = llm_side_effect
+
+        mock_writer = MagicMock()
+        mock_writer.intro_exists.return_value = False
+        mock_writer.section_exists.return_value = False
+
+        executor = BookExecutor(self.plan, mock_writer, chapters_per_call=2)
+        executor.execute()
+
+        # 2 intros + 1 call for both chapters
+        self.assertEqual(mock_llm.call_count, 3)
+
+        batch_prompt = mock_llm.call_args_list[2].kwargs['prompt']
+        self.assertIn("Chapter 1: Chapter 1", batch_prompt)
+        self.assertIn("Chapter 2: Chapter 2", batch_prompt)
+
+        self.assertEqual(mock_writer.save_section.call_count, 3)
+        mock_writer.save_section.assert_any_call(1, 1, 2, "## Section 1.2\n\nContent 1.2")
+        mock_writer.save_section.assert_any_call(1, 2, 1, "## Section 2.1\n\nContent 2.1")
+
+    @patch('book_generator.execute.llm')
+    def test_execute_book_chapters_per_call_fallback(self, mock_llm):
+        # A response cut off by the output limit isn't valid JSON
+        mock_llm.return_value = make_response("Generated content")
+
+        mock_writer = MagicMock()
+        mock_writer.intro_exists.return_value = False
+        mock_writer.section_exists.return_value = False
+
+        executor = BookExecutor(self.plan, mock_writer, chapters_per_call=2)
+        executor.execute()
+
+        # 2 intros + the failed batch + 3 sections one by one
+        self.assertEqual(mock_llm.call_count, 6)
+        mock_writer.save_section.assert_any_call(1, 1, 1, "## Section 1.1\n\nGenerated content")
+        mock_writer.save_section.assert_any_call(1, 2, 1, "## Section 2.1\n\nGenerated content")
+
+    @patch('book_generator.execute.llm')
+    def test_execute_book_parallel_sections(self, mock_llm):
+        mock_response = make_response("Generated content")
+        mock_llm.return_value = mock_response
+
+        mock_writer = MagicMock()
+        mock_writer.intro_exists.return_value = False
+        mock_writer.section_exists.return_value = False
+
+        executor = BookExecutor(self.plan, mock_writer, parallel_sections=2)
+        executor.execute()
+
+        self.assertEqual(mock_llm.call_count, 5)
+
+        # Each worker still gets its own chapter progress
+        prompts = [c.kwargs['prompt'] for c in mock_llm.call_args_list]
+        prompt_1_2 = next(p for p in prompts if "The section name: Section 1.2" in p)
+        self.assertIn("[x] Section 1.1", prompt_1_2)
+        self.assertIn("[ ] Section 1.2 <-- YOU'RE CURRENTLY HERE", prompt_1_2)
+
+        mock_writer.save_section.assert_any_call(1, 1, 1, "## Section 1.1\n\nGenerated content")
+        mock_writer.save_section.assert_any_call(1, 1, 2, "## Section 1.2\n\nGenerated content")
+        mock_writer.save_section.assert_any_call(1, 2, 1, "## Section 2.1\n\nGenerated content")
+        self.assertAlmostEqual(executor.tracker.total_cost, 5 * (10 * 2.00 + 10 * 12.00) / 1_000_000)
+
+    @patch('book_generator.execute.get_client')
+    def test_execute_book_batch_api(self, mock_get_client):
+        def inlined_response(text):
+            response = make_response(text)
+            return MagicMock(error=None, response=response)
+
+        batch_job = MagicMock()
+        batch_job.state = types.JobState.JOB_STATE_SUCCEEDED
+        # Section 1.2, Intro 2 and Section 2.1, in request order
+        batch_job.dest.inlined_responses = [
+            inlined_response("Content 1.2"),
+            inlined_response("Intro content"),
+            inlined_response("Content 2.1"),
+        ]
+        client = mock_get_client.return_value
+        client.batches.create.return_value = batch_job
+
+        mock_writer = MagicMock()
+        mock_writer.intro_exists.side_effect = lambda p, c: c == 1
+        mock_writer.section_exists.side_effect = lambda p, c, s: (p, c, s) == (1, 1, 1)
+
+        executor = BookExecutor(self.plan, mock_writer, use_batch=True)
+        executor.execute()
+
+        requests = client.batches.create.call_args.kwargs['src']
+        self.assertEqual(len(requests), 3)
+        self.assertIn("The section name: Section 1.2", requests[0].contents)
+        self.assertIn("[ ] Section 1.2 <-- YOU'RE CURRENTLY HERE", requests[0].contents)
+        self.assertIn('"name":"Chapter 2"', requests[1].contents)
+        self.assertIn("[ ] Chapter 2 <-- YOU'RE CURRENTLY HERE", requests[2].contents)
+
+        mock_writer.save_intro.assert_called_once_with(1, 2, "# 2. Chapter 2\n\nIntro content")
+        self.assertEqual(mock_writer.save_section.call_count, 2)
+        mock_writer.save_section.assert_any_call(1, 1, 2, "## Section 1.2\n\nContent 1.2")
+        mock_writer.save_section.assert_any_call(1, 2, 1, "## Section 2.1\n\nContent 2.1")
+        # Batch requests are billed at half the standard rates
+        self.assertAlmostEqual(executor.tracker.total_cost, 3 * (10 * 1.00 + 10 * 6.00) / 1_000_000)
+
+    @patch('book_generator.utils.time.sleep')
+    @patch('book_generator.execute.get_client')
+    def test_execute_book_batch_api_failure(self, mock_get_client, mock_sleep):
+        client = mock_get_client.return_value
+        client.batches.create.return_value = MagicMock(state=types.JobState.JOB_STATE_RUNNING)
+        client.batches.get.side_effect = [
+            MagicMock(state=types.JobState.JOB_STATE_RUNNING),
+            MagicMock(state=types.JobState.JOB_STATE_FAILED),
+        ]
+
+        mock_writer = MagicMock()
+        mock_writer.intro_exists.return_value = False
+        mock_writer.section_exists.return_value = False
+
+        executor = BookExecutor(self.plan, mock_writer, use_batch=True)
+        with self.assertRaises(RuntimeError):
+            executor.execute()
+
+        mock_writer.save_section.assert_not_called()
+        # Polled with a growing delay instead of a fixed interval
+        delays = [c.args[0] for c in mock_sleep.call_args_list]
+        self.assertEqual(len(delays), 2)
+        self.assertLess(delays[0], delays[1])
+
+    def test_chapter_specs(self):
         mock_writer = MagicMock()
         executor = BookExecutor(self.plan, mock_writer)
         
-        specs = executor._build_chapter_specs()
+        specs = executor.chapter_specs
+        # Built once per executor
+        self.assertIs(executor.chapter_specs, specs)
         
         # Plan has 2 chapters (Chapter 1 in Part 1, Chapter 2 in Part 1)
         self.assertEqual(len(specs), 2)
@@ -369,7 +600,7 @@ class TestExecution(unittest.TestCase):
         # Mock process_chapter to verify calls
         executor.process_chapter = MagicMock()
         
-        specs = executor._build_chapter_specs()
+        specs = executor.chapter_specs
         executor._process_all_chapters(specs)
         
         self.assertEqual(executor.process_chapter.call_count, 2)
@@ -1,9 +1,10 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 from pathlib import Path
 import tempfile
 import shutil
-from book_generator.execute import BookExecutor, FileSystemWriter
+from types import SimpleNamespace
+from book_generator.execute import BookExecutor, ContentWriter, FileSystemWriter
 from book_generator.models import (
     BookPlan,
     BookPartPlan,
@@ -11,16 +12,58 @@ from book_generator.models import (
     BookSectionPlan,
 )
 
+# Every LLM call in these tests gets the same canned response
+MOCK_RESPONSE = SimpleNamespace(
+    text="Generated content",
+    usage_metadata={"prompt_token_count": 10, "candidates_token_count": 10},
+)
+
+
+class FakeWriter(ContentWriter):
+    """Records the saves in memory; much cheaper than a MagicMock writer."""
+
+    def __init__(self, back_cover_exists=False, part_intro_exists=False):
+        self.has_back_cover = back_cover_exists
+        self.has_part_intros = part_intro_exists
+        self.calls = []
+
+    def saved(self, kind):
+        """Returns the arguments of every save of `kind`, in order."""
+        return [tuple(args) for call_kind, *args in self.calls if call_kind == kind]
+
+    def save_intro(self, part_number, chapter_number, content):
+        self.calls.append(("intro", part_number, chapter_number, content))
+
+    def save_section(self, part_number, chapter_number, section_number, content):
+        self.calls.append(("section", part_number, chapter_number, section_number, content))
+
+    def save_part_intro(self, part_number, content):
+        self.calls.append(("part_intro", part_number, content))
+
+    def save_back_cover(self, content):
+        self.calls.append(("back_cover", content))
+
+    def intro_exists(self, part_number, chapter_number):
+        return False
+
+    def section_exists(self, part_number, chapter_number, section_number):
+        return False
+
+    def part_intro_exists(self, part_number):
+        return self.has_part_intros
+
+    def back_cover_exists(self):
+        return self.has_back_cover
 
-class TestExecutorOutput(unittest.TestCase):
-    def setUp(self):
-        self.test_dir = tempfile.mkdtemp()
-        self.root_folder = Path(self.test_dir) / "test_book"
-        self.root_folder.mkdir()
 
-        self.plan = BookPlan(
+class TestExecutorOutput(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Read-only input of every test, validated once for the class
+        cls.plan = BookPlan(
             book_language="en",
             name="Test Book",
+            slug="test-book",
             target_reader="Testers",
             back_cover_description="A compelling back cover description.",
             parts=[
@@ -44,6 +87,16 @@ class TestExecutorOutput(unittest.TestCase):
             ],
         )
 
+        # Patched once for the class: every execute() here gets the canned response
+        llm_patcher = patch("book_generator.execute.llm", return_value=MOCK_RESPONSE)
+        llm_patcher.start()
+        cls.addClassCleanup(llm_patcher.stop)
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.root_folder = Path(self.test_dir) / "test_book"
+        self.root_folder.mkdir()
+
     def tearDown(self):
         shutil.rmtree(self.test_dir)
 
@@ -67,115 +120,67 @@ class TestExecutorOutput(unittest.TestCase):
         self.assertEqual(expected_path.read_text(encoding="utf-8"), content)
         self.assertTrue(writer.part_intro_exists(1))
 
-    @patch("book_generator.execute.llm")
-    def test_execute_saves_back_cover(self, mock_llm):
-        # Mock LLM to avoid actual calls
-        mock_response = MagicMock()
-        mock_response.text = "Generated content"
-        mock_response.usage_metadata = {
-            "prompt_token_count": 10,
-            "candidates_token_count": 10,
-        }
-        mock_llm.return_value = mock_response
-
-        mock_writer = MagicMock()
-        mock_writer.back_cover_exists.return_value = False
-        mock_writer.part_intro_exists.return_value = False
-        mock_writer.intro_exists.return_value = False
-        mock_writer.section_exists.return_value = False
-
-        executor = BookExecutor(self.plan, mock_writer)
+    def test_filesystem_writer_leaves_no_temp_files(self):
+        writer = FileSystemWriter(self.root_folder)
+        writer.save_intro(1, 1, "Intro")
+        writer.save_section(1, 1, 1, "Section")
+        writer.save_section(1, 1, 1, "Section, rewritten")
+
+        part_folder = self.root_folder / "part_01"
+        self.assertEqual(
+            sorted(p.name for p in part_folder.iterdir()),
+            ["01_00_intro.md", "01_01_section.md"],
+        )
+        self.assertEqual(
+            (part_folder / "01_01_section.md").read_text(encoding="utf-8"),
+            "Section, rewritten",
+        )
+
+    def test_execute_saves_back_cover(self):
+        writer = FakeWriter()
+        executor = BookExecutor(self.plan, writer)
         executor.execute()
 
-        mock_writer.save_back_cover.assert_called_once_with(
-            "A compelling back cover description."
+        self.assertEqual(
+            writer.saved("back_cover"), [("A compelling back cover description.",)]
         )
 
-    @patch("book_generator.execute.llm")
-    def test_execute_saves_part_intros(self, mock_llm):
-        # Mock LLM
-        mock_response = MagicMock()
-        mock_response.text = "Generated content"
-        mock_response.usage_metadata = {
-            "prompt_token_count": 10,
-            "candidates_token_count": 10,
-        }
-        mock_llm.return_value = mock_response
-
-        mock_writer = MagicMock()
-        mock_writer.back_cover_exists.return_value = False
-        mock_writer.part_intro_exists.return_value = False
-        mock_writer.intro_exists.return_value = False
-        mock_writer.section_exists.return_value = False
-
-        executor = BookExecutor(self.plan, mock_writer)
+    def test_execute_saves_part_intros(self):
+        writer = FakeWriter()
+        executor = BookExecutor(self.plan, writer)
         executor.execute()
 
+        part_intros = writer.saved("part_intro")
+
         # Check Part 1
         expected_content_1 = "# Part 1: Part 1\n\nIntroduction to Part 1."
-        mock_writer.save_part_intro.assert_any_call(1, expected_content_1)
+        self.assertIn((1, expected_content_1), part_intros)
 
         # Check Part 2
         expected_content_2 = "# Part 2: Part 2\n\nIntroduction to Part 2."
-        mock_writer.save_part_intro.assert_any_call(2, expected_content_2)
-
-    @patch("book_generator.execute.llm")
-    def test_execute_skips_existing_back_cover(self, mock_llm):
-        mock_response = MagicMock()
-        mock_response.text = "Generated content"
-        mock_response.usage_metadata = {
-            "prompt_token_count": 10,
-            "candidates_token_count": 10,
-        }
-        mock_llm.return_value = mock_response
-
-        mock_writer = MagicMock()
-        mock_writer.back_cover_exists.return_value = True
-        mock_writer.part_intro_exists.return_value = False
-        mock_writer.intro_exists.return_value = False
-        mock_writer.section_exists.return_value = False
-
-        executor = BookExecutor(self.plan, mock_writer)
+        self.assertIn((2, expected_content_2), part_intros)
+
+    def test_execute_skips_existing_back_cover(self):
+        writer = FakeWriter(back_cover_exists=True)
+        executor = BookExecutor(self.plan, writer)
         executor.execute()
 
-        mock_writer.save_back_cover.assert_not_called()
-
-    @patch("book_generator.execute.llm")
-    def test_execute_skips_existing_part_intros(self, mock_llm):
-        mock_response = MagicMock()
-        mock_response.text = "Generated content"
-        mock_response.usage_metadata = {
-            "prompt_token_count": 10,
-            "candidates_token_count": 10,
-        }
-        mock_llm.return_value = mock_response
-
-        mock_writer = MagicMock()
-        mock_writer.back_cover_exists.return_value = False
-        mock_writer.part_intro_exists.return_value = True  # All exist
-        mock_writer.intro_exists.return_value = False
-        mock_writer.section_exists.return_value = False
-
-        executor = BookExecutor(self.plan, mock_writer)
+        self.assertEqual(writer.saved("back_cover"), [])
+
+    def test_execute_skips_existing_part_intros(self):
+        writer = FakeWriter(part_intro_exists=True)  # All exist
+        executor = BookExecutor(self.plan, writer)
         executor.execute()
 
-        mock_writer.save_part_intro.assert_not_called()
+        self.assertEqual(writer.saved("part_intro"), [])
 
-    @patch("book_generator.execute.llm")
-    def test_execute_saves_russian_part_intros(self, mock_llm):
+    def test_execute_saves_russian_part_intros(self):
         # Test that Russian books use Russian part labels
-        mock_response = MagicMock()
-        mock_response.text = "Generated content"
-        mock_response.usage_metadata = {
-            "prompt_token_count": 10,
-            "candidates_token_count": 10,
-        }
-        mock_llm.return_value = mock_response
-
         # Create a Russian book plan
         russian_plan = BookPlan(
             book_language="ru",
             name="Тестовая книга",
+            slug="testovaya-kniga",
             target_reader="Тестеры",
             back_cover_description="Описание книги",
             parts=[
@@ -187,17 +192,13 @@ class TestExecutorOutput(unittest.TestCase):
             ],
         )
 
-        mock_writer = MagicMock()
-        mock_writer.back_cover_exists.return_value = False
-        mock_writer.part_intro_exists.return_value = False
-
-        executor = BookExecutor(russian_plan, mock_writer)
+        writer = FakeWriter()
+        executor = BookExecutor(russian_plan, writer)
         executor.execute()
 
         # Check that Russian label "Часть" is used
         expected_content = "# Часть 1: Первая часть\n\nВведение в первую часть."
-        mock_writer.save_part_intro.assert_called_once_with(1, expected_content)
-
+        self.assertEqual(writer.saved("part_intro"), [(1, expected_content)])
 
 if __name__ == "__main__":
     unittest.main()
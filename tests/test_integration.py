@@ -1,11 +1,18 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 import tempfile
 import shutil
 from pathlib import Path
+from types import SimpleNamespace
 from book_generator.execute import BookExecutor, FileSystemWriter
 from book_generator.models import BookPlan, BookPartPlan, BookChapterPlan, BookSectionPlan
 
+# Every LLM call in these tests gets the same canned response
+MOCK_RESPONSE = SimpleNamespace(
+    text="Generated content",
+    usage_metadata={'prompt_token_count': 10, 'candidates_token_count': 10},
+)
+
 class TestIntegration(unittest.TestCase):
     def setUp(self):
         self.test_dir = tempfile.mkdtemp()
@@ -15,6 +22,7 @@ class TestIntegration(unittest.TestCase):
         self.plan = BookPlan(
             book_language='en',
             name="Test Book",
+            slug="test-book",
             target_reader="Testers",
             back_cover_description="A test book.",
             parts=[
@@ -42,10 +50,7 @@ class TestIntegration(unittest.TestCase):
     @patch('book_generator.execute.llm')
     def test_execute_book_integration(self, mock_llm):
         # Setup mock
-        mock_response = MagicMock()
-        mock_response.text = "Generated content"
-        mock_response.usage_metadata = {'prompt_token_count': 10, 'candidates_token_count': 10}
-        mock_llm.return_value = mock_response
+        mock_llm.return_value = MOCK_RESPONSE
 
         # Use real FileSystemWriter
         writer = FileSystemWriter(self.root_folder)
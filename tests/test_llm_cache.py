@@ -0,0 +1,151 @@
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+import tempfile
+import shutil
+from pathlib import Path
+
+from google.genai import types
+
+from book_generator.execute import CHAPTER_DRAFT_SCHEMA, BookExecutor
+from book_generator.llm_cache import LLMCache
+from book_generator.models import (
+    BookPlan,
+    BookPartPlan,
+    BookChapterPlan,
+    BookSectionPlan,
+    ChapterDraft,
+    SectionDraft,
+)
+
+
+def make_response(text):
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(
+                content=types.Content(role="model", parts=[types.Part(text=text)])
+            )
+        ],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=10, candidates_token_count=10, thoughts_token_count=0
+        ),
+    )
+
+
+def make_plan():
+    return BookPlan(
+        book_language='en',
+        name="Test Book",
+        slug="test-book",
+        target_reader="Testers",
+        back_cover_description="A test book.",
+        parts=[
+            BookPartPlan(
+                name="Part 1",
+                introduction="Intro 1",
+                chapters=[
+                    BookChapterPlan(
+                        name="Chapter 1",
+                        sections=[
+                            BookSectionPlan(name="Section 1.1", bullet_points=["P1"])
+                        ]
+                    )
+                ]
+            )
+        ]
+    )
+
+
+class TestLLMCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = Path(self.test_dir) / '.llm_cache'
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_miss_returns_none(self):
+        cache = LLMCache(self.cache_dir)
+        self.assertIsNone(cache.get("instructions", "prompt"))
+
+    def test_put_and_get_from_disk(self):
+        LLMCache(self.cache_dir).put("instructions", "prompt", make_response("Hello"))
+
+        # A fresh instance has an empty in-memory layer and has to read the file
+        cached = LLMCache(self.cache_dir).get("instructions", "prompt")
+        self.assertEqual(cached.text, "Hello")
+        self.assertEqual(cached.usage_metadata.prompt_token_count, 10)
+
+    def test_corrupt_file_is_a_miss(self):
+        cache = LLMCache(self.cache_dir)
+        cache.put("instructions", "prompt", make_response("Hello"))
+        (cache_file,) = self.cache_dir.iterdir()
+        cache_file.write_bytes(cache_file.read_bytes()[:20])
+
+        self.assertIsNone(LLMCache(self.cache_dir).get("instructions", "prompt"))
+
+    def test_key_includes_instructions_and_model(self):
+        cache = LLMCache(self.cache_dir)
+        cache.put("instructions", "prompt", make_response("Hello"))
+
+        self.assertIsNone(cache.get("other instructions", "prompt"))
+        self.assertIsNone(cache.get("instructions", "prompt", model="models/other"))
+
+    def test_key_includes_response_schema(self):
+        schema = CHAPTER_DRAFT_SCHEMA
+        draft = ChapterDraft(sections=[SectionDraft(name="Section 1.1", markdown="Drafted")])
+        response = make_response(draft.model_dump_json())
+        response.parsed = draft.model_dump()
+        cache = LLMCache(self.cache_dir)
+        cache.put("instructions", "prompt", response, response_json_schema=schema)
+
+        self.assertIsNone(cache.get("instructions", "prompt"))
+        cached = LLMCache(self.cache_dir).get(
+            "instructions", "prompt", response_json_schema=dict(reversed(schema.items()))
+        )
+        # A hit from disk still validates into the schema model
+        self.assertEqual(ChapterDraft.model_validate_json(cached.text), draft)
+
+    def test_structured_response_from_disk(self):
+        draft = {"sections": [{"name": "Section 1.1", "markdown": "Drafted"}]}
+        response = make_response(json.dumps(draft))
+        # The SDK fills `parsed` for structured calls
+        response.parsed = draft
+        LLMCache(self.cache_dir).put(
+            "instructions", "prompt", response, response_json_schema=CHAPTER_DRAFT_SCHEMA
+        )
+
+        cached = LLMCache(self.cache_dir).get(
+            "instructions", "prompt", response_json_schema=CHAPTER_DRAFT_SCHEMA
+        )
+        mock_writer = MagicMock()
+        executor = BookExecutor(make_plan(), mock_writer)
+        leftover = executor._save_chapter_draft(executor.chapter_specs[0], [0], cached)
+
+        self.assertEqual(leftover, [])
+        mock_writer.save_section.assert_called_once_with(1, 1, 1, "## Section 1.1\n\nDrafted")
+
+    @patch('book_generator.execute.llm')
+    def test_executor_reuses_cached_responses(self, mock_llm):
+        mock_llm.return_value = make_response("Generated content")
+
+        plan = make_plan()
+
+        mock_writer = MagicMock()
+        mock_writer.intro_exists.return_value = False
+        mock_writer.section_exists.return_value = False
+
+        BookExecutor(plan, mock_writer, cache=LLMCache(self.cache_dir)).execute()
+        self.assertEqual(mock_llm.call_count, 2)
+
+        executor = BookExecutor(plan, mock_writer, cache=LLMCache(self.cache_dir))
+        executor.execute()
+
+        # Second run is served entirely from disk and costs nothing
+        self.assertEqual(mock_llm.call_count, 2)
+        self.assertEqual(executor.tracker.total_cost, 0)
+        mock_writer.save_section.assert_called_with(1, 1, 1, "## Section 1.1\n\nGenerated content")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,15 @@
 import unittest
-import yaml
 from pathlib import Path
 from book_generator.models import BookPlan
+from book_generator.utils import yaml_load
 
 class TestModels(unittest.TestCase):
     def test_load_plan_yaml(self):
         # Path to the existing plan.yaml
         plan_path = Path('books/sirens/plan.yaml')
 
-        with plan_path.open('rt', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
+        # Same libyaml loader as the generator uses
+        data = yaml_load(plan_path.read_bytes())
         
         # Validate against the model
         book_plan = BookPlan.model_validate(data)
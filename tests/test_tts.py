@@ -0,0 +1,100 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+import wave
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from botocore.exceptions import ClientError
+from google.genai import types
+
+from book_generator.tts import TTSGenerator, _wav_header
+from book_generator.tts_batch import TTSBatchGenerator
+
+
+class TestWavHeader(unittest.TestCase):
+    def test_header_matches_wave_module(self):
+        pcm_data = b"\x01\x02" * 1000
+
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(24000)
+            wf.writeframes(pcm_data)
+
+        self.assertEqual(_wav_header(len(pcm_data)) + pcm_data, buffer.getvalue())
+
+    def test_header_is_readable(self):
+        pcm_data = b"\x00\x00" * 480
+        wav_bytes = _wav_header(len(pcm_data), channels=2, rate=48000) + pcm_data
+
+        with wave.open(io.BytesIO(wav_bytes), "rb") as wf:
+            self.assertEqual(wf.getnchannels(), 2)
+            self.assertEqual(wf.getframerate(), 48000)
+            self.assertEqual(wf.getsampwidth(), 2)
+            self.assertEqual(wf.readframes(wf.getnframes()), pcm_data)
+
+
+class TestS3FileExists(unittest.TestCase):
+    def setUp(self):
+        with patch('book_generator.tts.get_client'):
+            self.generator = TTSGenerator()
+        self.generator.s3_bucket = "bucket"
+        self.generator.s3_client = MagicMock()
+
+    def test_missing_key(self):
+        self.generator.s3_client.head_object.side_effect = ClientError(
+            {"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject"
+        )
+        self.assertFalse(self.generator._s3_file_exists("book/file.wav"))
+
+    def test_other_errors_are_raised(self):
+        self.generator.s3_client.head_object.side_effect = ClientError(
+            {"Error": {"Code": "403", "Message": "Forbidden"}}, "HeadObject"
+        )
+        with self.assertRaises(ClientError):
+            self.generator._s3_file_exists("book/file.wav")
+
+
+class TestTTSBatch(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.test_dir)
+        part = Path("books") / "book" / "part_01"
+        part.mkdir(parents=True)
+        (part / "01_01_section.md").write_text("Some text. " * 100, encoding="utf-8")
+
+        with patch('book_generator.tts.get_client'):
+            self.generator = TTSBatchGenerator(verbose=False)
+        self.client = self.generator.client = MagicMock()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.test_dir)
+
+    def test_downloads_results_of_a_succeeded_job(self):
+        self.client.batches.create.return_value = MagicMock(
+            state=types.JobState.JOB_STATE_SUCCEEDED
+        )
+        self.client.files.download.return_value = b""
+
+        self.generator.process_book("book")
+
+        self.client.files.download.assert_called_once()
+
+    def test_failed_job_raises(self):
+        self.client.batches.create.return_value = MagicMock(
+            state=types.JobState.JOB_STATE_FAILED
+        )
+
+        with self.assertRaises(RuntimeError):
+            self.generator.process_book("book")
+        self.client.files.download.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
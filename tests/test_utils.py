@@ -1,47 +1,47 @@
+import os
+import shutil
+import tempfile
 import unittest
-from book_generator.utils import calculate_gemini_3_cost
+from pathlib import Path
+from unittest.mock import patch
+
+from book_generator.models import BookSectionPlan
+from book_generator.plan import save_plan
+from book_generator.utils import (
+    LLM_RETRY_OPTIONS,
+    calculate_gemini_3_cost,
+    get_client,
+    load_plan_model,
+)
+
+PLAN_YAML = "name: Test Section\nbullet_points:\n- P1\n"
 
 class TestUtils(unittest.TestCase):
-    def test_cost_calculation_standard_tier(self):
-        # Standard tier (< 200k tokens)
-        # Input: $2.00 / 1M
-        # Output: $12.00 / 1M
-        
-        usage = {
-            'prompt_token_count': 100_000,
-            'candidates_token_count': 10_000,
-            'thoughts_token_count': 0
-        }
-        
-        report = calculate_gemini_3_cost(usage)
-        
-        expected_input_cost = (100_000 / 1_000_000) * 2.00
-        expected_output_cost = (10_000 / 1_000_000) * 12.00
-        expected_total = expected_input_cost + expected_output_cost
-        
-        self.assertAlmostEqual(report.total_cost, expected_total)
-        self.assertEqual(report.tier_name, "Standard (<200k)")
+    def test_cost_calculation_tiers(self):
+        # Standard tier (< 200k tokens): input $2.00 / 1M, output $12.00 / 1M
+        # Long context tier (> 200k tokens): input $4.00 / 1M, output $18.00 / 1M
+        # Thoughts are billed as output tokens
+        cases = [
+            (100_000, 10_000, 0, 2.00, 12.00, "Standard (<200k)"),
+            (250_000, 10_000, 5_000, 4.00, 18.00, "Long Context (>200k)"),
+        ]
 
-    def test_cost_calculation_long_context_tier(self):
-        # Long context tier (> 200k tokens)
-        # Input: $4.00 / 1M
-        # Output: $18.00 / 1M
-        
-        usage = {
-            'prompt_token_count': 250_000,
-            'candidates_token_count': 10_000,
-            'thoughts_token_count': 5_000
-        }
-        
-        report = calculate_gemini_3_cost(usage)
-        
-        expected_input_cost = (250_000 / 1_000_000) * 4.00
-        total_output = 10_000 + 5_000
-        expected_output_cost = (total_output / 1_000_000) * 18.00
-        expected_total = expected_input_cost + expected_output_cost
-        
-        self.assertAlmostEqual(report.total_cost, expected_total)
-        self.assertEqual(report.tier_name, "Long Context (>200k)")
+        for prompt, candidates, thoughts, input_rate, output_rate, tier_name in cases:
+            with self.subTest(tier_name=tier_name):
+                usage = {
+                    'prompt_token_count': prompt,
+                    'candidates_token_count': candidates,
+                    'thoughts_token_count': thoughts
+                }
+
+                report = calculate_gemini_3_cost(usage)
+
+                expected_input_cost = (prompt / 1_000_000) * input_rate
+                expected_output_cost = ((candidates + thoughts) / 1_000_000) * output_rate
+                expected_total = expected_input_cost + expected_output_cost
+
+                self.assertAlmostEqual(report.total_cost, expected_total)
+                self.assertEqual(report.tier_name, tier_name)
 
     def test_cost_calculation_object_access(self):
         # Test with an object that has attributes instead of dict
@@ -55,5 +55,90 @@ class TestUtils(unittest.TestCase):
         report = calculate_gemini_3_cost(usage)
         self.assertGreater(report.total_cost, 0)
 
+    def test_cost_calculation_batch(self):
+        # Batch API requests cost half the standard rates
+        usage = {
+            'prompt_token_count': 100_000,
+            'candidates_token_count': 10_000,
+            'thoughts_token_count': 0
+        }
+
+        standard = calculate_gemini_3_cost(usage)
+        batch = calculate_gemini_3_cost(usage, is_batch=True)
+
+        self.assertAlmostEqual(batch.total_cost, standard.total_cost / 2)
+        self.assertEqual(batch.tier_name, "Standard (<200k) Batch")
+
+    def test_cost_calculation_cached_tokens(self):
+        # Cached prompt tokens are billed at $0.20 / 1M instead of $2.00 / 1M
+        usage = {
+            'prompt_token_count': 100_000,
+            'cached_content_token_count': 80_000,
+            'candidates_token_count': 10_000,
+            'thoughts_token_count': 0
+        }
+
+        report = calculate_gemini_3_cost(usage)
+
+        expected_input_cost = (20_000 / 1_000_000) * 2.00 + (80_000 / 1_000_000) * 0.20
+        self.assertAlmostEqual(report.input_cost, expected_input_cost)
+        self.assertEqual(report.cached_tokens, 80_000)
+
+    def test_cost_calculation_missing_thoughts(self):
+        # The SDK reports thoughts_token_count=None when the model didn't think
+        from google.genai import types
+
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=1000, candidates_token_count=100
+        )
+        report = calculate_gemini_3_cost(usage)
+        self.assertEqual(report.output_tokens, 100)
+
+class TestGetClient(unittest.TestCase):
+    @patch('book_generator.utils.genai.Client')
+    def test_client_retries_transient_errors(self, mock_client):
+        with patch('book_generator.utils._client', None), \
+                patch.dict(os.environ, {"GEMINI_API_KEY": "test"}):
+            get_client()
+
+        http_options = mock_client.call_args.kwargs['http_options']
+        self.assertEqual(http_options.retry_options, LLM_RETRY_OPTIONS)
+
+class TestLoadPlanModel(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.plan_yaml = self.test_dir / "plan.yaml"
+        self.plan_yaml.write_text(PLAN_YAML, encoding="utf-8")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_writes_and_reuses_json_copy(self):
+        plan = load_plan_model(self.plan_yaml, BookSectionPlan)
+        self.assertEqual(plan, BookSectionPlan(name="Test Section", bullet_points=["P1"]))
+        self.assertTrue((self.test_dir / "plan.json").exists())
+
+        # Served from the JSON copy while plan.yaml keeps its modification time
+        mtime_ns = self.plan_yaml.stat().st_mtime_ns
+        self.plan_yaml.write_text(PLAN_YAML.replace("Test", "Changed"), encoding="utf-8")
+        os.utime(self.plan_yaml, ns=(mtime_ns, mtime_ns))
+        self.assertEqual(load_plan_model(self.plan_yaml, BookSectionPlan).name, "Test Section")
+
+    def test_save_plan_writes_json_copy(self):
+        plan = BookSectionPlan(name="Saved Section", bullet_points=["P1"])
+        save_plan(plan, self.plan_yaml)
+
+        with patch('book_generator.utils.yaml_load') as mock_yaml_load:
+            self.assertEqual(load_plan_model(self.plan_yaml, BookSectionPlan), plan)
+        mock_yaml_load.assert_not_called()
+
+    def test_reloads_yaml_when_changed(self):
+        load_plan_model(self.plan_yaml, BookSectionPlan)
+
+        self.plan_yaml.write_text(PLAN_YAML.replace("Test", "Changed"), encoding="utf-8")
+        os.utime(self.plan_yaml, ns=(1, 1))
+        self.assertEqual(load_plan_model(self.plan_yaml, BookSectionPlan).name, "Changed Section")
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,27 +1,33 @@
+import importlib
 import streamlit as st
-from book_generator.plan import (
-    generate_text_plan_stream,
-    refine_text_plan_stream,
-    create_book_plan,
-    save_plan,
-)
 from pathlib import Path
 import time
 
+# Minimum seconds between placeholder updates while a response streams in.
+# Re-rendering on every chunk re-sends the whole markdown to the browser.
+RENDER_INTERVAL = 0.08
+
+
+@st.cache_resource
+def get_plan_module():
+    """Imports book_generator.plan (and google.genai with it) on first use."""
+    return importlib.import_module("book_generator.plan")
+
+
 st.set_page_config(page_title="AI Book Generator", layout="wide")
 st.title("AI Book Generator Planner")
 
-# Session state
-for key, default in [
-    ("text_plan", None),
-    ("structured_plan", None),
-    ("messages", []),
-    ("config", {}),
-    ("total_cost", 0.0),
-    ("generating", False),
-]:
-    if key not in st.session_state:
-        st.session_state[key] = default
+# Session state, initialized once per session rather than on every rerun
+if "generating" not in st.session_state:
+    for key, default in [
+        ("text_plan", None),
+        ("structured_plan", None),
+        ("messages", []),
+        ("config", {}),
+        ("total_cost", 0.0),
+        ("generating", False),
+    ]:
+        st.session_state.setdefault(key, default)
 
 # Sidebar
 with st.sidebar:
@@ -58,10 +64,9 @@ if st.session_state.generating:
     placeholder = st.empty()
 
     try:
-        import time
-
-        full_text = ""
-        for chunk in generate_text_plan_stream(
+        text_parts = []
+        last_render = 0.0
+        for chunk in get_plan_module().generate_text_plan_stream(
             st.session_state.config["topic"], st.session_state.config["size"]
         ):
             if isinstance(chunk, tuple) and chunk[0] == "__DONE__":
@@ -77,9 +82,10 @@ if st.session_state.generating:
                 st.session_state.generating = False
                 st.rerun()
             else:
-                full_text += chunk
-                placeholder.markdown(full_text)
-                time.sleep(0.01)  # Force UI update
+                text_parts.append(chunk)
+                if time.monotonic() - last_render > RENDER_INTERVAL:
+                    placeholder.markdown("".join(text_parts))
+                    last_render = time.monotonic()
     except Exception as e:
         st.error(f"Error: {e}")
         import traceback
@@ -101,8 +107,9 @@ elif st.session_state.text_plan:
         with st.chat_message("assistant"):
             placeholder = st.empty()
             try:
-                full_text = ""
-                for chunk in refine_text_plan_stream(
+                text_parts = []
+                last_render = 0.0
+                for chunk in get_plan_module().refine_text_plan_stream(
                     st.session_state.text_plan, prompt
                 ):
                     if isinstance(chunk, tuple) and chunk[0] == "__DONE__":
@@ -119,9 +126,10 @@ elif st.session_state.text_plan:
                         time.sleep(0.5)
                         st.rerun()
                     else:
-                        full_text += chunk
-                        placeholder.markdown(full_text)
-                        time.sleep(0.01)  # Force UI update
+                        text_parts.append(chunk)
+                        if time.monotonic() - last_render > RENDER_INTERVAL:
+                            placeholder.markdown("".join(text_parts))
+                            last_render = time.monotonic()
             except Exception as e:
                 st.error(f"Error: {e}")
 
@@ -130,14 +138,28 @@ elif st.session_state.text_plan:
 
     if st.button("Ready - Create Structured Plan"):
         with st.spinner("Creating structured plan..."):
+            placeholder = st.empty()
             try:
-                structured_plan, cost = create_book_plan(st.session_state.text_plan)
+                json_parts = []
+                last_render = 0.0
+                for chunk in get_plan_module().create_book_plan_stream(st.session_state.text_plan):
+                    if isinstance(chunk, tuple) and chunk[0] == "__DONE__":
+                        _, structured_plan, cost = chunk
+                    else:
+                        json_parts.append(chunk)
+                        if time.monotonic() - last_render > RENDER_INTERVAL:
+                            placeholder.code("".join(json_parts), language="json")
+                            last_render = time.monotonic()
+                placeholder.code(
+                    structured_plan.model_dump_json(indent=2), language="json"
+                )
+
                 st.session_state.total_cost += cost
                 st.session_state.structured_plan = structured_plan
 
                 # Use the slug from the plan
                 path = Path("books") / structured_plan.slug
-                save_plan(structured_plan, path)
+                get_plan_module().save_plan(structured_plan, path)
 
                 st.success(f"✅ Saved to {path}/plan.yaml")
                 st.success(f"💰 Total: ${st.session_state.total_cost:.4f}")